@@ -2,14 +2,32 @@
 """
 Main VM Translator program. Does not conform to naming convention in order
 to comply with submission rules of the Nand2Tetris course.
+
+Batch and watch mode are imported only when used: the process pool and hashing modules
+they need take longer to import than a small program takes to translate.
 """
 
 from argparse import ArgumentParser, Namespace
 import os
 import sys
+import time
+
+from bytecode import BYTECODE_EXTENSION
+from compression import COMPRESSION_FORMATS, strip_compression
+from constants import ROM_SIZE
+from inliner import INLINE_MAX_SIZE
+from linker import LinkError
+from profiles import PROFILES
+from rom_budget import RomBudgetError
+from stack_analysis import STACK_LIMIT, StackLimitError
+from statics import StaticOverflowError
+from translation_cache import TRANSLATION_CACHE_SIZE
+from translator import scan_options, translate_path
+from vm_parser import DuplicateFileError
 
-from asm_writer import translate_commands, write_init, write_translated_asm
-from vm_parser import parse_commands, parse_directory, parse_file
+# The options watch mode supports: it retranslates each changed file on its own, so every
+# option that changes how the program is translated or written is refused with --watch
+WATCH_OPTIONS = ("file_or_dir", "watch", "recursive", "include", "exclude")
 
 
 def initialize_argparser() -> ArgumentParser:
@@ -23,9 +41,227 @@ def initialize_argparser() -> ArgumentParser:
     )
     arg_parser.add_argument(
         "file_or_dir",
+        nargs="?",
         metavar="file.vm or /dirname/",
         type=str,
-        help="absolute filepath of the .vm file or directory to be translated",
+        help=(
+            "absolute filepath of the .vm file or directory to be translated; optional "
+            "with --manifest"
+        ),
+    )
+    arg_parser.add_argument(
+        "more",
+        nargs="*",
+        metavar="file.vm or /dirname/",
+        help="more programs to translate in the same run (batch mode)",
+    )
+    arg_parser.add_argument(
+        "--manifest",
+        metavar="FILE",
+        help="translate every .vm file or directory listed in FILE (batch mode)",
+    )
+    arg_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "number of worker processes in batch mode and for --function-units "
+            "(default: one per CPU)"
+        ),
+    )
+    arg_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "keep running and retranslate the directory's .vm files as they change; only "
+            "--recursive, --include and --exclude apply"
+        ),
+    )
+    arg_parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="also translate .vm files in subdirectories of the directory",
+    )
+    arg_parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help="only translate files matching PATTERN (default: *.vm); may be repeated",
+    )
+    arg_parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="PATTERN",
+        help="skip files matching PATTERN; may be repeated",
+    )
+    arg_parser.add_argument(
+        "--objects",
+        action="store_true",
+        help="translate each file into its own .obj object and link them into the .asm",
+    )
+    arg_parser.add_argument(
+        "--strip-unused",
+        action="store_true",
+        help="link as with --objects, leaving out functions that are never called",
+    )
+    arg_parser.add_argument(
+        "--symbol-index",
+        action="store_true",
+        help="also write a sorted .sym index of label and function addresses",
+    )
+    arg_parser.add_argument(
+        "--translation-cache",
+        type=int,
+        nargs="?",
+        const=TRANSLATION_CACHE_SIZE,
+        metavar="SIZE",
+        help=(
+            "translate each distinct command once, keeping up to SIZE translations "
+            f"(default when given without a value: {TRANSLATION_CACHE_SIZE})"
+        ),
+    )
+    arg_parser.add_argument(
+        "--cache-report",
+        action="store_true",
+        help="print the hit rate of the translation cache",
+    )
+    arg_parser.add_argument(
+        "--bytecode-cache",
+        action="store_true",
+        help="keep pre-parsed bytecode of each .vm file in __vmcache__ and load it on reruns",
+    )
+    arg_parser.add_argument(
+        "--compress",
+        choices=COMPRESSION_FORMATS,
+        metavar="FORMAT",
+        help=(
+            f"compress the .asm output with {', '.join(COMPRESSION_FORMATS)}, adding the "
+            "format's extension; compressed .vm inputs are read by their extension"
+        ),
+    )
+    arg_parser.add_argument(
+        "--function-units",
+        action="store_true",
+        help=(
+            "translate each function on its own and keep it in __vmcache__, so only "
+            "changed functions are translated again; options that need the whole program "
+            "translate as usual"
+        ),
+    )
+    arg_parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help=(
+            "read upcoming files on a background thread and write each finished file on "
+            "another while translating; options that need the whole program only read ahead"
+        ),
+    )
+    arg_parser.add_argument(
+        "-O",
+        dest="profile",
+        choices=PROFILES,
+        metavar="LEVEL",
+        help=(
+            "optimization profile: -O0 for none, -O2 for fewest cycles, -Os for fewest "
+            "instructions; prints the cost against -O0.  Other options add to it"
+        ),
+    )
+    arg_parser.add_argument(
+        "--inline",
+        action="store_true",
+        help="inline calls to small straight-line functions that call nothing else",
+    )
+    arg_parser.add_argument(
+        "--inline-size",
+        type=int,
+        default=INLINE_MAX_SIZE,
+        metavar="N",
+        help=f"largest function body, in VM commands, to inline (default: {INLINE_MAX_SIZE})",
+    )
+    arg_parser.add_argument(
+        "--tail-calls",
+        action="store_true",
+        help="translate a call directly followed by return as a frame-reusing jump",
+    )
+    arg_parser.add_argument(
+        "--fuse-branches",
+        action="store_true",
+        help="translate a comparison feeding an if-goto as a single conditional jump",
+    )
+    arg_parser.add_argument(
+        "--track-stack",
+        action="store_true",
+        help="track stack depth within basic blocks and write SP back once per block",
+    )
+    arg_parser.add_argument(
+        "--cache-bases",
+        action="store_true",
+        help=(
+            "track the stack as with --track-stack and reuse segment bases and addresses "
+            "already held in A or D between pushes and pops"
+        ),
+    )
+    arg_parser.add_argument(
+        "--shared-stubs",
+        action="store_true",
+        help="jump to one shared copy of the call and return sequences to save ROM",
+    )
+    arg_parser.add_argument(
+        "--compact-calls",
+        action="store_true",
+        help=(
+            "with shared stubs, let calls to a function from many sites share one call "
+            "entry and write return addresses as ROM addresses instead of labels; "
+            "implies --shared-stubs and prints the labels saved"
+        ),
+    )
+    arg_parser.add_argument(
+        "--allocate-statics",
+        action="store_true",
+        help="assign static variables direct RAM addresses instead of Foo.i symbols",
+    )
+    arg_parser.add_argument(
+        "--static-report",
+        action="store_true",
+        help="print the static segment usage of each file",
+    )
+
+    arg_parser.add_argument(
+        "--stack-report",
+        action="store_true",
+        help="print the worst-case stack usage of each entry point",
+    )
+    arg_parser.add_argument(
+        "--stack-limit",
+        type=int,
+        metavar="WORDS",
+        help=(
+            "fail without writing output if the worst-case stack usage may exceed WORDS "
+            f"(the stack segment holds {STACK_LIMIT})"
+        ),
+    )
+
+    arg_parser.add_argument(
+        "--rom-budget",
+        type=int,
+        nargs="?",
+        const=ROM_SIZE,
+        metavar="INSTRUCTIONS",
+        help=(
+            "fail without writing output if it would have more than INSTRUCTIONS "
+            f"instructions (default when given without a value: the {ROM_SIZE} word ROM)"
+        ),
+    )
+    arg_parser.add_argument(
+        "--shrink",
+        action="store_true",
+        help="retry with --shared-stubs when the output is over the ROM budget",
+    )
+    arg_parser.add_argument(
+        "--rom-report",
+        action="store_true",
+        help="print the instruction count and the largest functions and files",
     )
 
     return arg_parser
@@ -33,39 +269,90 @@ def initialize_argparser() -> ArgumentParser:
 
 def initialize_arguments(arg_parser: ArgumentParser) -> Namespace:
     """
-    Parse command-line-arguments
+    Parse command-line-arguments.  A target is needed unless a manifest is given, and in
+    batch mode each target is checked when it is translated instead.
     """
 
     arg_namespace = arg_parser.parse_args()
 
-    if arg_namespace.file_or_dir[-3:] != ".vm" and not os.path.isdir(
-        arg_namespace.file_or_dir
-    ):
+    if arg_namespace.file_or_dir is None:
+        if not arg_namespace.manifest:
+            arg_parser.error("the following arguments are required: file.vm or /dirname/")
+        return arg_namespace
+    if arg_namespace.manifest or arg_namespace.more:
+        return arg_namespace
+
+    if not strip_compression(arg_namespace.file_or_dir).endswith(
+        (".vm", BYTECODE_EXTENSION)
+    ) and not os.path.isdir(arg_namespace.file_or_dir):
         arg_parser.print_usage()
         sys.exit()
 
     return arg_namespace
 
 
+def unsupported_watch_options(arg_parser: ArgumentParser, args: Namespace) -> list[str]:
+    """
+    The options given alongside --watch that watch mode cannot honour, as they were
+    written on the command line
+    """
+
+    return [
+        action.option_strings[-1] if action.option_strings else "more targets"
+        for action in arg_parser._actions  # pylint: disable=protected-access
+        if action.dest not in WATCH_OPTIONS
+        and action.dest in vars(args)
+        and getattr(args, action.dest) not in (action.default, [])
+    ]
+
+
 def main() -> None:
-    args = initialize_argparser()
-    file_or_dir = initialize_arguments(args).file_or_dir
-
-    if os.path.isdir(file_or_dir):
-        out_file_name = f"{file_or_dir}/{os.path.basename(file_or_dir)}"
-        write_init(out_file_name)
-        files = parse_directory(file_or_dir)
-        commands = []
-        for file in files:
-            lines = parse_file(file)
-            commands.extend(parse_commands(lines, os.path.basename(file)))
-    else:
-        out_file_name = file_or_dir[:-3]
-        lines = parse_file(file_or_dir)
-        commands = parse_commands(lines, os.path.basename(file_or_dir))
-
-    translate_commands(commands)
-    write_translated_asm(out_file_name, commands)
+    arg_parser = initialize_argparser()
+    args = initialize_arguments(arg_parser)
+    file_or_dir = args.file_or_dir
+
+    if args.watch:
+        if file_or_dir is None or not os.path.isdir(file_or_dir):
+            arg_parser.print_usage()
+            sys.exit()
+        unsupported = unsupported_watch_options(arg_parser, args)
+        if unsupported:
+            arg_parser.error(f"--watch cannot be combined with {', '.join(unsupported)}")
+
+        from watch import watch_directory  # pylint: disable=import-outside-toplevel
+
+        watch_directory(file_or_dir, **scan_options(args))
+        return
+
+    targets = ([file_or_dir] if file_or_dir is not None else []) + args.more
+    if args.manifest or len(targets) > 1:
+        # pylint: disable-next=import-outside-toplevel
+        from batch import format_batch_summary, read_manifest, translate_batch, unique_targets
+
+        if args.manifest:
+            try:
+                targets.extend(read_manifest(args.manifest))
+            except OSError as error:
+                sys.exit(f"VMTranslator: {error}")
+        targets = unique_targets(targets)
+        start = time.perf_counter()
+        results = translate_batch(targets, args, args.jobs)
+        print(format_batch_summary(results, time.perf_counter() - start))
+        for result in results:
+            for report in result.reports:
+                print(f"{result.target}:\n{report}", file=sys.stderr)
+        if any(result.error is not None for result in results):
+            sys.exit(1)
+        return
+
+    try:
+        result = translate_path(file_or_dir, args)
+    except (
+        StaticOverflowError, StackLimitError, RomBudgetError, LinkError, DuplicateFileError
+    ) as error:
+        sys.exit(f"VMTranslator: {error}")
+    for report in result.reports:
+        print(report, file=sys.stderr)
 
 
 if __name__ == "__main__":
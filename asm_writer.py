@@ -5,41 +5,99 @@ Module for functions to write all of the command translations out to file
 from __future__ import annotations
 
 from command import Command
+from compression import compressed_name, open_text
 from constants import SYS_INIT
+from rom_budget import count_instructions
+from translation_cache import TranslationCache
 
 
-def write_init(directory: str) -> None:
+def asm_path(in_filename: str, compress: str | None = None) -> str:
+    """
+    The .asm file written for `in_filename` (without extension), with the extension of
+    the compression format `compress` when there is one
+    """
+
+    return compressed_name(f"{in_filename}.asm", compress)
+
+
+def write_init(directory: str, compress: str | None = None) -> int:
     """
     Write bootstrap code that initializes the VM via .asm code.
 
     Args:
         `directory` (str): The directory being translated that will be the written filename
+        `compress` (str | None): The compression format to write, None for plain text
 
     Returns:
-        list[list[str]]: A list of the initialization commands
+        int: The number of instructions written
+    """
+
+    init = format_init()
+    with open_text(asm_path(directory, compress), "w") as out_file:
+        out_file.write(init)
+
+    return count_instructions(init.split("\n"))
+
+
+def write_asm_lines(
+    in_filename: str, lines: list[str], append: bool = True, compress: str | None = None
+) -> int:
+    """
+    Write lines of ASM that do not belong to any command, such as shared routines.
+
+    Args:
+        `in_filename` (str): The filename (without extension) of the .asm file
+        `lines` (list[str]): The ASM to write
+        `append` (bool): Whether to add to the file rather than start it afresh
+        `compress` (str | None): The compression format to write, None for plain text
+
+    Returns:
+        int: The number of instructions written
+    """
+
+    with open_text(asm_path(in_filename, compress), "a" if append else "w") as out_file:
+        if lines:
+            out_file.write("\n".join(lines) + "\n")
+
+    return count_instructions(lines)
+
+
+def format_init() -> str:
+    """
+    Format the bootstrap code exactly as `write_init` writes it to file.
+
+    Returns:
+        str: The bootstrap ASM code, newline terminated
     """
 
     sys_init = Command("call Sys.init 0")
     sys_init.translate()
     sys_init_commands = SYS_INIT #+ sys_init.translation
 
-    with open(f"{directory}.asm", "w", encoding="UTF-8") as out_file:
-        out_file.write("\n".join(sys_init_commands) + "\n")
+    return "\n".join(sys_init_commands) + "\n"
 
 
-def translate_commands(commands: list[Command]) -> None:
+def translate_commands(commands: list[Command], cache: TranslationCache | None = None) -> None:
     """
     Translate all commands by calling the translate method on every command in the list.
 
     Args:
         `commands` (list[Command]): The list of Commands being translated
+        `cache` (TranslationCache | None): Reuse the translations of identical commands
+            through this cache
     """
 
-    for command in commands:
-        command.translate()
+    if cache is None:
+        for command in commands:
+            command.translate()
+    else:
+        for command in commands:
+            cache.translate(command)
 
 
-def write_translated_asm(in_filename: str, commands: list[Command]) -> None:
+def write_translated_asm(
+    in_filename: str, commands: list[Command], compress: str | None = None
+) -> int:
     """
     Write an output file with the same name as the `in_filename` but with the .asm filetype
 
@@ -48,8 +106,31 @@ def write_translated_asm(in_filename: str, commands: list[Command]) -> None:
             Or the directory name which will be the out_file name
         `commands` (list[Command]): The list of Commands being translated and written
             to the .asm file
+        `compress` (str | None): The compression format to write, None for plain text.
+            Each command is compressed as it is written.
+
+    Returns:
+        int: The number of instructions written, not counting comments and labels
     """
 
-    with open(f"{in_filename}.asm", "a", encoding="UTF-8") as out_file:
+    instructions = 0
+    with open_text(asm_path(in_filename, compress), "a") as out_file:
         for command in commands:
             out_file.write("\n".join(command.translation) + "\n")
+            instructions += count_instructions(command.translation)
+
+    return instructions
+
+
+def format_translated_asm(commands: list[Command]) -> str:
+    """
+    Format already translated commands exactly as `write_translated_asm` writes them to file.
+
+    Args:
+        `commands` (list[Command]): The list of translated Commands
+
+    Returns:
+        str: The ASM code for all of the commands, newline terminated
+    """
+
+    return "".join("\n".join(command.translation) + "\n" for command in commands)
@@ -0,0 +1,161 @@
+"""
+Batch translation of many independent programs in one invocation.  The programs are
+spread over a pool of worker processes, each of which imports the translator once and
+then translates every program it is handed.
+"""
+
+from __future__ import annotations
+
+from argparse import Namespace
+import os
+import time
+
+from bytecode import BYTECODE_EXTENSION
+from compression import strip_compression
+from translator import translate_path
+
+
+class BatchResult:
+    """
+    The outcome of translating one program of a batch
+
+    Attributes:
+        `target` (str): the .vm file or directory translated
+        `out_file_name` (str | None): the .asm file written, None if translation failed
+        `n_commands` (int): the number of VM commands translated
+        `seconds` (float): how long the translation took
+        `reports` (list[str]): any reports that were asked for
+        `error` (str | None): why the translation failed, if it did
+    """
+
+    def __init__(self, target: str) -> None:
+        self.target: str = target
+        self.out_file_name: str | None = None
+        self.n_commands: int = 0
+        self.seconds: float = 0.0
+        self.reports: list[str] = []
+        self.error: str | None = None
+
+
+def read_manifest(manifest: str) -> list[str]:
+    """
+    Read a batch manifest: one .vm file or directory per line.  Blank lines and lines
+    starting with # are ignored, and relative paths are taken relative to the manifest.
+
+    Args:
+        `manifest` (str): The filepath of the manifest
+
+    Returns:
+        list[str]: The targets listed in the manifest
+    """
+
+    base = os.path.dirname(manifest)
+    with open(manifest, "r", encoding="UTF-8") as f:
+        lines = [line.strip() for line in f]
+
+    return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+
+def unique_targets(targets: list[str]) -> list[str]:
+    """
+    Drop targets that name the same file or directory as an earlier one, so no program
+    is translated twice and no two workers write the same .asm file
+
+    Args:
+        `targets` (list[str]): The .vm files and directories, in order
+
+    Returns:
+        list[str]: The first target for each path, in order
+    """
+
+    seen = set()
+    unique = []
+    for target in targets:
+        path = os.path.normpath(os.path.abspath(target))
+        if path not in seen:
+            seen.add(path)
+            unique.append(target)
+
+    return unique
+
+
+def translate_one(target: str, args: Namespace) -> BatchResult:
+    """
+    Translate one program, catching anything that makes it fail so one bad program
+    does not stop the rest of the batch
+    """
+
+    result = BatchResult(target)
+    start = time.perf_counter()
+    try:
+        vm_file = strip_compression(target).endswith((".vm", BYTECODE_EXTENSION))
+        if not vm_file and not os.path.isdir(target):
+            raise ValueError("not a .vm file or directory")
+        translation = translate_path(target, args)
+        result.out_file_name = translation.out_file_name
+        result.n_commands = translation.n_commands
+        result.reports = translation.reports
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        result.error = f"{type(error).__name__}: {error}"
+    result.seconds = time.perf_counter() - start
+
+    return result
+
+
+def translate_batch(targets: list[str], args: Namespace, jobs: int = 0) -> list[BatchResult]:
+    """
+    Translate every target, in parallel when more than one job is allowed.
+
+    Args:
+        `targets` (list[str]): The .vm files and directories to translate
+        `args` (Namespace): The command-line-arguments applied to every target
+        `jobs` (int): The number of worker processes, 0 for one per CPU
+
+    Returns:
+        list[BatchResult]: One result per target, in the order given
+    """
+
+    jobs = min(jobs or os.cpu_count() or 1, len(targets))
+    if jobs <= 1:
+        return [translate_one(target, args) for target in targets]
+
+    # Importing the process pool pulls in multiprocessing, so it waits until it is needed
+    from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(targets) // (jobs * 4))
+        return list(
+            executor.map(translate_one, targets, [args] * len(targets), chunksize=chunksize)
+        )
+
+
+def format_batch_summary(results: list[BatchResult], seconds: float) -> str:
+    """
+    Format the results of a batch as a summary report, one line per program.
+
+    Args:
+        `results` (list[BatchResult]): The results of `translate_batch`
+        `seconds` (float): The wall time of the whole batch
+
+    Returns:
+        str: The summary report
+    """
+
+    lines = []
+    for result in results:
+        if result.error is None:
+            lines.append(
+                f"ok      {result.target} -> {result.out_file_name} "
+                f"({result.n_commands} commands, {result.seconds * 1000:.1f} ms)"
+            )
+        else:
+            lines.append(f"FAILED  {result.target}: {result.error}")
+
+    failed = sum(result.error is not None for result in results)
+    total = sum(result.n_commands for result in results)
+    lines.append(
+        f"{len(results) - failed} translated, {failed} failed, "
+        f"{total} commands in {seconds:.2f} s"
+    )
+
+    return "\n".join(lines)
@@ -0,0 +1,107 @@
+"""
+Translation benchmark.  Measures the cost of parsing and translating each kind of VM
+command, and optionally profiles a whole-program translation with cProfile.
+
+Usage:
+    python benchmark.py [--repeat N] [--profile] [--cache]
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+import cProfile
+import pstats
+import time
+
+from asm_writer import translate_commands
+from command import Command
+from translation_cache import TranslationCache
+from vm_parser import parse_commands
+
+# A representative command of every kind, the mix a compiled Jack program is made of
+SAMPLES = {
+    "push constant": "push constant 17",
+    "push segment": "push local 2",
+    "push temp": "push temp 3",
+    "push pointer": "push pointer 1",
+    "push static": "push static 4",
+    "pop segment": "pop argument 1",
+    "pop temp": "pop temp 6",
+    "pop pointer": "pop pointer 0",
+    "pop static": "pop static 2",
+    "add": "add",
+    "not": "not",
+    "eq": "eq",
+    "label": "label LOOP",
+    "goto": "goto LOOP",
+    "if-goto": "if-goto LOOP",
+    "function": "function Main.main 2",
+    "call": "call Math.multiply 2",
+    "return": "return",
+}
+
+
+def time_command(text: str, repeat: int) -> float:
+    """
+    Average time in nanoseconds to construct and translate `text`
+    """
+
+    start = time.perf_counter_ns()
+    for _ in range(repeat):
+        Command(text, "Main.vm").translate()
+
+    return (time.perf_counter_ns() - start) / repeat
+
+
+def sample_program(size: int) -> list[str]:
+    """
+    A program of `size` commands cycling through the samples
+    """
+
+    lines = list(SAMPLES.values())
+    return [lines[i % len(lines)] for i in range(size)]
+
+
+def main() -> None:
+    arg_parser = ArgumentParser(description="Benchmark VM command translation.")
+    arg_parser.add_argument("--repeat", type=int, default=20000, metavar="N")
+    arg_parser.add_argument(
+        "--profile", action="store_true", help="profile translating a large program"
+    )
+    arg_parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="compare translating a large program with and without the translation cache",
+    )
+    args = arg_parser.parse_args()
+
+    print(f"{'command':<16}{'ns/command':>12}")
+    total = 0.0
+    for name, text in SAMPLES.items():
+        cost = time_command(text, args.repeat)
+        total += cost
+        print(f"{name:<16}{cost:>12.0f}")
+    print(f"{'mean':<16}{total / len(SAMPLES):>12.0f}")
+
+    if args.cache:
+        lines = sample_program(args.repeat * 5)
+        for cache in (None, TranslationCache()):
+            commands = parse_commands(lines, "Main.vm")
+            Command.label_count = 0
+            start = time.perf_counter_ns()
+            translate_commands(commands, cache)
+            cost = (time.perf_counter_ns() - start) / len(commands)
+            print(f"{'uncached' if cache is None else 'cached':<16}{cost:>12.0f}")
+        print(cache.format_stats())
+
+    if args.profile:
+        commands = parse_commands(sample_program(args.repeat * 5), "Main.vm")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        translate_commands(commands)
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(12)
+
+
+if __name__ == "__main__":
+    main()
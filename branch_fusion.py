@@ -0,0 +1,86 @@
+"""
+Branch fusion.  A comparison that only feeds an `if-goto` (optionally through `not`) is
+translated as a single conditional jump on the difference of the operands, rather than
+materializing a boolean on the stack and then testing it.
+"""
+
+from __future__ import annotations
+
+from command import Command
+from constants import COMMENT, CType
+from ir import Program
+
+# Jump taken when the comparison holds, and when it does not
+COMPARE_JUMPS = {"eq": ("JEQ", "JNE"), "gt": ("JGT", "JLE"), "lt": ("JLT", "JGE")}
+
+
+class FusedBranch(Command):
+    """
+    An `if-goto` together with the comparison (and any `not`s) that computed its
+    condition.  It is still an `if-goto` as far as the control-flow graph is concerned.
+
+    Attributes:
+        `compare` (str): the comparison command, one of eq, gt or lt
+        `negated` (bool): whether an odd number of `not`s inverts the comparison
+        `fused` (list[str]): the VM commands folded into this one, in order
+    """
+
+    def __init__(self, commands: list[Command]) -> None:
+        branch = commands[-1]
+        super().__init__(branch.command, branch.filename)
+        self.compare: str = commands[0].command
+        self.negated: bool = len(commands) % 2 == 1
+        self.fused: list[str] = [command.command for command in commands]
+
+    @property
+    def jump(self) -> str:
+        """
+        The jump mnemonic that branches when the original condition was true
+        """
+
+        return COMPARE_JUMPS[self.compare][self.negated]
+
+    def translate(self) -> None:
+        """
+        Pop both operands, compute x - y into D and jump on it
+        """
+
+        self.translation.extend(f"{COMMENT} {command}" for command in self.fused)
+        self.translation.extend(
+            [
+                "@SP",
+                "AM=M-1",
+                "D=M",
+                "A=A-1",
+                "D=M-D",
+                "@SP",
+                "M=M-1",
+                f"@{self.arg1}",
+                f"D;{self.jump}",
+            ]
+        )
+
+
+def fuse_branches_pass(program: Program) -> None:
+    """
+    Pass that replaces every comparison, `not`* , `if-goto` run at the end of a basic
+    block with a `FusedBranch`.  A label can only start a block, so nothing can jump
+    into the middle of the run.
+
+    Args:
+        `program` (Program): The program to rewrite in place
+    """
+
+    for function in program.functions:
+        for block in function.blocks:
+            commands = block.commands
+            if not commands or commands[-1].c_type != CType.IF:
+                continue
+            if type(commands[-1]) is not Command:  # pylint: disable=unidiomatic-typecheck
+                continue
+
+            start = len(commands) - 2
+            while start >= 0 and commands[start].command == "not":
+                start -= 1
+            if start >= 0 and commands[start].command in COMPARE_JUMPS:
+                block.commands[start:] = [FusedBranch(commands[start:])]
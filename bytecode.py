@@ -0,0 +1,346 @@
+"""
+Binary VM bytecode.  A pre-parsed form of a .vm file that loads without re-tokenizing
+text: every command is one byte holding its opcode and segment (or arithmetic operation),
+followed by varint operands, with label and function names interned in a string table.
+
+Layout:
+
+    header     magic "HVMB", version byte, source name, source size, source mtime in ns
+    strings    varint count, then each name as a varint length and UTF-8 bytes
+    commands   varint count, then each command as its code byte and operands:
+                   push/pop              varint index
+                   label/goto/if-goto    varint string
+                   function/call         varint string, varint count
+               The code byte is `opcode << 4 | operand`, where the operand is the
+               segment of a push/pop or the operation of an arithmetic command.
+
+Usage:
+    python bytecode.py FILE.vm [FILE.vm ...]     write FILE.vmb next to each file
+    python bytecode.py --dump FILE.vmb           print the commands of a bytecode file
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+import os
+
+from command import (
+    OP_ARITHMETIC,
+    OP_CALL,
+    OP_FUNCTION,
+    OP_POP,
+    OP_PUSH,
+    OP_RETURN,
+    OPCODES,
+    Command,
+)
+from compression import strip_compression
+from constants import ARITHMETIC_COMMANDS
+from vm_parser import parse_file
+
+BYTECODE_EXTENSION = ".vmb"
+CACHE_DIRECTORY = "__vmcache__"
+MAGIC = b"HVMB"
+VERSION = 1
+
+SEGMENT_CODES = ("constant", "local", "argument", "this", "that", "temp", "pointer", "static")
+OPERATIONS = tuple(ARITHMETIC_COMMANDS)
+KEYWORDS = {opcode: keyword for keyword, opcode in OPCODES.items() if opcode != OP_ARITHMETIC}
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def encode(lines: list[str], source: str = "", size: int = 0, mtime_ns: int = 0) -> bytes:
+    """
+    Encode parsed VM commands as bytecode.
+
+    Args:
+        `lines` (list[str]): The commands, as returned by `parse_file`
+        `source` (str): The name of the .vm file the commands come from
+        `size` (int): The size of the source file, to tell when the bytecode is stale
+        `mtime_ns` (int): The modification time of the source file
+
+    Returns:
+        bytes: The bytecode
+
+    Raises:
+        ValueError: If a command is not a valid VM command
+    """
+
+    strings: dict[str, int] = {}
+    body = bytearray()
+    for line in lines:
+        parts = line.split()
+        opcode = OPCODES.get(parts[0])
+        try:
+            if opcode == OP_ARITHMETIC and len(parts) == 1:
+                body.append(OP_ARITHMETIC << 4 | OPERATIONS.index(parts[0]))
+            elif opcode in (OP_PUSH, OP_POP) and len(parts) == 3:
+                body.append(opcode << 4 | SEGMENT_CODES.index(parts[1]))
+                _write_varint(body, int(parts[2]))
+            elif opcode == OP_RETURN and len(parts) == 1:
+                body.append(opcode << 4)
+            elif opcode not in (None, OP_ARITHMETIC, OP_RETURN) and len(parts) == 2 + (
+                opcode in (OP_FUNCTION, OP_CALL)
+            ):
+                body.append(opcode << 4)
+                _write_varint(body, strings.setdefault(parts[1], len(strings)))
+                if len(parts) == 3:
+                    _write_varint(body, int(parts[2]))
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"cannot encode VM command {line!r}") from None
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    encoded = source.encode("UTF-8")
+    _write_varint(out, len(encoded))
+    out += encoded
+    _write_varint(out, size)
+    _write_varint(out, mtime_ns)
+    _write_varint(out, len(strings))
+    for text in strings:
+        encoded = text.encode("UTF-8")
+        _write_varint(out, len(encoded))
+        out += encoded
+    _write_varint(out, len(lines))
+
+    return bytes(out + body)
+
+
+def read_header(data: bytes) -> tuple[str, int, int, int]:
+    """
+    Read the header of bytecode.
+
+    Returns:
+        tuple[str, int, int, int]: The source name, size and mtime, and the position
+            of the string table
+
+    Raises:
+        ValueError: If `data` is not bytecode of this version
+    """
+
+    if data[:4] != MAGIC or data[4:5] != bytes([VERSION]):
+        raise ValueError(f"not version {VERSION} VM bytecode")
+
+    length, position = _read_varint(data, 5)
+    source = data[position : position + length].decode("UTF-8")
+    size, position = _read_varint(data, position + length)
+    mtime_ns, position = _read_varint(data, position)
+
+    return source, size, mtime_ns, position
+
+
+def decode(data: bytes, filename: str | None = None) -> list[Command]:
+    """
+    Decode bytecode into commands ready to translate.
+
+    Args:
+        `data` (bytes): The bytecode
+        `filename` (str | None): The filename to give the commands, by default the
+            name of the source file the bytecode was made from
+
+    Returns:
+        list[Command]: The commands
+    """
+
+    source, _, _, position = read_header(data)
+    filename = source if filename is None else filename
+
+    n_strings, position = _read_varint(data, position)
+    strings = []
+    for _ in range(n_strings):
+        length, position = _read_varint(data, position)
+        strings.append(data[position : position + length].decode("UTF-8"))
+        position += length
+
+    prefixes = _prefixes()
+    n_operands = {code: _n_operands(code >> 4) for code in prefixes}
+
+    # Most programs are made of a few thousand distinct commands, so the text of each
+    # distinct encoding is only built once.  Commands without operands are keyed by their
+    # code byte alone, and one-byte operands, the common case, are found without a loop.
+    texts: dict[int | bytes, tuple[str, int]] = {
+        code: (prefixes[code], code >> 4) for code, n in n_operands.items() if n == 0
+    }
+    n_commands, position = _read_varint(data, position)
+    commands = []
+    append = commands.append
+    from_opcode = Command.from_opcode
+    for _ in range(n_commands):
+        code = data[position]
+        n = n_operands[code]
+        if n == 0:
+            position += 1
+            known = texts[code]
+        else:
+            start = position
+            position += 1
+            for _ in range(n):
+                while data[position] > 0x7F:
+                    position += 1
+                position += 1
+            encoding = data[start:position]
+            known = texts.get(encoding)
+            if known is None:
+                known = texts[encoding] = _command_text(data, start, prefixes, strings)
+        append(from_opcode(known[0], known[1], filename))
+
+    return commands
+
+
+def _prefixes() -> dict[int, str]:
+    """
+    The text of every code byte: the whole command for arithmetic and `return`, the
+    start of the command for the rest
+    """
+
+    prefixes = {}
+    for opcode, keyword in KEYWORDS.items():
+        if opcode in (OP_PUSH, OP_POP):
+            for segment, name in enumerate(SEGMENT_CODES):
+                prefixes[opcode << 4 | segment] = f"{keyword} {name} "
+        else:
+            prefixes[opcode << 4] = keyword if opcode == OP_RETURN else f"{keyword} "
+    for operation, name in enumerate(OPERATIONS):
+        prefixes[OP_ARITHMETIC << 4 | operation] = name
+
+    return prefixes
+
+
+def _n_operands(opcode: int) -> int:
+    if opcode in (OP_ARITHMETIC, OP_RETURN):
+        return 0
+    if opcode in (OP_FUNCTION, OP_CALL):
+        return 2
+    return 1
+
+
+def _command_text(
+    data: bytes, position: int, prefixes: dict[int, str], strings: list[str]
+) -> tuple[str, int]:
+    """
+    Decode the command at `position`.
+
+    Returns:
+        tuple[str, int]: The command's text and opcode
+    """
+
+    code = data[position]
+    opcode = code >> 4
+    if opcode in (OP_ARITHMETIC, OP_RETURN):
+        return prefixes[code], opcode
+
+    operand, position = _read_varint(data, position + 1)
+    if opcode in (OP_PUSH, OP_POP):
+        return f"{prefixes[code]}{operand}", opcode
+
+    text = prefixes[code] + strings[operand]
+    if opcode in (OP_FUNCTION, OP_CALL):
+        count, position = _read_varint(data, position)
+        text = f"{text} {count}"
+    return text, opcode
+
+
+def compile_file(file: str, target: str | None = None) -> str:
+    """
+    Convert a .vm file to bytecode.  A compressed file is named as the .vm file it holds,
+    so "Main.vm.gz" becomes "Main.vmb" with the statics of "Main.vm".
+
+    Args:
+        `file` (str): The .vm file
+        `target` (str | None): Where to write the bytecode, by default next to the file
+
+    Returns:
+        str: The bytecode file written
+    """
+
+    source = strip_compression(file)
+    target = target or os.path.splitext(source)[0] + BYTECODE_EXTENSION
+    stat = os.stat(file)
+    data = encode(parse_file(file), os.path.basename(source), stat.st_size, stat.st_mtime_ns)
+    with open(target, "wb") as f:
+        f.write(data)
+
+    return target
+
+
+def load_file(file: str) -> list[Command]:
+    """
+    Read the commands of a bytecode file.  They are named after the .vm file the
+    bytecode was made from, so static variables are the same as translating the text.
+    """
+
+    with open(file, "rb") as f:
+        return decode(f.read())
+
+
+def cached_commands(file: str) -> list[Command]:
+    """
+    Read a .vm file through its cached bytecode in a `__vmcache__` directory beside it.
+    The cache is used while the file's size and modification time match and rewritten
+    otherwise.
+
+    Args:
+        `file` (str): The .vm file
+
+    Returns:
+        list[Command]: The file's commands
+    """
+
+    directory, name = os.path.split(strip_compression(file))
+    stem = os.path.splitext(name)[0]
+    cache = os.path.join(directory, CACHE_DIRECTORY, stem + BYTECODE_EXTENSION)
+    stat = os.stat(file)
+    try:
+        with open(cache, "rb") as f:
+            data = f.read()
+        source, size, mtime_ns, _ = read_header(data)
+        if (source, size, mtime_ns) == (name, stat.st_size, stat.st_mtime_ns):
+            return decode(data)
+    except (OSError, ValueError):
+        pass
+
+    lines = parse_file(file)
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    with open(cache, "wb") as f:
+        f.write(encode(lines, name, stat.st_size, stat.st_mtime_ns))
+
+    return [Command(line, name) for line in lines]
+
+
+def main() -> None:
+    arg_parser = ArgumentParser(description="Convert .vm files to VM bytecode.")
+    arg_parser.add_argument("files", nargs="+", metavar="FILE")
+    arg_parser.add_argument(
+        "--dump", action="store_true", help="print the commands of .vmb files instead"
+    )
+    args = arg_parser.parse_args()
+
+    for file in args.files:
+        if args.dump:
+            for command in load_file(file):
+                print(command.command)
+        else:
+            print(compile_file(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,60 @@ from constants import (
     SEGMENTS,
 )
 
+# Opcodes index the dispatch table in `Command.translate`.  Comparing a small int is much
+# cheaper than comparing against `CType` members on the hot path.
+(
+    OP_ARITHMETIC,
+    OP_PUSH,
+    OP_POP,
+    OP_LABEL,
+    OP_GOTO,
+    OP_IF,
+    OP_FUNCTION,
+    OP_RETURN,
+    OP_CALL,
+) = range(9)
+
+OPCODES = {
+    **{name: OP_ARITHMETIC for name in ARITHMETIC_COMMANDS},
+    CType.PUSH.value: OP_PUSH,
+    CType.POP.value: OP_POP,
+    CType.LABEL.value: OP_LABEL,
+    CType.GOTO.value: OP_GOTO,
+    CType.IF.value: OP_IF,
+    CType.FUNCTION.value: OP_FUNCTION,
+    CType.RETURN.value: OP_RETURN,
+    CType.CALL.value: OP_CALL,
+}
+
+# `c_type` of each opcode
+C_TYPES = (
+    CType.ARITHMETIC,
+    CType.PUSH.value,
+    CType.POP.value,
+    CType.LABEL.value,
+    CType.GOTO.value,
+    CType.IF.value,
+    CType.FUNCTION.value,
+    CType.RETURN.value,
+    CType.CALL.value,
+)
+
+# Ready-made translations: arithmetic that needs no labels and the pushes of D and of the
+# registers saved by `call`
+PUSH_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
+PUSH_POINTERS = [
+    line for pointer in ("LCL", "ARG", "THIS", "THAT") for line in [f"@{pointer}", "D=M", *PUSH_D]
+]
+# Largest index popped into local/argument/this/that by stepping A up from the base with
+# `A=M+1` and `A=A+1`, which takes 5 + index instructions.  Past it, computing the address
+# in D and swapping the value in takes 9, and parking the address in R13 would take 12.
+POP_CHAIN_MAX = 3
+
+FIXED_ARITHMETIC = {
+    name: lines for name, lines in ARITHMETIC_COMMANDS.items() if name not in ("eq", "gt", "lt")
+}
+
 
 class Command:
     """
@@ -34,27 +88,47 @@ class Command:
             - function
             - return
             - call
+        `opcode` (int | None): small integer standing for `c_type` that indexes the
+            translation dispatch table, None for an unknown command
         `translation` (list[str]): the full translation of the command in multiple lines of
             ASM commands
+        `static_address` (int | None): RAM address assigned to a `static` segment access
+            by the static allocator.  When None the symbolic `Foo.i` reference is used.
     """
 
     label_count: int = 0
 
     def __init__(self, command: str, filename: str = "") -> None:
+        command_start = command.split(maxsplit=1)[0]
         self.command: str = command
-        self.c_type: str = self._set_type(command)
+        self.opcode: int | None = OPCODES.get(command_start)
+        self.c_type: str = CType.ARITHMETIC if self.opcode == OP_ARITHMETIC else command_start
         self.filename: str = filename
         self.translation: list[str] = []
+        self.static_address: int | None = None
         self._current_function: str = ""
 
+    @classmethod
+    def from_opcode(cls, command: str, opcode: int, filename: str = "") -> Command:
+        """
+        Build a command whose opcode is already known, as the bytecode reader does,
+        without tokenizing `command` again.  `command` must be in the canonical form
+        with single spaces between its parts.
+        """
+
+        self = cls.__new__(cls)
+        self.command = command
+        self.opcode = opcode
+        self.c_type = C_TYPES[opcode]
+        self.filename = filename
+        self.translation = []
+        self.static_address = None
+        self._current_function = ""
+        return self
+
     def __eq__(self, other) -> bool:
         return (self.command == other.command) and (self.c_type == other.c_type)
 
-    def _set_type(self, command: str) -> str:
-        if (command_start := command.split()[0]) in ARITHMETIC_COMMANDS.keys():
-            return CType.ARITHMETIC
-        return command_start
-
     @property
     def arg1(self) -> str:
         """
@@ -88,48 +162,32 @@ class Command:
         """
         Translates a command from its VM code to its assembly code
 
-        Start by appending the command itself as a comment, then use string formatting
-            to append the current `label_count` to any labels/references to labels.
+        Start by appending the command itself as a comment, then append the lines returned
+            by the handler for the command's `opcode`.  Handlers use string formatting to
+            append the current `label_count` to any labels/references to labels.
         """
 
-        self.translation.append(f"{COMMENT} {self.command}")
-
-        if self.c_type == CType.ARITHMETIC:
-            self._translate_arithmetic()
-        elif self.c_type == CType.PUSH:
-            self._translate_push()
-        elif self.c_type == CType.POP:
-            self._translate_pop()
-        elif self.c_type == CType.LABEL:
-            self._translate_label()
-        elif self.c_type == CType.GOTO:
-            self._translate_goto()
-        elif self.c_type == CType.IF:
-            self._translate_if_goto()
-        elif self.c_type == CType.FUNCTION:
-            self._translate_function()
-        elif self.c_type == CType.CALL:
-            self._translate_call()
-        elif self.c_type == CType.RETURN:
-            self._translate_return()
-        else:
+        if self.opcode is None:
             raise NotImplementedError
 
-    def _translate_arithmetic(self) -> None:
+        self.translation.append(f"{COMMENT} {self.command}")
+        self.translation.extend(_HANDLERS[self.opcode](self))
+
+    def _translate_arithmetic(self) -> list[str]:
         """
         Translate a command when its `CType` is arithmetic.
         """
 
-        translation = ARITHMETIC_COMMANDS[self.arg1]
-
-        self.translation.extend(
-            [line.format(Command.label_count) for line in translation]
-        )
+        fixed = FIXED_ARITHMETIC.get(self.command)
+        if fixed is not None:
+            return fixed
 
-        if self.arg1 in ("eq", "gt", "lt"):
-            Command.label_count += 1
+        label_count = Command.label_count
+        translation = [line.format(label_count) for line in ARITHMETIC_COMMANDS[self.command]]
+        Command.label_count += 1
+        return translation
 
-    def _translate_push(self) -> None:
+    def _translate_push(self) -> list[str]:
         """
         Translate a command when its `CType` is push.
 
@@ -145,320 +203,251 @@ class Command:
             M=M+1
         """
 
-        # All push operations have arg1 and arg2, so go ahead and assign to local variables
-        segment = self.arg1
-        index = int(self.arg2)
+        # All push operations have arg1 and arg2, so split them out once
+        _, segment, index_text = self.command.split()
+        index = int(index_text)
 
         # Implementation of `push constant n`
         if segment == "constant":
-            self.translation.extend(
-                [f"@{index}", "D=A", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
-            )
+            return [f"@{index}", "D=A", *PUSH_D]
 
         # Implementation of `push local/argument/this/that n`
         # Push item at LCL[index]/ARG[index]/THIS[index]/THAT[index] onto stack
-        elif segment in SEGMENTS.keys():
-            self.translation.extend(
-                [
-                    f"@{index}",
-                    "D=A",
-                    f"@{SEGMENTS[segment]}",
-                    "A=D+M",
-                    "D=M",
-                    "@SP",
-                    "A=M",
-                    "M=D",
-                    "@SP",
-                    "M=M+1",
-                ]
-            )
+        if segment in SEGMENTS:
+            return [f"@{index}", "D=A", f"@{SEGMENTS[segment]}", "A=D+M", "D=M", *PUSH_D]
 
         # Implementation of `push temp n`
         # Push item at RAM[5+index] onto stack
-        elif segment == "temp":
-            self.translation.extend(
-                [
-                    "@5",
-                    "D=A",
-                    f"@{index}",
-                    "A=D+A",
-                    "D=M",
-                    "@SP",
-                    "A=M",
-                    "M=D",
-                    "@SP",
-                    "M=M+1",
-                ]
-            )
+        if segment == "temp":
+            return [f"@R{5 + index}", "D=M", *PUSH_D]
 
         # Implementation of `push pointer 0/1`
         # Push item at THIS or THAT onto stack
-        elif segment == "pointer":
-            if index == 0:
-                self.translation.extend(
-                    ["@THIS", "D=M", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
-                )
-            else:
-                self.translation.extend(
-                    ["@THAT", "D=M", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
-                )
+        if segment == "pointer":
+            return ["@THIS" if index == 0 else "@THAT", "D=M", *PUSH_D]
 
         # Implementation of `push static n`
         # Push item at Foo.i onto the stack where Foo is the vm filename
         # and i is the index
-        elif segment == "static":
-            self.translation.extend(
-                [
-                    f"@{self.filename}.{index}",
-                    "D=M",
-                    "@SP",
-                    "A=M",
-                    "M=D",
-                    "@SP",
-                    "M=M+1",
-                ]
-            )
+        if segment == "static":
+            return [self.static_reference(index), "D=M", *PUSH_D]
 
-    def _translate_pop(self) -> None:
+        return []
+
+    def _translate_pop(self) -> list[str]:
         """
         Translate a command when its `CType` is pop. "Constant" memory segment
             does not have a pop method.
 
         Example:
-            `pop local 1` ->
-            // pop local 1
-            @1
-            D=A
-            @LCL
-            D=D+M
+            `pop local 2` ->
+            // pop local 2
             @SP
             AM=M-1
-            D=D+M
-            A=D-M
-            M=D-A
+            D=M
+            @LCL
+            A=M+1
+            A=A+1
+            M=D
         """
 
-        # Same as with push, all pop operations have arg1 and arg2; assign to local variables
-        segment = self.arg1
-        index = int(self.arg2)
+        # Same as with push, all pop operations have arg1 and arg2; split them out once
+        _, segment, index_text = self.command.split()
+        index = int(index_text)
 
         # Implementation of `pop local/argument/this/that n`
-        # Pop last item from stack into LCL[index]/ARG[index]/THIS[index]/THAT[index]
-        if segment in SEGMENTS.keys():
-            if index > 0:
-                self.translation.extend(
-                    [
-                        f"@{index}",
-                        "D=A",
-                        f"@{SEGMENTS[segment]}",
-                        "D=D+M",
-                        "@SP",
-                        "AM=M-1",
-                        "D=D+M",
-                        "A=D-M",
-                        "M=D-A",
-                    ]
-                )
-            else:
-                self.translation.extend(
-                    ["@SP", "AM=M-1", "D=M", f"@{SEGMENTS[segment]}", "A=M", "M=D"]
-                )
-
-        # Implementation of `pop temp n`
-        # Pop last item from stack into RAM[5+index]
-        elif segment == "temp":
-            self.translation.extend(
-                [
+        # Pop last item from stack into LCL[index]/ARG[index]/THIS[index]/THAT[index].
+        # Small indices step A up from the base; larger ones compute the address in D first
+        # and swap the popped value in with D=D+M / A=D-M / M=D-A
+        if segment in SEGMENTS:
+            if index > POP_CHAIN_MAX:
+                return [
                     f"@{index}",
                     "D=A",
-                    "@5",
-                    "D=D+A",
+                    f"@{SEGMENTS[segment]}",
+                    "D=D+M",
                     "@SP",
                     "AM=M-1",
                     "D=D+M",
                     "A=D-M",
                     "M=D-A",
                 ]
-            )
+            return [
+                "@SP",
+                "AM=M-1",
+                "D=M",
+                f"@{SEGMENTS[segment]}",
+                "A=M" if index == 0 else "A=M+1",
+                *(index - 1) * ["A=A+1"],
+                "M=D",
+            ]
+
+        # Implementation of `pop temp n`
+        # Pop last item from stack into RAM[5+index]
+        if segment == "temp":
+            return ["@SP", "AM=M-1", "D=M", f"@R{5 + index}", "M=D"]
 
         # Implementation of `pop pointer 0/1`
         # Pop last item from stack into THIS or THAT
-        elif segment == "pointer":
-            if index == 0:
-                self.translation.extend(["@SP", "AM=M-1", "D=M", "@THIS", "M=D"])
-            else:
-                self.translation.extend(["@SP", "AM=M-1", "D=M", "@THAT", "M=D"])
+        if segment == "pointer":
+            return ["@SP", "AM=M-1", "D=M", "@THIS" if index == 0 else "@THAT", "M=D"]
 
         # Implementation of `pop static n`
         # Pop last item from stack into variable Foo.i
         # where i is the index and Foo is the .vm filename
-        elif segment == "static":
-            self.translation.extend(
-                ["@SP", "AM=M-1", "D=M", f"@{self.filename}.{index}", "M=D"]
-            )
+        if segment == "static":
+            return ["@SP", "AM=M-1", "D=M", self.static_reference(index), "M=D"]
+
+        return []
 
-    def _translate_label(self) -> None:
+    def static_reference(self, index: int) -> str:
+        """
+        A-instruction addressing static variable `index` of this command's file.  Uses the
+        address assigned by the static allocator if there is one, otherwise the `Foo.i`
+        symbol that the assembler allocates.
+        """
+
+        if self.static_address is not None:
+            return f"@{self.static_address}"
+        return f"@{self.filename}.{index}"
+
+    def _translate_label(self) -> list[str]:
         """
         Should be of form `(functionName$label)` for labels inside of a function.
         Will be plain `(label)` otherwise
         """
 
+        label = self.command.split()[1]
         if self._current_function:
-            label = LABEL.format(f"{self._current_function}${self.arg1}")
-        else:
-            label = LABEL.format(self.arg1)
-
-        self.translation.append(label)
+            return [LABEL.format(f"{self._current_function}${label}")]
+        return [LABEL.format(label)]
 
-    def _translate_goto(self) -> None:
-        self.translation.extend([line.format(self.arg1) for line in GOTO])
+    def _translate_goto(self) -> list[str]:
+        label = self.command.split()[1]
+        return [line.format(label) for line in GOTO]
 
-    def _translate_if_goto(self) -> None:
-        self.translation.extend([line.format(self.arg1) for line in IF_GOTO])
+    def _translate_if_goto(self) -> list[str]:
+        label = self.command.split()[1]
+        return [line.format(label) for line in IF_GOTO]
 
-    def _translate_function(self) -> None:
-        self.translation.append(LABEL.format(self.arg1))
-        self._current_function = self.arg1
+    def _translate_function(self) -> list[str]:
+        _, function, n_vars = self.command.split()
+        self._current_function = function
 
         # If nVars is > 0, initialize all local variables to 0
-        # In other words, repeat self.arg2 times: push constant 0
-        if self.arg2 != "0":
-            self.translation.extend(
-                int(self.arg2) * ["@0", "D=A", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
-            )
-
-    def _translate_call(self) -> None:
-        self._current_function = self.arg1
-        n_args = int(self.arg2)
-        self.translation.extend(
-            [
-                # push the return address
-                f"@{self._current_function}$ret.{Command.label_count}",
-                "D=A",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # push LCL
-                "@LCL",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # push ARG
-                "@ARG",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # push THIS
-                "@THIS",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # push THAT
-                "@THAT",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # Set ARG = SP - n - 5
-                "@SP",
-                "D=M",
-                f"@{5 + n_args}",
-                "D=D-A",
-                "@ARG",
-                "M=D",
-                # Set LCL = SP
-                "@SP",
-                "D=M",
-                "@LCL",
-                "M=D",
-            ]
-        )
+        # In other words, repeat n_vars times: push constant 0
+        return [LABEL.format(function), *int(n_vars) * ["@0", "D=A", *PUSH_D]]
 
-        # goto function
-        self._translate_goto()
-
-        # (return-address) - declare the return-address label; this does not happen on the stack,
-        # this happens in the assembly code so we return just below where we 'goto' the function.
-        # Use the current label count to make them unique
-        self.translation.append(
-            LABEL.format(f"{self._current_function}$ret.{Command.label_count}")
-        )
+    def _translate_call(self) -> list[str]:
+        _, function, n_args = self.command.split()
+        self._current_function = function
+        return_label = f"{function}$ret.{Command.label_count}"
         Command.label_count += 1
 
-    def _translate_return(self) -> None:
-        self.translation.extend(
-            [
-                # endFrame
-                "@LCL",
-                "D=M",
-                "@R13",
-                "M=D",
-                # retAddr = endFrame - 5
-                "@5",
-                "D=D-A",
-                "A=D",
-                "D=M",
-                "@R14",
-                "M=D",  # R13=endFrame; R14=retAddr
-                # *ARG = pop()
-                "@SP",
-                "AM=M-1",
-                "D=M",
-                "@ARG",
-                "A=M",
-                "M=D",
-                # SP = ARG + 1
-                "@ARG",
-                "D=M+1",
-                "@SP",
-                "M=D",
-                # restore THAT
-                "@R13",
-                "D=M-1",
-                "A=D",
-                "D=M",
-                "@THAT",
-                "M=D",
-                # restore THIS
-                "@R13",
-                "D=M",
-                "@2",
-                "A=D-A",
-                "D=M",
-                "@THIS",
-                "M=D",
-                # restore ARG
-                "@R13",
-                "D=M",
-                "@3",
-                "A=D-A",
-                "D=M",
-                "@ARG",
-                "M=D",
-                # restore LCL
-                "@R13",
-                "D=M",
-                "@4",
-                "A=D-A",
-                "D=M",
-                "@LCL",
-                "M=D",
-                # goto retAddr
-                "@R14",
-                "A=M",
-                "0;JMP",
-            ]
-        )
+        return [
+            # push the return address
+            f"@{return_label}",
+            "D=A",
+            *PUSH_D,
+            # push LCL, ARG, THIS and THAT
+            *PUSH_POINTERS,
+            # Set ARG = SP - n - 5
+            "@SP",
+            "D=M",
+            f"@{5 + int(n_args)}",
+            "D=D-A",
+            "@ARG",
+            "M=D",
+            # Set LCL = SP
+            "@SP",
+            "D=M",
+            "@LCL",
+            "M=D",
+            # goto function
+            f"@{function}",
+            "0;JMP",
+            # (return-address) - declare the return-address label; this does not happen on
+            # the stack, this happens in the assembly code so we return just below where we
+            # 'goto' the function.  Use the label count to make them unique
+            LABEL.format(return_label),
+        ]
+
+    def _translate_return(self) -> list[str]:
+        return RETURN
+
+
+# The same for every `return`
+RETURN = [
+    # endFrame
+    "@LCL",
+    "D=M",
+    "@R13",
+    "M=D",
+    # retAddr = endFrame - 5
+    "@5",
+    "D=D-A",
+    "A=D",
+    "D=M",
+    "@R14",
+    "M=D",  # R13=endFrame; R14=retAddr
+    # *ARG = pop()
+    "@SP",
+    "AM=M-1",
+    "D=M",
+    "@ARG",
+    "A=M",
+    "M=D",
+    # SP = ARG + 1
+    "@ARG",
+    "D=M+1",
+    "@SP",
+    "M=D",
+    # restore THAT
+    "@R13",
+    "D=M-1",
+    "A=D",
+    "D=M",
+    "@THAT",
+    "M=D",
+    # restore THIS
+    "@R13",
+    "D=M",
+    "@2",
+    "A=D-A",
+    "D=M",
+    "@THIS",
+    "M=D",
+    # restore ARG
+    "@R13",
+    "D=M",
+    "@3",
+    "A=D-A",
+    "D=M",
+    "@ARG",
+    "M=D",
+    # restore LCL
+    "@R13",
+    "D=M",
+    "@4",
+    "A=D-A",
+    "D=M",
+    "@LCL",
+    "M=D",
+    # goto retAddr
+    "@R14",
+    "A=M",
+    "0;JMP",
+]
+
+# Translation handlers indexed by opcode
+_HANDLERS = (
+    Command._translate_arithmetic,
+    Command._translate_push,
+    Command._translate_pop,
+    Command._translate_label,
+    Command._translate_goto,
+    Command._translate_if_goto,
+    Command._translate_function,
+    Command._translate_return,
+    Command._translate_call,
+)
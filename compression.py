@@ -0,0 +1,65 @@
+"""
+Compressed input and output files.  A file is compressed when its name ends in one of
+`COMPRESSION_EXTENSIONS`, and is then read and written through the standard library codec
+for it as a text stream, so nothing is held in memory beyond the codec's own buffers.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+import os
+
+# The extension of each compression format and the standard library module for it.  The
+# modules are imported when first used since only compressed files need them.
+COMPRESSION_EXTENSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+
+# The formats `--compress` accepts
+COMPRESSION_FORMATS = tuple(extension[1:] for extension in COMPRESSION_EXTENSIONS)
+
+
+def compression_extension(path: str) -> str:
+    """
+    The compression extension `path` ends in, or "" for an uncompressed file
+    """
+
+    extension = os.path.splitext(path)[1]
+    return extension if extension in COMPRESSION_EXTENSIONS else ""
+
+
+def strip_compression(path: str) -> str:
+    """
+    `path` without its compression extension, e.g. "Main.vm" for "Main.vm.gz"
+    """
+
+    extension = compression_extension(path)
+    return path[: -len(extension)] if extension else path
+
+
+def compressed_name(path: str, compress: str | None) -> str:
+    """
+    `path` with the extension of the compression format `compress` added, unchanged when
+    `compress` is None
+    """
+
+    return path if compress is None else f"{path}.{compress}"
+
+
+def open_text(path: str, mode: str = "r"):
+    """
+    Open a text file in UTF-8, compressing or decompressing as its extension says.
+
+    Args:
+        `path` (str): The file to open
+        `mode` (str): "r", "w" or "a".  Appending to a compressed file adds a stream to it,
+            which its codec reads back as if the file had been written at once.
+
+    Returns:
+        TextIO: The open file
+    """
+
+    extension = compression_extension(path)
+    if not extension:
+        return open(path, mode, encoding="UTF-8")  # pylint: disable=consider-using-with
+
+    codec = import_module(COMPRESSION_EXTENSIONS[extension])
+    return codec.open(path, mode + "t", encoding="UTF-8")
@@ -40,6 +40,13 @@ ARG = 2
 THIS = 3
 THAT = 4
 
+# Instruction memory size of the Hack computer
+ROM_SIZE = 32768
+
+# Static segment bounds, RAM[16]-RAM[255]
+STATIC_BASE = 16
+STATIC_LIMIT = 240
+
 # Segment Abbreviations
 SEGMENTS = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
 
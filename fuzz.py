@@ -0,0 +1,588 @@
+"""
+Differential fuzzing of the optimizations.  Random well-formed VM programs are translated
+once with no options and once with each optimization, every translation is run on the
+Hack emulator, and the final memory of each optimized run is compared with the baseline.
+A program that exposes a difference is shrunk to a small reproducer.
+
+Generated programs follow the conventions of compiled Jack code: labels are unique, the
+call graph is acyclic, loops are counted, and temp values never live across a call.
+
+Usage:
+    python fuzz.py [--programs N] [--seed S] [--jobs N] [--config NAME] [--save DIR]
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from constants import COMMENT
+from hack_emulator import HackEmulator
+from translator import translate_path
+from VMTranslator import initialize_argparser
+
+# The command-line-arguments of each configuration checked against the baseline
+CONFIGURATIONS = {
+    "inline": ["--inline"],
+    "tail-calls": ["--tail-calls"],
+    "fuse-branches": ["--fuse-branches"],
+    "track-stack": ["--track-stack"],
+    "cache-bases": ["--cache-bases"],
+    "allocate-statics": ["--allocate-statics"],
+    "shared-stubs": ["--shared-stubs"],
+    "compact-calls": ["--compact-calls"],
+    "objects": ["--strip-unused"],
+    "translation-cache": ["--translation-cache", "16"],
+    "function-units": ["--function-units", "--tail-calls", "--shared-stubs"],
+    "pipeline": ["--pipeline", "--tail-calls", "--fuse-branches", "--track-stack"],
+    "O2": ["-O2"],
+    "Os": ["-Os"],
+    "all": [
+        "--inline",
+        "--tail-calls",
+        "--fuse-branches",
+        "--track-stack",
+        "--cache-bases",
+        "--allocate-statics",
+        "--shared-stubs",
+        "--compact-calls",
+        "--strip-unused",
+        "--translation-cache",
+    ],
+}
+
+FILES = ("Main.vm", "Util.vm")
+N_STATICS = 4
+# Functions using `this` point it at their own block of the heap; Sys.init points `that`
+# at the results block.  Both blocks are compared along with SP.
+HEAP_BASE = 3000
+HEAP_BLOCK = 16
+RESULT_BASE = 4000
+MAX_CYCLES = 200_000
+
+BINARY = ("add", "sub", "and", "or", "eq", "gt", "lt")
+UNARY = ("neg", "not")
+COMPARISONS = ("eq", "gt", "lt")
+
+
+class FuzzFunction:
+    """
+    A generated function
+
+    Attributes:
+        `name` (str): the function name
+        `filename` (str): the file the function is in
+        `n_args` (int): the number of arguments it takes
+        `n_locals` (int): the number of local variables it declares
+        `prologue` (list[str]): commands run before the statements
+        `statements` (list[list[str]]): self-contained groups of commands that leave the
+            stack as they found it, so any of them can be removed
+        `result` (list[str]): commands pushing the return value, then `return`
+    """
+
+    def __init__(self, name: str, filename: str, n_args: int, n_locals: int) -> None:
+        self.name: str = name
+        self.filename: str = filename
+        self.n_args: int = n_args
+        self.n_locals: int = n_locals
+        self.prologue: list[str] = []
+        self.statements: list[list[str]] = []
+        self.result: list[str] = []
+
+    def lines(self) -> list[str]:
+        """
+        The function's VM code
+        """
+
+        body = [line for statement in self.statements for line in statement]
+        return [f"function {self.name} {self.n_locals}", *self.prologue, *body, *self.result]
+
+    def copy(self) -> FuzzFunction:
+        """
+        A copy whose statement list can be changed independently
+        """
+
+        function = FuzzFunction(self.name, self.filename, self.n_args, self.n_locals)
+        function.prologue = self.prologue
+        function.statements = list(self.statements)
+        function.result = self.result
+        return function
+
+
+class FuzzProgram:
+    """
+    A generated program: Sys.init calls the other functions and stores the results, then
+    has every file copy its statics out so they can be compared
+
+    Attributes:
+        `functions` (list[FuzzFunction]): the functions, Sys.init first
+    """
+
+    def __init__(self, functions: list[FuzzFunction]) -> None:
+        self.functions: list[FuzzFunction] = functions
+
+    def files(self) -> dict[str, list[str]]:
+        """
+        The program's .vm files and their lines
+        """
+
+        files: dict[str, list[str]] = {}
+        for function in self.functions:
+            files.setdefault(function.filename, []).extend(function.lines())
+        return files
+
+    def size(self) -> int:
+        """
+        The number of VM commands in the program
+        """
+
+        return sum(len(lines) for lines in self.files().values())
+
+
+class _Generator:
+    """
+    Random program generator.  Labels are numbered across the whole program since the
+    translator does not scope them to functions.
+    """
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self.n_labels = 0
+
+    def label(self, prefix: str) -> str:
+        self.n_labels += 1
+        return f"{prefix}{self.n_labels}"
+
+    def constant(self) -> str:
+        value = self.rng.choice([0, 1, 2, self.rng.randrange(100), self.rng.randrange(32768)])
+        return f"push constant {value}"
+
+    def expression(self, function: FuzzFunction, callees: list[FuzzFunction], depth: int):
+        """
+        Commands that push exactly one value
+        """
+
+        rng = self.rng
+        choice = rng.randrange(10) if depth > 0 else rng.randrange(4)
+        if choice == 0:
+            return [self.constant()]
+        if choice == 1:
+            if function.n_args:
+                return [f"push argument {rng.randrange(function.n_args)}"]
+            return [self.constant()]
+        if choice == 2:
+            if function.n_locals:
+                return [f"push local {rng.randrange(function.n_locals)}"]
+            return [f"push static {rng.randrange(N_STATICS)}"]
+        if choice == 3:
+            if function.prologue:
+                return [f"push this {rng.randrange(HEAP_BLOCK)}"]
+            return [f"push static {rng.randrange(N_STATICS)}"]
+        if choice in (4, 5, 6):
+            return [
+                *self.expression(function, callees, depth - 1),
+                *self.expression(function, callees, depth - 1),
+                rng.choice(BINARY),
+            ]
+        if choice == 7:
+            return [*self.expression(function, callees, depth - 1), rng.choice(UNARY)]
+        if callees:
+            callee = rng.choice(callees)
+            arguments = [
+                line
+                for _ in range(callee.n_args)
+                for line in self.expression(function, callees, depth - 1)
+            ]
+            return [*arguments, f"call {callee.name} {callee.n_args}"]
+        return [self.constant()]
+
+    def condition(self, function: FuzzFunction, callees: list[FuzzFunction]) -> list[str]:
+        if self.rng.random() < 0.7:
+            return [
+                *self.expression(function, callees, 1),
+                *self.expression(function, callees, 1),
+                self.rng.choice(COMPARISONS),
+            ]
+        return self.expression(function, callees, 2)
+
+    def statement(
+        self,
+        function: FuzzFunction,
+        callees: list[FuzzFunction],
+        counter: int | None,
+        nested: bool = False,
+    ) -> list[str]:
+        """
+        Commands that leave the stack as they found it.  `counter` is the local reserved
+        for loops, which no other statement changes; loops are not nested.
+        """
+
+        rng = self.rng
+        writable = [i for i in range(function.n_locals) if i != counter]
+        choice = rng.randrange(7)
+        value = self.expression(function, callees, 2)
+        if choice == 0 and writable:
+            return [*value, f"pop local {rng.choice(writable)}"]
+        if choice == 1:
+            return [*value, f"pop static {rng.randrange(N_STATICS)}"]
+        if choice == 2 and function.prologue:
+            return [*value, f"pop this {rng.randrange(HEAP_BLOCK)}"]
+        if choice == 3 and writable:
+            # A temp value only lives between two commands, as in compiled Jack code
+            slot = rng.randrange(8)
+            return [*value, f"pop temp {slot}", f"push temp {slot}", f"pop local {writable[0]}"]
+        if choice == 4 and function.n_args:
+            return [*value, f"pop argument {rng.randrange(function.n_args)}"]
+        if choice == 5:
+            true, end = self.label("TRUE"), self.label("END")
+            return [
+                *self.condition(function, callees),
+                f"if-goto {true}",
+                *self.statement(function, callees, counter, nested),
+                f"goto {end}",
+                f"label {true}",
+                *self.statement(function, callees, counter, nested),
+                f"label {end}",
+            ]
+        if choice == 6 and counter is not None and not nested:
+            loop, done = self.label("LOOP"), self.label("DONE")
+            body = [
+                line
+                for _ in range(rng.randrange(1, 3))
+                for line in self.statement(function, callees, counter, nested=True)
+            ]
+            return [
+                f"push constant {rng.randrange(5)}",
+                f"pop local {counter}",
+                f"label {loop}",
+                f"push local {counter}",
+                "push constant 0",
+                "eq",
+                f"if-goto {done}",
+                *body,
+                f"push local {counter}",
+                "push constant 1",
+                "sub",
+                f"pop local {counter}",
+                f"goto {loop}",
+                f"label {done}",
+            ]
+        return [*value, f"pop static {rng.randrange(N_STATICS)}"]
+
+    def function(self, index: int, callees: list[FuzzFunction]) -> FuzzFunction:
+        rng = self.rng
+        filename = rng.choice(FILES)
+        name = f"{filename[:-3]}.f{index}"
+        leaf = rng.random() < 0.3
+        function = FuzzFunction(name, filename, rng.randrange(4), 0 if leaf else rng.randrange(4))
+        if leaf:
+            function.result = [*self.expression(function, [], 2), "return"]
+            return function
+
+        if rng.random() < 0.4:
+            function.prologue = [f"push constant {HEAP_BASE + index * HEAP_BLOCK}", "pop pointer 0"]
+        counter = function.n_locals - 1 if function.n_locals else None
+        function.statements = [
+            self.statement(function, callees, counter) for _ in range(rng.randrange(1, 6))
+        ]
+        if callees and rng.random() < 0.3:
+            # A tail call
+            callee = rng.choice(callees)
+            arguments = [
+                line
+                for _ in range(callee.n_args)
+                for line in self.expression(function, callees, 1)
+            ]
+            function.result = [*arguments, f"call {callee.name} {callee.n_args}", "return"]
+        else:
+            function.result = [*self.expression(function, callees, 2), "return"]
+        return function
+
+
+def generate_program(seed: int, n_functions: int = 5) -> FuzzProgram:
+    """
+    Generate a random well-formed program.  Each function only calls functions
+    generated before it, so every program terminates.
+
+    Args:
+        `seed` (int): The seed; the same seed always gives the same program
+        `n_functions` (int): The number of functions besides Sys.init
+
+    Returns:
+        FuzzProgram: The program
+    """
+
+    generator = _Generator(random.Random(seed))
+    functions: list[FuzzFunction] = []
+    for index in range(n_functions):
+        functions.append(generator.function(index, functions))
+
+    sys_init = FuzzFunction("Sys.init", "Sys.vm", 0, 0)
+    sys_init.prologue = [f"push constant {RESULT_BASE}", "pop pointer 1"]
+    for i, function in enumerate(functions):
+        arguments = [generator.constant() for _ in range(function.n_args)]
+        sys_init.statements.append(
+            [*arguments, f"call {function.name} {function.n_args}", f"pop that {i}"]
+        )
+    sys_init.result = []
+    for i, filename in enumerate(FILES):
+        dump = FuzzFunction(f"{filename[:-3]}.dump", filename, 0, 0)
+        base = len(functions) + i * N_STATICS
+        for index in range(N_STATICS):
+            dump.statements.append([f"push static {index}", f"pop that {base + index}"])
+        dump.result = ["push constant 0", "return"]
+        functions.append(dump)
+        sys_init.result.extend([f"call {dump.name} 0", "pop temp 0"])
+    sys_init.result.extend(["label HALT", "goto HALT"])
+
+    return FuzzProgram([sys_init] + functions)
+
+
+def run_program(
+    program: FuzzProgram, flags: list[str], max_cycles: int = MAX_CYCLES
+) -> list[int] | str:
+    """
+    Translate a program with the given command-line-arguments and run it.
+
+    Returns:
+        list[int] | str: SP, the heap and the results once the program halts, or a
+            description of what went wrong
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        project = os.path.join(directory, "Fuzz")
+        os.mkdir(project)
+        for filename, lines in program.files().items():
+            with open(os.path.join(project, filename), "w", encoding="UTF-8") as f:
+                f.write("\n".join(lines) + "\n")
+        try:
+            result = translate_path(project, initialize_argparser().parse_args([project, *flags]))
+            with open(result.out_file_name, "r", encoding="UTF-8") as f:
+                emulator = HackEmulator(f.read().split("\n"))
+            emulator.run(max_cycles)
+        except Exception as error:  # pylint: disable=broad-except
+            # A crash anywhere in translation is as much a finding as a wrong result
+            return f"{type(error).__name__}: {error}"
+
+    n_results = len(program.functions) + len(FILES) * N_STATICS
+    heap_size = len(program.functions) * HEAP_BLOCK
+    return (
+        emulator.ram[:1]
+        + emulator.ram[HEAP_BASE : HEAP_BASE + heap_size]
+        + emulator.ram[RESULT_BASE : RESULT_BASE + n_results]
+    )
+
+
+def shrink(program: FuzzProgram, fails: Callable[[FuzzProgram], bool]) -> FuzzProgram:
+    """
+    Shrink a failing program by removing statements, simplifying return values and
+    dropping functions nothing calls, for as long as it keeps failing.
+
+    Args:
+        `program` (FuzzProgram): A program for which `fails` is true
+        `fails` (Callable[[FuzzProgram], bool]): Whether a candidate still fails
+
+    Returns:
+        FuzzProgram: The smallest failing program found
+    """
+
+    changed = True
+    while changed:
+        changed = False
+        for candidate in _candidates(program):
+            if fails(candidate):
+                program = candidate
+                changed = True
+                break
+
+    return program
+
+
+def _candidates(program: FuzzProgram):
+    """
+    Programs one step smaller than `program`, the biggest steps first
+    """
+
+    called = {
+        line.split()[1]
+        for function in program.functions
+        for line in function.lines()
+        if line.startswith("call ")
+    }
+    for i, function in enumerate(program.functions):
+        if i > 0 and function.name not in called:
+            yield FuzzProgram(program.functions[:i] + program.functions[i + 1 :])
+
+    for i, function in enumerate(program.functions):
+        for j in range(len(function.statements)):
+            smaller = function.copy()
+            del smaller.statements[j]
+            yield FuzzProgram(program.functions[:i] + [smaller] + program.functions[i + 1 :])
+        if function.result[:-1] not in ([], ["push constant 0"]) and function.name != "Sys.init":
+            smaller = function.copy()
+            smaller.result = ["push constant 0", "return"]
+            yield FuzzProgram(program.functions[:i] + [smaller] + program.functions[i + 1 :])
+
+
+class FuzzFailure:
+    """
+    A configuration that changed what a program computes
+
+    Attributes:
+        `seed` (int): the seed of the original program
+        `configuration` (str): the configuration's name
+        `reason` (str): how the optimized run differed
+        `program` (FuzzProgram): the shrunk reproducer
+    """
+
+    def __init__(self, seed: int, configuration: str, reason: str, program: FuzzProgram):
+        self.seed: int = seed
+        self.configuration: str = configuration
+        self.reason: str = reason
+        self.program: FuzzProgram = program
+
+    def format(self) -> str:
+        """
+        Format the failure with its reproducer
+        """
+
+        lines = [f"seed {self.seed}, {self.configuration}: {self.reason}"]
+        for filename, vm_lines in self.program.files().items():
+            lines.append(f"  {COMMENT} {filename}")
+            lines.extend(f"  {line}" for line in vm_lines)
+        return "\n".join(lines)
+
+
+def _difference(expected: list[int], actual: list[int] | str) -> str | None:
+    if isinstance(actual, str):
+        return actual
+    if actual != expected:
+        position = next(i for i, (a, b) in enumerate(zip(expected, actual)) if a != b)
+        return (
+            f"word {position} of the final state is {actual[position]}, "
+            f"expected {expected[position]}"
+        )
+    return None
+
+
+def check_seed(seed: int, configurations: list[str], max_cycles: int = MAX_CYCLES):
+    """
+    Generate the program for `seed` and check every configuration against the baseline.
+
+    Returns:
+        tuple[int, bool, list[FuzzFailure]]: The seed, whether the program was skipped
+            because the baseline did not halt in time, and the failures
+    """
+
+    program = generate_program(seed)
+    expected = run_program(program, [], max_cycles)
+    if isinstance(expected, str):
+        return seed, True, []
+
+    failures = []
+    for name in configurations:
+        flags = CONFIGURATIONS[name]
+        reason = _difference(expected, run_program(program, flags, max_cycles))
+        if reason is None:
+            continue
+
+        def fails(candidate: FuzzProgram, flags=flags) -> bool:
+            baseline = run_program(candidate, [], max_cycles)
+            return not isinstance(baseline, str) and _difference(
+                baseline, run_program(candidate, flags, max_cycles)
+            ) is not None
+
+        small = shrink(program, fails)
+        reason = _difference(
+            run_program(small, [], max_cycles), run_program(small, flags, max_cycles)
+        )
+        failures.append(FuzzFailure(seed, name, reason or "", small))
+
+    return seed, False, failures
+
+
+def fuzz(
+    seeds: list[int], configurations: list[str], jobs: int = 0, max_cycles: int = MAX_CYCLES
+) -> tuple[int, list[FuzzFailure]]:
+    """
+    Check the programs for every seed, in parallel when more than one job is allowed.
+
+    Args:
+        `seeds` (list[int]): The seeds of the programs to check
+        `configurations` (list[str]): The names of the configurations to check
+        `jobs` (int): The number of worker processes, 0 for one per CPU
+        `max_cycles` (int): Programs that run longer than this are skipped
+
+    Returns:
+        tuple[int, list[FuzzFailure]]: The number of programs skipped and the failures
+    """
+
+    jobs = min(jobs or os.cpu_count() or 1, len(seeds))
+    n = len(seeds)
+    if jobs <= 1:
+        results = [check_seed(seed, configurations, max_cycles) for seed in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(
+                executor.map(
+                    check_seed,
+                    seeds,
+                    [configurations] * n,
+                    [max_cycles] * n,
+                    chunksize=max(1, n // (jobs * 4)),
+                )
+            )
+
+    skipped = sum(result[1] for result in results)
+    return skipped, [failure for result in results for failure in result[2]]
+
+
+def main() -> None:
+    arg_parser = ArgumentParser(
+        description="Check optimized translations against the baseline on random programs."
+    )
+    arg_parser.add_argument("--programs", type=int, default=200, metavar="N")
+    arg_parser.add_argument("--seed", type=int, default=0, help="seed of the first program")
+    arg_parser.add_argument("--jobs", type=int, default=0, metavar="N")
+    arg_parser.add_argument(
+        "--config",
+        action="append",
+        choices=sorted(CONFIGURATIONS),
+        help="configuration to check; may be repeated (default: all)",
+    )
+    arg_parser.add_argument("--max-cycles", type=int, default=MAX_CYCLES, metavar="N")
+    arg_parser.add_argument(
+        "--save", metavar="DIR", help="write each shrunk reproducer to a directory in DIR"
+    )
+    args = arg_parser.parse_args()
+
+    configurations = args.config or list(CONFIGURATIONS)
+    seeds = list(range(args.seed, args.seed + args.programs))
+    start = time.perf_counter()
+    skipped, failures = fuzz(seeds, configurations, args.jobs, args.max_cycles)
+    seconds = time.perf_counter() - start
+
+    for failure in failures:
+        print(failure.format())
+        if args.save:
+            directory = os.path.join(args.save, f"seed{failure.seed}-{failure.configuration}")
+            os.makedirs(directory, exist_ok=True)
+            for filename, lines in failure.program.files().items():
+                with open(os.path.join(directory, filename), "w", encoding="UTF-8") as f:
+                    f.write("\n".join(lines) + "\n")
+    print(
+        f"{len(seeds)} programs, {skipped} skipped, {len(failures)} failures "
+        f"in {seconds:.1f} s ({len(seeds) * 60 / seconds:.0f} programs/min)"
+    )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
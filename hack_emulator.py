@@ -0,0 +1,214 @@
+"""
+Minimal Hack assembler and CPU emulator.  Used to run translated programs so that
+optimized output can be checked against the baseline translation and its cost measured
+in executed instructions (cycles).
+"""
+
+from __future__ import annotations
+
+from constants import COMMENT, ROM_SIZE
+
+RAM_SIZE = 32768
+WORD_MASK = 0xFFFF
+VARIABLE_BASE = 16
+
+PREDEFINED_SYMBOLS = {
+    "SP": 0,
+    "LCL": 1,
+    "ARG": 2,
+    "THIS": 3,
+    "THAT": 4,
+    "SCREEN": 16384,
+    "KBD": 24576,
+    **{f"R{i}": i for i in range(16)},
+}
+
+# Computations of the C-instruction, written in terms of a (A or M), d and the
+# other register where needed.  Results are masked to 16 bits by the CPU.
+COMPUTATIONS = {
+    "0": lambda a, d: 0,
+    "1": lambda a, d: 1,
+    "-1": lambda a, d: -1,
+    "D": lambda a, d: d,
+    "X": lambda a, d: a,
+    "!D": lambda a, d: ~d,
+    "!X": lambda a, d: ~a,
+    "-D": lambda a, d: -d,
+    "-X": lambda a, d: -a,
+    "D+1": lambda a, d: d + 1,
+    "X+1": lambda a, d: a + 1,
+    "D-1": lambda a, d: d - 1,
+    "X-1": lambda a, d: a - 1,
+    "D+X": lambda a, d: d + a,
+    "D-X": lambda a, d: d - a,
+    "X-D": lambda a, d: a - d,
+    "D&X": lambda a, d: d & a,
+    "D|X": lambda a, d: d | a,
+}
+
+# Alternative spellings the assembler accepts for commutative computations
+COMPUTATION_ALIASES = {"1+D": "D+1", "1+X": "X+1", "X+D": "D+X", "X&D": "D&X", "X|D": "D|X"}
+
+JUMPS = {
+    "": lambda out: False,
+    "JGT": lambda out: out > 0,
+    "JEQ": lambda out: out == 0,
+    "JGE": lambda out: out >= 0,
+    "JLT": lambda out: out < 0,
+    "JNE": lambda out: out != 0,
+    "JLE": lambda out: out <= 0,
+    "JMP": lambda out: True,
+}
+
+
+class EmulatorError(Exception):
+    """
+    Raised for malformed assembly or a program that does not halt within its cycle budget
+    """
+
+
+def assemble(lines: list[str]) -> tuple[list[tuple], dict[str, int]]:
+    """
+    Assemble Hack assembly into decoded instructions ready for `HackEmulator`.
+
+    A-instructions decode to `(None, value)` and C-instructions to
+    `(computation, uses_m, dest_a, dest_d, dest_m, jump)`.
+
+    Args:
+        `lines` (list[str]): Lines of Hack assembly, comments and labels allowed
+
+    Returns:
+        tuple[list[tuple], dict[str, int]]: The decoded ROM and the symbol table
+    """
+
+    instructions = []
+    symbols = dict(PREDEFINED_SYMBOLS)
+    for line in lines:
+        line = line.split(COMMENT)[0].strip()
+        if not line:
+            continue
+        if line[0] == "(":
+            symbols[line[1:-1]] = len(instructions)
+        else:
+            instructions.append(line)
+
+    if len(instructions) > ROM_SIZE:
+        raise EmulatorError(f"Program has {len(instructions)} instructions, ROM holds {ROM_SIZE}")
+
+    rom = []
+    next_variable = VARIABLE_BASE
+    for instruction in instructions:
+        if instruction[0] == "@":
+            value = instruction[1:]
+            if value.isdigit():
+                rom.append((None, int(value)))
+                continue
+            if value not in symbols:
+                symbols[value] = next_variable
+                next_variable += 1
+            rom.append((None, symbols[value]))
+        else:
+            rom.append(_decode_c_instruction(instruction))
+
+    return rom, symbols
+
+
+def _decode_c_instruction(instruction: str) -> tuple:
+    dest, _, rest = instruction.rpartition("=")
+    comp, _, jump = rest.partition(";")
+    comp = comp.replace(" ", "")
+    uses_m = "M" in comp
+    comp = comp.replace("M", "X").replace("A", "X")
+    comp = COMPUTATION_ALIASES.get(comp, comp)
+
+    if comp not in COMPUTATIONS or jump not in JUMPS:
+        raise EmulatorError(f"Invalid instruction: {instruction}")
+
+    return (COMPUTATIONS[comp], uses_m, "A" in dest, "D" in dest, "M" in dest, JUMPS[jump])
+
+
+class HackEmulator:
+    """
+    Executes assembled Hack programs
+
+    Attributes:
+        `rom` (list[tuple]): the decoded program
+        `symbols` (dict[str, int]): the assembler's symbol table
+        `ram` (list[int]): data memory, each word stored unsigned
+        `pc` (int): program counter
+        `a` (int): A register
+        `d` (int): D register
+        `cycles` (int): the number of instructions executed so far
+    """
+
+    def __init__(self, lines: list[str]) -> None:
+        self.rom, self.symbols = assemble(lines)
+        self.ram: list[int] = [0] * RAM_SIZE
+        self.pc: int = 0
+        self.a: int = 0
+        self.d: int = 0
+        self.cycles: int = 0
+
+    def run(self, max_cycles: int = 10_000_000) -> int:
+        """
+        Run until the program halts, either by running off the end of the ROM or by
+        entering the `(END) @END 0;JMP` style infinite loop.
+
+        Args:
+            `max_cycles` (int): The number of instructions after which to give up
+
+        Returns:
+            int: The total number of instructions executed
+
+        Raises:
+            EmulatorError: If the program does not halt within `max_cycles`
+        """
+
+        rom, ram = self.rom, self.ram
+        pc, a, d, cycles = self.pc, self.a, self.d, self.cycles
+        end = len(rom)
+        limit = cycles + max_cycles
+
+        while pc < end:
+            if cycles >= limit:
+                self.pc, self.a, self.d, self.cycles = pc, a, d, cycles
+                raise EmulatorError(f"Program did not halt within {max_cycles} cycles")
+
+            cycles += 1
+            instruction = rom[pc]
+            compute = instruction[0]
+            if compute is None:
+                a = instruction[1]
+                pc += 1
+                continue
+
+            _, uses_m, dest_a, dest_d, dest_m, jump = instruction
+            out = compute(ram[a & 0x7FFF] if uses_m else a, d) & WORD_MASK
+            if dest_m:
+                ram[a & 0x7FFF] = out
+            address = a
+            if dest_a:
+                a = out
+            if dest_d:
+                d = out
+
+            if jump(out - 0x10000 if out & 0x8000 else out):
+                # A jump back to the A-instruction that loaded its own address is the
+                # conventional halt loop
+                if address == pc - 1 and rom[address] == (None, address):
+                    pc += 1
+                    break
+                pc = address
+            else:
+                pc += 1
+
+        self.pc, self.a, self.d, self.cycles = pc, a, d, cycles
+        return cycles
+
+    def word(self, address: int) -> int:
+        """
+        Read a RAM word as a signed 16-bit value
+        """
+
+        value = self.ram[address]
+        return value - 0x10000 if value & 0x8000 else value
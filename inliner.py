@@ -0,0 +1,186 @@
+"""
+Inlining of small leaf functions.  A call to a short, straight-line function that calls
+nothing else is replaced with the function's body, saving the cost of building and
+tearing down a frame.
+"""
+
+from __future__ import annotations
+
+from command import Command
+from constants import ARITHMETIC_COMMANDS, CType
+
+INLINE_MAX_SIZE = 8
+
+# Arithmetic commands that leave the stack depth unchanged; the rest are binary
+UNARY_COMMANDS = ("neg", "not")
+
+# Segments an inlined body may use.  `local` is excluded since leaf candidates
+# have no locals, and `argument` is remapped to temp.  All but `constant` can be popped.
+INLINE_SEGMENTS = ("constant", "argument", "static", "this", "that", "pointer", "temp")
+TEMP_SIZE = 8
+
+
+class LeafFunction:
+    """
+    A function that can be inlined at its call sites
+
+    Attributes:
+        `name` (str): the function name
+        `body` (list[Command]): the commands between `function` and `return`
+        `max_argument` (int): the highest argument index the body reads, or -1
+        `pointers` (set[int]): the pointer indices the body pops, which must be saved
+            and restored around the inlined body as `return` would have done
+    """
+
+    def __init__(self, name: str, body: list[Command]) -> None:
+        self.name: str = name
+        self.body: list[Command] = body
+        self.max_argument: int = -1
+        self.pointers: set[int] = set()
+
+        for command in body:
+            if command.c_type in (CType.PUSH, CType.POP):
+                index = int(command.arg2)
+                if command.arg1 == "argument":
+                    self.max_argument = max(self.max_argument, index)
+                elif command.arg1 == "pointer" and command.c_type == CType.POP:
+                    self.pointers.add(index)
+
+
+def find_leaf_functions(
+    commands: list[Command], max_size: int = INLINE_MAX_SIZE
+) -> dict[str, LeafFunction]:
+    """
+    Find the functions that can be inlined: no local variables, a straight-line body of
+    at most `max_size` push/pop/arithmetic commands ending in the function's only
+    `return`, and a body that leaves exactly one value on its own stack.
+
+    Args:
+        `commands` (list[Command]): Every parsed command of the program
+        `max_size` (int): The largest body, in VM commands, that will be inlined
+
+    Returns:
+        dict[str, LeafFunction]: The inlinable functions by name
+    """
+
+    leaves = {}
+    starts = [i for i, command in enumerate(commands) if command.c_type == CType.FUNCTION]
+    for start, end in zip(starts, starts[1:] + [len(commands)]):
+        function = commands[start]
+        body = commands[start + 1 : end - 1]
+        if (
+            function.arg2 == "0"
+            and end - start >= 2
+            and commands[end - 1].c_type == CType.RETURN
+            and len(body) <= max_size
+            and _is_straight_line(body)
+        ):
+            leaves[function.arg1] = LeafFunction(function.arg1, body)
+
+    return leaves
+
+
+def _is_straight_line(body: list[Command]) -> bool:
+    """
+    Check that a body only moves data and computes, and that its stack never dips below
+    where it started and finishes one item higher (the return value)
+    """
+
+    depth = 0
+    for command in body:
+        if command.c_type == CType.PUSH and command.arg1 in INLINE_SEGMENTS:
+            depth += 1
+        elif command.c_type == CType.POP and command.arg1 in INLINE_SEGMENTS[1:]:
+            depth -= 1
+        elif command.c_type == CType.ARITHMETIC and command.arg1 in ARITHMETIC_COMMANDS:
+            depth -= 0 if command.arg1 in UNARY_COMMANDS else 1
+        else:
+            return False
+
+        if depth < 0:
+            return False
+
+    return depth == 1
+
+
+def inline_calls(
+    commands: list[Command], max_size: int = INLINE_MAX_SIZE
+) -> list[Command]:
+    """
+    Replace calls to small leaf functions with the function body.
+
+    The arguments on the stack are popped into temp slots and the body's `argument`
+    accesses are remapped to those slots.  Only temp slots that no function of the
+    program uses are taken, since a caller may keep a value in temp across a call; a
+    call site that needs more slots than are free is left alone.  Pointers the body
+    changes are saved beforehand and restored afterwards, as the frame would have done.
+    The function definitions themselves are kept since they may still be called from
+    elsewhere.
+
+    Args:
+        `commands` (list[Command]): Every parsed command of the program
+        `max_size` (int): The largest body, in VM commands, that will be inlined
+
+    Returns:
+        list[Command]: The program with inlinable call sites expanded
+    """
+
+    leaves = find_leaf_functions(commands, max_size)
+    if not leaves:
+        return commands
+
+    # Take temp slots from the top down, away from the commonly used temp 0
+    used = {
+        int(command.arg2)
+        for command in commands
+        if command.c_type in (CType.PUSH, CType.POP) and command.arg1 == "temp"
+    }
+    free = [i for i in reversed(range(TEMP_SIZE)) if i not in used]
+
+    inlined = []
+    for command in commands:
+        leaf = leaves.get(command.arg1) if command.c_type == CType.CALL else None
+        expansion = _expand(leaf, int(command.arg2), free) if leaf else None
+        if expansion is None:
+            inlined.append(command)
+        else:
+            inlined.extend(expansion)
+
+    return inlined
+
+
+def _expand(leaf: LeafFunction, n_args: int, free: list[int]) -> list[Command] | None:
+    """
+    Build the inlined commands for a call to `leaf` with `n_args` arguments using the
+    temp slots `free`, or None if this call site cannot be inlined
+    """
+
+    if leaf.max_argument >= n_args:
+        return None
+
+    if n_args + len(leaf.pointers) > len(free):
+        return None
+    arguments = free[:n_args]
+    saved = dict(zip(sorted(leaf.pointers), free[n_args:]))
+
+    filename = leaf.body[0].filename if leaf.body else ""
+    lines = []
+    for pointer, slot in saved.items():
+        lines.extend([f"push pointer {pointer}", f"pop temp {slot}"])
+    for index in reversed(range(n_args)):
+        lines.append(f"pop temp {arguments[index]}")
+
+    expansion = [Command(line, filename) for line in lines]
+    for command in leaf.body:
+        if command.c_type in (CType.PUSH, CType.POP) and command.arg1 == "argument":
+            text = f"{command.c_type} temp {arguments[int(command.arg2)]}"
+            expansion.append(Command(text, command.filename))
+        else:
+            expansion.append(Command(command.command, command.filename))
+
+    for pointer, slot in saved.items():
+        expansion.extend(
+            [Command(f"push temp {slot}", filename), Command(f"pop pointer {pointer}", filename)]
+        )
+
+    return expansion
@@ -0,0 +1,245 @@
+"""
+Intermediate representation of a parsed program: functions made of basic blocks joined by
+control-flow edges, plus a pass manager that runs optimization and analysis passes over
+it before code generation.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+
+from command import Command
+from constants import CType
+from tail_calls import TailCall
+
+# Commands that end a basic block
+TERMINATORS = (CType.GOTO, CType.IF, CType.CALL, CType.RETURN)
+
+
+class BasicBlock:
+    """
+    A straight-line run of commands that is only entered at the top and only left at
+    the bottom
+
+    Attributes:
+        `commands` (list[Command]): the commands in the block, a `label` can only be first
+        `successors` (list[BasicBlock]): blocks control can pass to from this block, the
+            branch target before the fallthrough block
+        `predecessors` (list[BasicBlock]): blocks that can pass control to this block
+    """
+
+    def __init__(self, commands: list[Command]) -> None:
+        self.commands: list[Command] = commands
+        self.successors: list[BasicBlock] = []
+        self.predecessors: list[BasicBlock] = []
+
+    def __repr__(self) -> str:
+        return f"BasicBlock({self.label or ''!r}, {len(self.commands)} commands)"
+
+    @property
+    def label(self) -> str | None:
+        """
+        The VM label that starts the block, if any
+        """
+
+        if self.commands and self.commands[0].c_type == CType.LABEL:
+            return self.commands[0].arg1
+        return None
+
+    @property
+    def terminator(self) -> Command | None:
+        """
+        The branch, call or return that ends the block, if any
+        """
+
+        if self.commands and self.commands[-1].c_type in TERMINATORS:
+            return self.commands[-1]
+        return None
+
+    @property
+    def falls_through(self) -> bool:
+        """
+        Whether control can run off the end of the block into the next one
+        """
+
+        terminator = self.terminator
+        return terminator is None or (
+            terminator.c_type in (CType.IF, CType.CALL) and not isinstance(terminator, TailCall)
+        )
+
+
+class Function:
+    """
+    A VM function split into basic blocks.  Commands before the first `function` of a
+    file-less program are kept in a function with an empty name and no header.
+
+    Attributes:
+        `name` (str): the function name
+        `header` (Command | None): the `function` command
+        `blocks` (list[BasicBlock]): the blocks in program order, the entry block first
+    """
+
+    def __init__(self, header: Command | None, commands: list[Command]) -> None:
+        self.header: Command | None = header
+        self.name: str = header.arg1 if header else ""
+        self.blocks: list[BasicBlock] = []
+        self.rebuild(commands)
+
+    def __repr__(self) -> str:
+        return f"Function({self.name!r}, {len(self.blocks)} blocks)"
+
+    @property
+    def n_vars(self) -> int:
+        """
+        The number of local variables the function declares
+        """
+
+        return int(self.header.arg2) if self.header else 0
+
+    def commands(self) -> list[Command]:
+        """
+        The commands of the body (without the header) in program order
+        """
+
+        return [command for block in self.blocks for command in block.commands]
+
+    def rebuild(self, commands: list[Command]) -> None:
+        """
+        Split `commands` into basic blocks and link up their edges.  Passes that change
+        control flow call this with the function's new body.
+        """
+
+        self.blocks = []
+        current: list[Command] = []
+        for command in commands:
+            if command.c_type == CType.LABEL and current:
+                self.blocks.append(BasicBlock(current))
+                current = []
+            current.append(command)
+            if command.c_type in TERMINATORS:
+                self.blocks.append(BasicBlock(current))
+                current = []
+        if current or not self.blocks:
+            self.blocks.append(BasicBlock(current))
+
+        labels = {block.label: block for block in self.blocks if block.label is not None}
+        for i, block in enumerate(self.blocks):
+            terminator = block.terminator
+            if terminator is not None and terminator.c_type in (CType.GOTO, CType.IF):
+                target = labels.get(terminator.arg1)
+                if target is not None:
+                    block.successors.append(target)
+            if block.falls_through and i + 1 < len(self.blocks):
+                block.successors.append(self.blocks[i + 1])
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+
+class Program:
+    """
+    A whole program as a list of functions
+
+    Attributes:
+        `functions` (list[Function]): the functions in program order
+    """
+
+    def __init__(self, functions: list[Function]) -> None:
+        self.functions: list[Function] = functions
+
+    def __getitem__(self, name: str) -> Function:
+        for function in self.functions:
+            if function.name == name:
+                return function
+        raise KeyError(name)
+
+    def commands(self) -> list[Command]:
+        """
+        Flatten the program back into the list of commands to translate
+        """
+
+        commands = []
+        for function in self.functions:
+            if function.header is not None:
+                commands.append(function.header)
+            commands.extend(function.commands())
+        return commands
+
+    def replace_commands(self, commands: list[Command]) -> None:
+        """
+        Rebuild the whole program from a new list of commands.  Used by passes that
+        rewrite the flat command list.
+        """
+
+        self.functions = build_program(commands).functions
+
+
+def build_program(commands: list[Command]) -> Program:
+    """
+    Build the IR for a list of parsed commands.
+
+    Args:
+        `commands` (list[Command]): Every parsed command of the program, in order
+
+    Returns:
+        Program: The commands split into functions and basic blocks
+    """
+
+    functions = []
+    header = None
+    start = 0
+    for i, command in enumerate(commands):
+        if command.c_type == CType.FUNCTION:
+            if header is not None or i > start:
+                functions.append(Function(header, commands[start:i]))
+            header = command
+            start = i + 1
+    if header is not None or start < len(commands):
+        functions.append(Function(header, commands[start:]))
+
+    return Program(functions)
+
+
+class PassManager:
+    """
+    Runs a sequence of passes over a `Program`.  A pass is any callable taking the
+    program; transformation passes modify it in place and analysis passes return their
+    result, which is kept under the pass name.
+
+    Attributes:
+        `passes` (list[tuple[str, Callable[[Program], object]]]): the passes, in run order
+        `results` (dict[str, object]): what each pass returned on the last run
+        `timings` (dict[str, float]): seconds each pass took on the last run
+    """
+
+    def __init__(self) -> None:
+        self.passes: list[tuple[str, Callable[[Program], object]]] = []
+        self.results: dict[str, object] = {}
+        self.timings: dict[str, float] = {}
+
+    def add(self, name: str, pass_: Callable[[Program], object]) -> None:
+        """
+        Append a pass to run after the ones already added
+        """
+
+        self.passes.append((name, pass_))
+
+    def run(self, program: Program) -> Program:
+        """
+        Run every pass over `program` in order.
+
+        Args:
+            `program` (Program): The program to optimize and analyze
+
+        Returns:
+            Program: The same program, after all passes have run
+        """
+
+        self.results = {}
+        self.timings = {}
+        for name, pass_ in self.passes:
+            start = time.perf_counter()
+            self.results[name] = pass_(program)
+            self.timings[name] = time.perf_counter() - start
+
+        return program
@@ -0,0 +1,296 @@
+"""
+Relocatable objects and the linker that joins them.  In object mode every .vm file is
+translated on its own into an object holding its ASM and a table of the symbols it
+defines and references.  Labels private to a file are renamed by the linker, so files can
+be translated independently, in any order, and their objects reused between builds.
+"""
+
+from __future__ import annotations
+
+from command import Command
+from constants import COMMENT, CType
+from hack_emulator import PREDEFINED_SYMBOLS
+
+OBJECT_EXTENSION = ".obj"
+
+OBJECT_HEADER = f"{COMMENT} object "
+DEFINE_HEADER = f"{COMMENT} define "
+LOCAL_HEADER = f"{COMMENT} local "
+REFERENCE_HEADER = f"{COMMENT} reference "
+VARIABLE_HEADER = f"{COMMENT} variable "
+
+
+class LinkError(Exception):
+    """
+    Raised when objects cannot be linked because of undefined or duplicate symbols
+    """
+
+
+class ObjectFile:
+    """
+    The translation of one .vm file, ready to be linked
+
+    Attributes:
+        `name` (str): the .vm file the object was translated from
+        `lines` (list[str]): the ASM, with local labels not yet renamed
+        `defines` (list[str]): the functions the object defines, in order
+        `locals` (set[str]): labels only used within the object
+        `references` (set[str]): symbols the object uses but does not define
+        `variables` (set[str]): static variable symbols left for the assembler to allocate
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lines: list[str],
+        defines: list[str],
+        local_labels: set[str],
+        references: set[str],
+        variables: set[str],
+    ) -> None:
+        self.name: str = name
+        self.lines: list[str] = lines
+        self.defines: list[str] = defines
+        self.locals: set[str] = local_labels
+        self.references: set[str] = references
+        self.variables: set[str] = variables
+
+
+def _symbol(line: str) -> str | None:
+    """
+    The symbol an `@` instruction refers to, None for addresses and other lines
+    """
+
+    if line[:1] != "@" or line[1:].isdigit():
+        return None
+    return line[1:]
+
+
+def make_object(name: str, commands: list[Command]) -> ObjectFile:
+    """
+    Build the object of a file from its translated commands.
+
+    Args:
+        `name` (str): The .vm file the commands come from
+        `commands` (list[Command]): The file's translated commands
+
+    Returns:
+        ObjectFile: The object
+
+    Raises:
+        LinkError: If the object defines a label more than once
+    """
+
+    lines = [line for command in commands for line in command.translation]
+    defines = [command.arg1 for command in commands if command.c_type == CType.FUNCTION]
+    variables = {
+        command.static_reference(int(command.arg2))[1:]
+        for command in commands
+        if command.c_type in (CType.PUSH, CType.POP)
+        and command.arg1 == "static"
+        and command.static_address is None
+    }
+
+    labels: set[str] = set()
+    for line in lines:
+        if line[:1] == "(":
+            label = line[1:-1]
+            if label in labels:
+                raise LinkError(f"duplicate symbol {label} in {name}")
+            labels.add(label)
+
+    references = {
+        symbol
+        for symbol in map(_symbol, lines)
+        if symbol is not None
+        and symbol not in labels
+        and symbol not in variables
+        and symbol not in PREDEFINED_SYMBOLS
+    }
+
+    return ObjectFile(name, lines, defines, labels - set(defines), references, variables)
+
+
+def write_object(path: str, obj: ObjectFile) -> None:
+    """
+    Write an object file.  The symbol tables go in a header of comments, so an object is
+    still readable Hack assembly.
+
+    Args:
+        `path` (str): The filepath to write
+        `obj` (ObjectFile): The object
+    """
+
+    header = [
+        f"{OBJECT_HEADER}{obj.name}",
+        f"{DEFINE_HEADER}{' '.join(obj.defines)}",
+        f"{LOCAL_HEADER}{' '.join(sorted(obj.locals))}",
+        f"{REFERENCE_HEADER}{' '.join(sorted(obj.references))}",
+        f"{VARIABLE_HEADER}{' '.join(sorted(obj.variables))}",
+    ]
+    with open(path, "w", encoding="UTF-8") as f:
+        f.write("\n".join(header + obj.lines) + "\n")
+
+
+def read_object(path: str) -> ObjectFile:
+    """
+    Read an object file written by `write_object`.
+
+    Args:
+        `path` (str): The filepath of the object
+
+    Returns:
+        ObjectFile: The object
+    """
+
+    with open(path, "r", encoding="UTF-8") as f:
+        lines = f.read().split("\n")[:-1]
+
+    header = [line.split(" ", 2)[2].split() for line in lines[1:5]]
+    return ObjectFile(
+        lines[0][len(OBJECT_HEADER) :],
+        lines[5:],
+        header[0],
+        set(header[1]),
+        set(header[2]),
+        set(header[3]),
+    )
+
+
+def relocate_object(obj: ObjectFile) -> ObjectFile:
+    """
+    Rename an object's local labels as linking it would, for objects that are kept to
+    be linked many times
+
+    Returns:
+        ObjectFile: The object with its labels renamed and no local labels left
+    """
+
+    return ObjectFile(
+        obj.name, _relocate(obj, obj.lines), obj.defines, set(), obj.references, obj.variables
+    )
+
+
+def _sections(obj: ObjectFile) -> list[tuple[str | None, list[str]]]:
+    """
+    Split an object at the start of each function it defines.  Code before the first
+    function is a section with no name.
+    """
+
+    defines = set(obj.defines)
+    sections: list[tuple[str | None, list[str]]] = [(None, [])]
+    for line in obj.lines:
+        if line[:1] == "(" and line[1:-1] in defines:
+            sections.append((line[1:-1], []))
+        sections[-1][1].append(line)
+
+    return [section for section in sections if section[0] is not None or section[1]]
+
+
+def _relocate(obj: ObjectFile, lines: list[str]) -> list[str]:
+    """
+    Rename the object's local labels so they cannot clash with another object's
+    """
+
+    if not obj.locals:
+        return lines
+
+    relocated = []
+    for line in lines:
+        if line[:1] == "(" and line[1:-1] in obj.locals:
+            line = f"({obj.name}:{line[1:-1]})"
+        elif line[:1] == "@" and line[1:] in obj.locals:
+            line = f"@{obj.name}:{line[1:]}"
+        relocated.append(line)
+
+    return relocated
+
+
+def link(
+    objects: list[ObjectFile], prelude: list[str] | None = None, strip_unused: bool = False
+) -> list[str]:
+    """
+    Link objects into one program.
+
+    The prelude, the bootstrap and any shared routines, comes first and its labels are
+    visible to every object.  With `strip_unused` the functions that cannot be reached
+    from the prelude or from top-level code are left out; with neither, every function is
+    kept.  This assumes that no function falls through into the next, which holds for VM
+    code where every function ends in a `return` or a `goto`.
+
+    Args:
+        `objects` (list[ObjectFile]): The objects, in the order to lay them out
+        `prelude` (list[str] | None): ASM to place before every object
+        `strip_unused` (bool): Leave out unreachable functions
+
+    Returns:
+        list[str]: The linked ASM
+
+    Raises:
+        LinkError: If a function is defined twice, or a symbol is referenced but defined
+            nowhere
+    """
+
+    prelude = prelude or []
+    prelude_labels = {line[1:-1] for line in prelude if line[:1] == "("}
+    owners: dict[str, str] = {label: "<prelude>" for label in prelude_labels}
+    for obj in objects:
+        for symbol in obj.defines:
+            if symbol in owners:
+                raise LinkError(
+                    f"duplicate symbol {symbol} defined in {owners[symbol]} and {obj.name}"
+                )
+            owners[symbol] = obj.name
+
+    undefined = []
+    prelude_references = {_symbol(line) for line in prelude} - {None} - prelude_labels
+    for name, references in [("<prelude>", prelude_references)] + [
+        (obj.name, obj.references) for obj in objects
+    ]:
+        for symbol in sorted(references):
+            if symbol not in owners and symbol not in PREDEFINED_SYMBOLS:
+                undefined.append(f"undefined symbol {symbol} referenced by {name}")
+    if undefined:
+        raise LinkError("\n".join(undefined))
+
+    if strip_unused:
+        sections = [(obj, symbol, lines) for obj in objects for symbol, lines in _sections(obj)]
+        reachable = _reachable(sections, prelude_references)
+        sections = [section for section in sections if section[1] in reachable]
+    else:
+        sections = [(obj, None, obj.lines) for obj in objects]
+
+    linked = list(prelude)
+    for obj, _, lines in sections:
+        linked.extend(_relocate(obj, lines))
+
+    return linked
+
+
+def _reachable(
+    sections: list[tuple[ObjectFile, str | None, list[str]]], roots: set[str | None]
+) -> set[str | None]:
+    """
+    The names of the sections reachable from `roots` and from top-level code.  When
+    neither names a function, as for a library translated without the bootstrap, every
+    function is an entry point and all of them are reachable.
+    """
+
+    by_name = {symbol: lines for _, symbol, lines in sections if symbol is not None}
+    reachable: set[str | None] = {None}
+    pending = [lines for _, symbol, lines in sections if symbol is None]
+    roots = {root for root in roots if root in by_name}
+    if not roots and not any(
+        line and not line.startswith(COMMENT) for lines in pending for line in lines
+    ):
+        roots = set(by_name)
+    pending.extend(by_name[root] for root in roots)
+    reachable.update(roots)
+
+    while pending:
+        for symbol in map(_symbol, pending.pop()):
+            if symbol in by_name and symbol not in reachable:
+                reachable.add(symbol)
+                pending.append(by_name[symbol])
+
+    return reachable
@@ -0,0 +1,121 @@
+"""
+The standard optimization and analysis passes, and the pass manager the translator runs
+before code generation
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from branch_fusion import fuse_branches_pass
+from constants import CType
+from inliner import INLINE_MAX_SIZE, inline_calls
+from ir import PassManager, Program
+from stack_analysis import analyze_stack
+from statics import apply_statics, plan_statics
+from stubs import compact_calls_pass, shared_stubs_pass
+from tail_calls import TailCall
+
+
+def inline_pass(max_size: int = INLINE_MAX_SIZE) -> Callable[[Program], None]:
+    """
+    Pass that inlines small leaf functions at their call sites, see `inline_calls`
+    """
+
+    def run(program: Program) -> None:
+        program.replace_commands(inline_calls(program.commands(), max_size))
+
+    return run
+
+
+def tail_call_pass(program: Program) -> None:
+    """
+    Pass that turns `call` directly followed by `return` into a `TailCall`, see
+    `mark_tail_calls`.  In the IR that is a block ending in a call whose fallthrough
+    block starts with `return`.
+    """
+
+    for function in program.functions:
+        changed = False
+        for block, following in zip(function.blocks, function.blocks[1:]):
+            call = block.terminator
+            if (
+                call is not None
+                and call.c_type == CType.CALL
+                and not isinstance(call, TailCall)
+                and following.commands[0].c_type == CType.RETURN
+            ):
+                block.commands[-1] = TailCall(call.command, call.filename)
+                del following.commands[0]
+                changed = True
+
+        if changed:
+            function.rebuild(function.commands())
+
+
+def static_allocation_pass(apply: bool) -> Callable[[Program], dict[str, dict[int, int]]]:
+    """
+    Analysis pass that plans the static segment, see `plan_statics`.  When `apply` is
+    set the direct addresses are also assigned to the commands.  Raises
+    `StaticOverflowError` if the program does not fit.
+    """
+
+    def run(program: Program) -> dict[str, dict[int, int]]:
+        commands = program.commands()
+        allocation = plan_statics(commands)
+        if apply:
+            apply_statics(commands, allocation)
+        return allocation
+
+    return run
+
+
+def build_pass_manager(
+    inline: bool = False,
+    inline_size: int = INLINE_MAX_SIZE,
+    tail_calls: bool = False,
+    fuse_branches: bool = False,
+    shared_stubs: bool = False,
+    compact_calls: bool = False,
+    allocate_statics: bool = False,
+    static_report: bool = False,
+    stack_analysis: bool = False,
+) -> PassManager:
+    """
+    Build the pass manager for a set of translator options.  With no options it has no
+    passes and translation output is unchanged.
+
+    Args:
+        `inline` (bool): Inline small leaf functions
+        `inline_size` (int): The largest function body to inline
+        `tail_calls` (bool): Translate tail calls as frame-reusing jumps
+        `fuse_branches` (bool): Fuse comparisons into the `if-goto` that tests them
+        `shared_stubs` (bool): Jump to shared call and return stubs instead of
+            expanding every call and return
+        `compact_calls` (bool): Let calls to a function from many sites share a call
+            entry, with `shared_stubs`
+        `allocate_statics` (bool): Give static variables direct addresses
+        `static_report` (bool): Plan the static segment so it can be reported
+        `stack_analysis` (bool): Compute the worst-case stack usage of the program
+
+    Returns:
+        PassManager: The passes to run, in order
+    """
+
+    pass_manager = PassManager()
+    if inline:
+        pass_manager.add("inline", inline_pass(inline_size))
+    if tail_calls:
+        pass_manager.add("tail-calls", tail_call_pass)
+    if fuse_branches:
+        pass_manager.add("fuse-branches", fuse_branches_pass)
+    if shared_stubs:
+        pass_manager.add("shared-stubs", shared_stubs_pass)
+        if compact_calls:
+            pass_manager.add("compact-calls", compact_calls_pass)
+    if allocate_statics or static_report:
+        pass_manager.add("statics", static_allocation_pass(allocate_statics))
+    if stack_analysis:
+        pass_manager.add("stack", analyze_stack)
+
+    return pass_manager
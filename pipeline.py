@@ -0,0 +1,132 @@
+"""
+Threads that overlap file I/O with translation.  A reader thread loads upcoming input
+files into a bounded queue while the caller works on the current one, and a writer thread
+writes finished output in the order it was produced, so waiting on slow storage happens
+alongside translating instead of before and after it.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from queue import Empty, Queue
+from threading import Thread
+
+from compression import open_text
+
+# How many files the reader may get ahead of the translator, and how many sections the
+# writer may fall behind it
+PIPELINE_DEPTH = 4
+
+# Marks the end of a queue
+_END = object()
+
+
+def prefetch(
+    files: list[str], load: Callable[[str], object], depth: int = PIPELINE_DEPTH
+) -> Iterator[tuple[str, object]]:
+    """
+    Load files on a background thread, up to `depth` ahead of the consumer.
+
+    Args:
+        `files` (list[str]): The files, in the order they are wanted
+        `load` (Callable[[str], object]): Reads one file
+        `depth` (int): The most loaded files waiting to be consumed
+
+    Yields:
+        tuple[str, object]: Each file with what `load` returned for it, in order
+
+    Raises:
+        Exception: Whatever `load` raised, once the files before it have been consumed
+    """
+
+    queue: Queue = Queue(maxsize=depth)
+    stopped = False
+
+    def read() -> None:
+        try:
+            for file in files:
+                if stopped:
+                    return
+                queue.put((file, load(file)))
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            queue.put(error)
+        else:
+            queue.put(_END)
+
+    thread = Thread(target=read, name="vm-prefetch", daemon=True)
+    thread.start()
+    try:
+        while (item := queue.get()) is not _END:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # If the consumer stopped early the reader may be waiting for room in the queue
+        stopped = True
+        while thread.is_alive():
+            try:
+                queue.get(timeout=0.01)
+            except Empty:
+                pass
+
+
+class OrderedWriter:
+    """
+    Writes text to a file on a background thread, in the order it is handed over, and
+    compressed when its extension names a compression format.  Use as a context manager;
+    leaving it waits for everything to be written.
+
+    Attributes:
+        `path` (str): the file written
+    """
+
+    def __init__(self, path: str, depth: int = PIPELINE_DEPTH, append: bool = False) -> None:
+        self.path: str = path
+        self._queue: Queue = Queue(maxsize=depth)
+        self._error: Exception | None = None
+        self._file = open_text(path, "a" if append else "w")
+        self._thread = Thread(target=self._run, name="asm-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> OrderedWriter:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while (text := self._queue.get()) is not _END:
+            if self._error is None:
+                try:
+                    self._file.write(text)
+                # Whatever the write raised is kept for `write` and `close`; the queue is
+                # still drained so neither blocks on a full queue
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    self._error = error
+
+    def write(self, text: str) -> None:
+        """
+        Queue `text` to be written after everything queued before it
+
+        Raises:
+            Exception: Whatever an earlier write raised, such as an OSError
+        """
+
+        if self._error is not None:
+            raise self._error
+        self._queue.put(text)
+
+    def close(self) -> None:
+        """
+        Wait for the queued text to be written and close the file
+
+        Raises:
+            Exception: Whatever a write raised, such as an OSError
+        """
+
+        if self._thread.is_alive():
+            self._queue.put(_END)
+            self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,386 @@
+"""
+Optimization profiles.  Each optional lowering (shared stubs, inlining, stack tracking and
+so on) is costed on a small template program, in instructions and estimated cycles, both
+with the plain expansion and with the lowering.  A profile weighs the two metrics and
+turns on every lowering that scores better than the plain expansion under its weights:
+`-Os` counts instructions, `-O2` counts cycles and `-O0` turns nothing on.
+
+Usage:
+    python profiles.py      print the cost table and what each profile turns on for a
+                            program with many calls
+"""
+
+from __future__ import annotations
+
+from argparse import Namespace
+
+from asm_writer import translate_commands
+from command import Command
+from constants import COMMENT, CType
+from ir import build_program
+from passes import build_pass_manager
+from rom_budget import count_instructions
+from stack_codegen import translate_program
+from stubs import SharedCall, SharedReturn, stub_routines
+from vm_parser import parse_commands
+
+# The template each optional lowering applies to, and the option that turns it on
+TEMPLATES = {
+    "call/return": (
+        "shared_stubs",
+        [
+            "function Main.f 0",
+            "push argument 0",
+            "call Main.g 1",
+            "push constant 1",
+            "add",
+            "return",
+        ],
+    ),
+    "leaf call": (
+        "inline",
+        [
+            "function Main.f 0",
+            "push argument 0",
+            "push constant 3",
+            "call Main.add 2",
+            "pop static 0",
+            "push constant 0",
+            "return",
+            "function Main.add 0",
+            "push argument 0",
+            "push argument 1",
+            "add",
+            "return",
+        ],
+    ),
+    "tail call": (
+        "tail_calls",
+        ["function Main.f 0", "push argument 0", "call Main.g 1", "return"],
+    ),
+    "compare branch": (
+        "fuse_branches",
+        [
+            "function Main.f 0",
+            "label LOOP",
+            "push argument 0",
+            "push constant 10",
+            "lt",
+            "if-goto LOOP",
+            "push constant 0",
+            "return",
+        ],
+    ),
+    "stack block": (
+        "track_stack",
+        [
+            "function Main.f 2",
+            "push argument 0",
+            "push argument 1",
+            "add",
+            "push constant 2",
+            "sub",
+            "pop local 0",
+            "push local 0",
+            "push local 1",
+            "add",
+            "return",
+        ],
+    ),
+    "object access": (
+        "cache_bases",
+        [
+            "function Main.f 0",
+            "push argument 0",
+            "pop pointer 0",
+            "push this 0",
+            "push this 1",
+            "add",
+            "pop this 2",
+            "push this 2",
+            "return",
+        ],
+    ),
+}
+
+
+class Cost:
+    """
+    The size and speed of translated code
+
+    Attributes:
+        `instructions` (int): instructions in ROM
+        `cycles` (float): estimated cycles to run every command once, taking each branch
+            half of the time
+    """
+
+    def __init__(self, instructions: int = 0, cycles: float = 0.0) -> None:
+        self.instructions: int = instructions
+        self.cycles: float = cycles
+
+    def __add__(self, other: Cost) -> Cost:
+        return Cost(self.instructions + other.instructions, self.cycles + other.cycles)
+
+    def __eq__(self, other) -> bool:
+        return (self.instructions, self.cycles) == (other.instructions, other.cycles)
+
+    def __repr__(self) -> str:
+        return f"Cost({self.instructions}, {self.cycles:g})"
+
+
+class Profile:
+    """
+    A named weighing of program size against speed
+
+    Attributes:
+        `name` (str): the profile's name, as given after `-O`
+        `description` (str): what the profile is for
+        `size_weight` (float): the weight of an instruction in ROM
+        `cycle_weight` (float): the weight of an estimated cycle
+    """
+
+    def __init__(
+        self, name: str, description: str, size_weight: float, cycle_weight: float
+    ) -> None:
+        self.name: str = name
+        self.description: str = description
+        self.size_weight: float = size_weight
+        self.cycle_weight: float = cycle_weight
+
+    def score(self, cost: Cost) -> float:
+        """
+        The weighted cost, lower is better
+        """
+
+        return self.size_weight * cost.instructions + self.cycle_weight * cost.cycles
+
+    def options(
+        self, table: dict[str, dict[str, Cost]] | None = None, n_calls: int | None = None
+    ) -> list[str]:
+        """
+        The options whose lowering scores better than the plain expansion of its template.
+        Shared stubs are only chosen when what the program's calls save pays for the stubs
+        themselves.
+
+        Args:
+            `table` (dict[str, dict[str, Cost]] | None): The cost table, by default
+                `cost_table()`
+            `n_calls` (int | None): The number of calls in the program, None to judge
+                the templates alone
+        """
+
+        table = cost_table() if table is None else table
+        options = []
+        for template, (option, _) in TEMPLATES.items():
+            gain = self.score(table[template]["expanded"]) - self.score(table[template][option])
+            if option == "shared_stubs" and n_calls is not None:
+                gain = gain * n_calls - self.score(Cost(count_instructions(stub_routines())))
+            if gain > 0:
+                options.append(option)
+
+        return options
+
+
+PROFILES = {
+    "0": Profile("0", "no optional lowerings", 0, 0),
+    "2": Profile("2", "fewest cycles", 0, 1),
+    "s": Profile("s", "fewest instructions", 1, 0),
+}
+
+_cost_table: dict[str, dict[str, Cost]] | None = None
+
+
+def estimate_cycles(lines: list[str], routines: list[str] = ()) -> float:
+    """
+    Estimate the cycles to run translated lines once.  Jumps are followed to labels in
+    `lines` or in `routines` (the shared stubs), conditional jumps count the mean of both
+    ways, and a jump anywhere else or backwards ends the run, as does reaching the end of
+    `lines`.
+
+    Args:
+        `lines` (list[str]): Lines of ASM
+        `routines` (list[str]): Lines of ASM that `lines` may jump into
+
+    Returns:
+        float: The estimated cycles
+    """
+
+    instructions = []
+    labels = {}
+    for line in [*lines, *routines]:
+        if line.startswith("("):
+            labels[line[1:-1]] = len(instructions)
+        elif line and not line.startswith(COMMENT):
+            instructions.append(line)
+
+    end = count_instructions(lines)
+
+    def run(i: int) -> float:
+        cycles = 0.0
+        while i < len(instructions) and i != end:
+            line = instructions[i]
+            cycles += 1
+            if ";J" in line:
+                previous = instructions[i - 1] if i else ""
+                target = labels.get(previous[1:]) if previous.startswith("@") else None
+                if target is None or target <= i:
+                    return cycles
+                if line.endswith("JMP"):
+                    i = target
+                    continue
+                return cycles + (run(i + 1) + run(target)) / 2
+            i += 1
+        return cycles
+
+    return run(0)
+
+
+def program_cost(commands: list[Command], routines: bool = True) -> Cost:
+    """
+    The cost of translated commands.  Commands that jump to the shared stubs are charged
+    the cycles of the stub they run.
+
+    Args:
+        `commands` (list[Command]): The translated commands
+        `routines` (bool): Whether to count the instructions of the shared stubs when the
+            commands use them.  Templates leave them out, since a program pays for the
+            stubs once however many sites use them.
+
+    Returns:
+        Cost: The instructions and estimated cycles of running each command once
+    """
+
+    stubs = []
+    if any(isinstance(command, (SharedCall, SharedReturn)) for command in commands):
+        stubs = stub_routines()
+
+    cost = Cost(count_instructions(stubs) if routines else 0)
+    for command in commands:
+        cost += Cost(
+            count_instructions(command.translation),
+            estimate_cycles(command.translation, stubs),
+        )
+
+    return cost
+
+
+def translation_cost(commands: list[Command], options: dict[str, bool] | None = None) -> Cost:
+    """
+    Run the passes and code generation that `options` turn on over parsed commands and
+    return the cost of the result, leaving out the shared stubs.  `Command.label_count`
+    is left as it was.
+
+    Args:
+        `commands` (list[Command]): The parsed commands, which are translated in place
+        `options` (dict[str, bool] | None): Translator options by argument name, as for
+            `build_pass_manager` plus `track_stack` and `cache_bases`
+
+    Returns:
+        Cost: The cost of the translation
+    """
+
+    options = options or {}
+    label_count = Command.label_count
+    program = build_pass_manager(
+        inline=options.get("inline", False),
+        tail_calls=options.get("tail_calls", False),
+        fuse_branches=options.get("fuse_branches", False),
+        shared_stubs=options.get("shared_stubs", False),
+    ).run(build_program(commands))
+    if options.get("track_stack") or options.get("cache_bases"):
+        translate_program(program, options.get("cache_bases", False))
+    else:
+        translate_commands(program.commands())
+    Command.label_count = label_count
+
+    return program_cost(program.commands(), routines=False)
+
+
+def cost_table() -> dict[str, dict[str, Cost]]:
+    """
+    The cost of each template with its plain expansion and with its optional lowering.
+    Built on first use.
+
+    Returns:
+        dict[str, dict[str, Cost]]: The costs by template, then by "expanded" or option
+    """
+
+    global _cost_table  # pylint: disable=global-statement
+    if _cost_table is None:
+        _cost_table = {}
+        for template, (option, lines) in TEMPLATES.items():
+            _cost_table[template] = {
+                "expanded": translation_cost(parse_commands(lines, "Main.vm")),
+                option: translation_cost(parse_commands(lines, "Main.vm"), {option: True}),
+            }
+
+    return _cost_table
+
+
+def apply_profile(args: Namespace, commands: list[Command]) -> Namespace:
+    """
+    The command-line-arguments with the options `args.profile` chooses for a program
+    turned on as well as any given explicitly.
+
+    Args:
+        `args` (Namespace): The command-line-arguments, with `profile` set
+        `commands` (list[Command]): The program's parsed commands
+
+    Returns:
+        Namespace: A copy of `args` with the profile's options set
+    """
+
+    n_calls = sum(1 for command in commands if command.c_type == CType.CALL)
+    options = PROFILES[args.profile].options(n_calls=n_calls)
+    return Namespace(**{**vars(args), **{option: True for option in options}})
+
+
+def format_profile_summary(profile: str, before: Cost, after: Cost) -> str:
+    """
+    Format the cost of a build against the same program built with `-O0`.
+
+    Args:
+        `profile` (str): The profile's name
+        `before` (Cost): The cost with no optional lowerings
+        `after` (Cost): The cost of the build
+
+    Returns:
+        str: The summary
+    """
+
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) * 100 / old:+.1f}%" if old else "n/a"
+
+    return (
+        f"-O{profile}: {before.instructions} -> {after.instructions} instructions "
+        f"({change(before.instructions, after.instructions)}), "
+        f"{before.cycles:.0f} -> {after.cycles:.0f} estimated cycles "
+        f"({change(before.cycles, after.cycles)})"
+    )
+
+
+def format_cost_table(table: dict[str, dict[str, Cost]]) -> str:
+    """
+    Format the cost table, one line per lowering of each template
+    """
+
+    lines = [f"{'template':<16}{'lowering':<16}{'instructions':>14}{'cycles':>10}"]
+    for template, costs in table.items():
+        for lowering, cost in costs.items():
+            lines.append(
+                f"{template:<16}{lowering:<16}{cost.instructions:>14}{cost.cycles:>10.1f}"
+            )
+
+    return "\n".join(lines)
+
+
+def main() -> None:
+    table = cost_table()
+    print(format_cost_table(table))
+    for profile in PROFILES.values():
+        options = ", ".join(profile.options(table)) or "nothing"
+        print(f"-O{profile.name} ({profile.description}): {options}")
+
+
+if __name__ == "__main__":
+    main()
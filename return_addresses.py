@@ -0,0 +1,111 @@
+"""
+Return addresses written as ROM addresses.  Every call site declares a `f$ret.n` label
+for the instruction after its jump, which costs the assembler a symbol per call site.
+Once the code is laid out the address of each of these labels is known, so the label is
+dropped and its references load the address itself.
+"""
+
+from __future__ import annotations
+
+import re
+
+from command import Command
+from constants import COMMENT, CType
+from rom_budget import count_instructions
+from stubs import EntryCall, call_entries
+from tail_calls import TailCall
+
+# A return-address label, renamed or not by the linker
+RETURN_LABEL = re.compile(r"^\((.*\$ret\.\d+)\)$")
+
+
+def resolve_return_labels(lines: list[str], address: int = 0) -> tuple[list[str], int]:
+    """
+    Replace the return-address labels declared in `lines` by their ROM address.  Only
+    references within `lines` are rewritten, which is every reference since each label
+    is used by the call that declares it.
+
+    Args:
+        `lines` (list[str]): Lines of ASM
+        `address` (int): The ROM address of the first instruction in `lines`
+
+    Returns:
+        tuple[list[str], int]: The rewritten lines and the number of labels replaced
+    """
+
+    addresses = {}
+    for line in lines:
+        if line[:1] == "(":
+            match = RETURN_LABEL.match(line)
+            if match:
+                addresses[match[1]] = address
+        elif line and not line.startswith(COMMENT):
+            address += 1
+    if not addresses:
+        return lines, 0
+
+    resolved = []
+    for line in lines:
+        if line[:1] == "(" and line[1:-1] in addresses:
+            continue
+        if line[:1] == "@" and line[1:] in addresses:
+            line = f"@{addresses[line[1:]]}"
+        resolved.append(line)
+
+    return resolved, len(addresses)
+
+
+def resolve_return_addresses(commands: list[Command], address: int) -> int:
+    """
+    Replace the return-address labels of translated commands by their ROM address.
+
+    Args:
+        `commands` (list[Command]): The translated commands, in the order they are
+            written
+        `address` (int): The ROM address of the first command's first instruction
+
+    Returns:
+        int: The ROM address after the last command
+    """
+
+    for command in commands:
+        if command.c_type == CType.CALL:
+            command.translation, _ = resolve_return_labels(command.translation, address)
+        address += count_instructions(command.translation)
+
+    return address
+
+
+def format_call_report(commands: list[Command]) -> str:
+    """
+    Format how many labels compact calls save in the symbol table: one return-address
+    label per call site, less one label per call entry
+
+    Args:
+        `commands` (list[Command]): The translated commands
+
+    Returns:
+        str: The report
+    """
+
+    sites = sum(
+        1
+        for command in commands
+        if command.c_type == CType.CALL and not isinstance(command, TailCall)
+    )
+    entry_sites = sum(1 for command in commands if isinstance(command, EntryCall))
+    entries = len(call_entries(commands))
+    other = sum(
+        1
+        for command in commands
+        for line in command.translation
+        if line[:1] == "(" and not RETURN_LABEL.match(line)
+    )
+    before, after = other + sites, other + entries
+    change = f"{(after - before) * 100 / before:+.1f}%" if before else "n/a"
+
+    return (
+        f"compact calls: {sites} return addresses written as ROM addresses, "
+        f"{entry_sites} call sites sharing {entries} call entries; "
+        f"program labels {before} -> {after} ({change})"
+    )
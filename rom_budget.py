@@ -0,0 +1,102 @@
+"""
+ROM budget checking.  Counts the real instructions of the translated program, leaving out
+comments and label pseudo-instructions, and attributes them to functions and files so an
+oversized program can be traced back to what made it big.
+"""
+
+from __future__ import annotations
+
+from command import Command
+from constants import COMMENT, CType, ROM_SIZE
+
+
+class RomBudgetError(Exception):
+    """
+    Raised when the translated program has more instructions than the ROM budget allows
+    """
+
+
+def count_instructions(lines: list[str]) -> int:
+    """
+    Count the lines of ASM that become instructions in ROM.
+
+    Args:
+        `lines` (list[str]): Lines of ASM, possibly with comments and labels
+
+    Returns:
+        int: The number of A- and C-instructions
+    """
+
+    return sum(1 for line in lines if line and line[0] != "(" and not line.startswith(COMMENT))
+
+
+def rom_usage(commands: list[Command]) -> tuple[dict[str, int], dict[str, int]]:
+    """
+    Attribute the instructions of translated commands to the function and the file they
+    belong to.  Commands before the first `function` count towards "<top level>".
+
+    Args:
+        `commands` (list[Command]): The translated commands
+
+    Returns:
+        tuple[dict[str, int], dict[str, int]]: Instructions per function and per file
+    """
+
+    functions: dict[str, int] = {}
+    files: dict[str, int] = {}
+    function = "<top level>"
+    for command in commands:
+        if command.c_type == CType.FUNCTION:
+            function = command.arg1
+        count = count_instructions(command.translation)
+        functions[function] = functions.get(function, 0) + count
+        files[command.filename] = files.get(command.filename, 0) + count
+
+    return functions, files
+
+
+def format_rom_report(
+    total: int, commands: list[Command], budget: int = ROM_SIZE, top: int = 10
+) -> str:
+    """
+    Format the size of the program against its budget along with the largest functions
+    and files.
+
+    Args:
+        `total` (int): The total number of instructions written
+        `commands` (list[Command]): The translated commands
+        `budget` (int): The ROM budget in instructions
+        `top` (int): How many of the largest functions and files to list
+
+    Returns:
+        str: The report
+    """
+
+    functions, files = rom_usage(commands)
+    lines = [f"ROM: {total}/{budget} instructions ({total * 100 / budget:.1f}%)"]
+    for title, usage in (("functions", functions), ("files", files)):
+        lines.append(f"largest {title}:")
+        for name, count in sorted(usage.items(), key=lambda item: (-item[1], item[0]))[:top]:
+            lines.append(f"  {count:>7}  {name or '<none>'}")
+
+    return "\n".join(lines)
+
+
+def check_rom_budget(instructions: int, commands: list[Command], budget: int | None) -> None:
+    """
+    Check a translated program against the ROM budget before it is written.
+
+    Args:
+        `instructions` (int): The number of instructions the program will have
+        `commands` (list[Command]): The translated commands
+        `budget` (int | None): The ROM budget in instructions, None for no budget
+
+    Raises:
+        RomBudgetError: If the program has more instructions than `budget`
+    """
+
+    if budget is not None and instructions > budget:
+        raise RomBudgetError(
+            f"program does not fit in {budget} instructions of ROM\n"
+            + format_rom_report(instructions, commands, budget)
+        )
@@ -0,0 +1,318 @@
+"""
+Static stack usage analysis.  Combines the per-block stack depth of every function with
+the call graph to find the worst-case stack usage of each entry point, so a program that
+would overflow the stack into the heap can be rejected before it is translated.
+"""
+
+from __future__ import annotations
+
+from branch_fusion import FusedBranch
+from command import Command
+from constants import CType
+from ir import Function, Program
+from tail_calls import TailCall
+
+# The stack lives in RAM[256-2047]; the bootstrap starts Sys.init with a 5 word frame
+STACK_BASE = 256
+STACK_LIMIT = 2048 - STACK_BASE
+BOOTSTRAP_FRAME = 5
+FRAME_SIZE = 5
+
+UNARY_COMMANDS = ("neg", "not")
+
+
+class StackLimitError(Exception):
+    """
+    Raised when a program's worst-case stack usage may exceed the allowed limit
+    """
+
+
+class StackAnalysis:
+    """
+    The result of analyzing a program's stack usage.
+
+    Usage is measured in words above a function's LCL, i.e. its locals, working stack and
+    everything its callees push.  None means unbounded.
+
+    Attributes:
+        `usage` (dict[str, int | None]): worst-case usage of each function
+        `entry_points` (dict[str, int | None]): worst-case words of stack used by each
+            entry point, counted from the bottom of the stack
+        `recursive` (list[list[str]]): groups of functions that call each other without
+            a bound on the depth
+        `unbalanced` (list[str]): functions whose stack grows around a loop
+        `external` (set[str]): called functions with no definition in the program, which
+            are counted as using no stack
+    """
+
+    def __init__(self) -> None:
+        self.usage: dict[str, int | None] = {}
+        self.entry_points: dict[str, int | None] = {}
+        self.recursive: list[list[str]] = []
+        self.unbalanced: list[str] = []
+        self.external: set[str] = set()
+
+    def exceeds(self, limit: int = STACK_LIMIT) -> bool:
+        """
+        Whether any entry point may use more than `limit` words of stack
+        """
+
+        return any(words is None or words > limit for words in self.entry_points.values())
+
+    def format(self, limit: int = STACK_LIMIT) -> str:
+        """
+        Format the analysis as a human readable report
+        """
+
+        lines = []
+        for name, words in self.entry_points.items():
+            name = name or "<top level>"
+            if words is None:
+                lines.append(f"{name}: unbounded stack usage")
+            else:
+                status = "OVERFLOW" if words > limit else "ok"
+                lines.append(f"{name}: {words}/{limit} stack words ({status})")
+        for cycle in self.recursive:
+            lines.append(f"recursion: {' -> '.join(cycle + cycle[:1])}")
+        for name in self.unbalanced:
+            lines.append(f"unbalanced stack: {name} grows its stack inside a loop")
+        if self.external:
+            lines.append(f"not analyzed (undefined): {', '.join(sorted(self.external))}")
+
+        return "\n".join(lines)
+
+
+def stack_effect(command: Command) -> int:
+    """
+    The change in stack depth caused by a command.  A `call` counts the return value
+    left behind once the callee has returned.
+    """
+
+    if isinstance(command, FusedBranch):
+        return -2
+    if command.c_type == CType.PUSH:
+        return 1
+    if command.c_type in (CType.POP, CType.IF):
+        return -1
+    if command.c_type == CType.ARITHMETIC:
+        return 0 if command.arg1 in UNARY_COMMANDS else -1
+    if command.c_type == CType.CALL:
+        return 1 - int(command.arg2)
+    return 0
+
+
+class _Call:
+    """
+    A call site: the callee, its argument count, whether it is a tail call, and the
+    stack depth above LCL just before the call (arguments included)
+    """
+
+    def __init__(self, callee: str, n_args: int, tail: bool, depth: int) -> None:
+        self.callee = callee
+        self.n_args = n_args
+        self.tail = tail
+        self.depth = depth
+
+
+def _function_depths(function: Function) -> tuple[int, list[_Call]] | None:
+    """
+    Propagate stack depths through the function's blocks, starting from its locals.
+
+    Returns:
+        tuple[int, list[_Call]] | None: The highest depth reached in the function itself
+            and its call sites, or None if the depth grows without bound around a loop
+    """
+
+    if not function.blocks:
+        return function.n_vars, []
+
+    entry_depth: dict[int, int] = {id(function.blocks[0]): function.n_vars}
+    updates: dict[int, int] = {}
+    calls: dict[tuple[int, int], _Call] = {}
+    peak = function.n_vars
+    pending = [function.blocks[0]]
+
+    while pending:
+        block = pending.pop()
+        depth = entry_depth[id(block)]
+        for position, command in enumerate(block.commands):
+            if command.c_type == CType.CALL:
+                calls[(id(block), position)] = _Call(
+                    command.arg1, int(command.arg2), isinstance(command, TailCall), depth
+                )
+            depth += stack_effect(command)
+            peak = max(peak, depth)
+
+        for successor in block.successors:
+            key = id(successor)
+            if key in entry_depth and entry_depth[key] >= depth:
+                continue
+            updates[key] = updates.get(key, 0) + 1
+            if updates[key] > len(function.blocks) + 1:
+                return None
+            entry_depth[key] = depth
+            pending.append(successor)
+
+    return peak, list(calls.values())
+
+
+def _strongly_connected(graph: dict[str, list[str]]) -> list[list[str]]:
+    """
+    Tarjan's algorithm, iterative.  Components come out callees first.
+    """
+
+    index: dict[str, int] = {}
+    low: dict[str, int] = {}
+    on_stack: set[str] = set()
+    stack: list[str] = []
+    components = []
+
+    for root in graph:
+        if root in index:
+            continue
+        work = [(root, iter(graph[root]))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, edges = work[-1]
+            for successor in edges:
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(graph[successor])))
+                    break
+                if successor in on_stack:
+                    low[node] = min(low[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component[::-1])
+
+    return components
+
+
+def analyze_stack(program: Program) -> StackAnalysis:
+    """
+    Compute the worst-case stack usage of every function and entry point.
+
+    A regular call to `g` at depth `d` needs `d + 5 + usage(g)` words above the caller's
+    LCL.  A tail call reuses the caller's frame, so it only needs the callee's usage
+    shifted by the difference in argument counts.  Recursion through regular calls has no
+    bound; recursion made only of tail calls does.
+
+    Args:
+        `program` (Program): The program to analyze
+
+    Returns:
+        StackAnalysis: The usage of every function and entry point
+    """
+
+    analysis = StackAnalysis()
+    functions = {function.name: function for function in program.functions}
+
+    local_peaks: dict[str, int | None] = {}
+    calls: dict[str, list[_Call]] = {}
+    n_args: dict[str, int] = {}
+    for name, function in functions.items():
+        depths = _function_depths(function)
+        if depths is None:
+            analysis.unbalanced.append(name)
+            local_peaks[name], calls[name] = None, []
+            continue
+        local_peaks[name], calls[name] = depths
+        for call in calls[name]:
+            n_args[call.callee] = min(n_args.get(call.callee, call.n_args), call.n_args)
+
+    for name in calls:
+        for call in calls[name]:
+            if call.callee not in functions:
+                analysis.external.add(call.callee)
+
+    graph = {
+        name: [call.callee for call in calls[name] if call.callee in functions]
+        for name in functions
+    }
+    usage = analysis.usage
+    for component in _strongly_connected(graph):
+        members = set(component)
+        internal = [
+            call for name in component for call in calls[name] if call.callee in members
+        ]
+        if any(not call.tail for call in internal):
+            analysis.recursive.append(component)
+            for name in component:
+                usage[name] = None
+            continue
+
+        # Fixpoint over the component; tail-call cycles converge unless the argument
+        # count keeps growing around them
+        for name in component:
+            usage[name] = local_peaks[name]
+        for _ in range(len(component) + 1):
+            changed = False
+            for name in component:
+                value = _usage(name, calls[name], local_peaks[name], usage, n_args)
+                if value != usage[name]:
+                    usage[name] = value
+                    changed = True
+            if not changed:
+                break
+        else:
+            analysis.recursive.append(component)
+            for name in component:
+                usage[name] = None
+
+    called = {call.callee for name in calls for call in calls[name]}
+    if "Sys.init" in functions:
+        entries = ["Sys.init"]
+    else:
+        entries = [name for name in functions if name not in called]
+    for name in entries:
+        words = usage[name]
+        base = BOOTSTRAP_FRAME if name else 0
+        analysis.entry_points[name] = None if words is None else base + words
+
+    return analysis
+
+
+def _usage(
+    name: str,
+    calls: list[_Call],
+    local_peak: int | None,
+    usage: dict[str, int | None],
+    n_args: dict[str, int],
+) -> int | None:
+    """
+    Worst-case usage of one function given the current usage of its callees
+    """
+
+    if local_peak is None:
+        return None
+
+    worst = local_peak
+    for call in calls:
+        callee = usage.get(call.callee, 0)
+        if callee is None:
+            return None
+        if call.tail:
+            # Staging the frame above SP, then the callee in the reused frame
+            worst = max(
+                worst,
+                call.depth + FRAME_SIZE,
+                call.n_args - n_args.get(name, 0) + callee,
+            )
+        else:
+            worst = max(worst, call.depth + FRAME_SIZE + callee)
+
+    return worst
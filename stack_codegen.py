@@ -0,0 +1,451 @@
+"""
+Stack-tracking code generator.  Within a basic block the stack depth is known statically,
+so instead of updating SP in memory on every push and pop the generator addresses stack
+slots as offsets from the SP held in memory and writes SP back once, at the end of the
+block or before anything that reads it (branches, calls and returns).
+
+With base caching the generator also remembers, from one push or pop to the next, which
+segment cell A points at, whose value D holds and which segment base D holds, so runs of
+`this`/`that` accesses step between cells with `A=A+1` instead of reloading the base.
+"""
+
+from __future__ import annotations
+
+from branch_fusion import FusedBranch
+from command import Command
+from constants import COMMENT, CType, SEGMENTS
+from ir import BasicBlock, Program
+
+# Once SP in memory lags the real stack pointer by this many words it is written back
+# before the next push, since reaching the slot from @SP costs more than the update
+MAX_OFFSET = 3
+
+BINARY_COMMANDS = {"add": "M=D+M", "sub": "M=M-D", "and": "M=D&M", "or": "M=D|M"}
+UNARY_COMMANDS = {"neg": "M=-M", "not": "M=!M"}
+COMPARE_JUMPS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+POINTER_SEGMENTS = ("this", "that")
+
+
+class BlockTranslator:
+    """
+    Translates the commands of one basic block, tracking the stack depth statically.
+
+    Stack slots are numbered relative to the SP stored in memory, so slot 0 is the word
+    SP points at and slot -1 is the current top of stack when nothing is pending.
+
+    Attributes:
+        `offset` (int): how far the real stack pointer is above the SP in memory
+        `a_slot` (int | None): the slot the A register currently addresses, if known
+        `d_slot` (int | None): the slot whose value the D register currently holds, if any
+        `cache_bases` (bool): whether to track the segment cells and bases held in A and D
+        `a_cell` (tuple[str, int] | None): the segment cell A points at, if known
+        `d_cell` (tuple[str, int] | None): the segment cell whose value D holds, if any
+        `d_base` (str | None): the segment whose base address D holds, if any
+    """
+
+    def __init__(self, cache_bases: bool = False) -> None:
+        self.offset: int = 0
+        self.a_slot: int | None = None
+        self.d_slot: int | None = None
+        self.cache_bases: bool = cache_bases
+        self.a_cell: tuple[str, int] | None = None
+        self.d_cell: tuple[str, int] | None = None
+        self.d_base: str | None = None
+
+    def translate_block(self, block: BasicBlock) -> None:
+        """
+        Fill in the `translation` of every command in the block.
+
+        Args:
+            `block` (BasicBlock): The block to translate
+        """
+
+        self.offset = 0
+        self.a_slot = None
+        self.d_slot = None
+        self._forget_cells()
+
+        for command in block.commands:
+            command.translation = [f"{COMMENT} {command.command}"]
+            handled = self._translate(command)
+            if not handled:
+                flush = self._flush(keep_d=False)
+                command.translation = []
+                command.translate()
+                command.translation[1:1] = flush
+                self.a_slot = None
+                self.d_slot = None
+                self._forget_cells()
+
+        if block.commands and self.offset:
+            block.commands[-1].translation.extend(self._flush(keep_d=False))
+
+    def _translate(self, command: Command) -> bool:
+        """
+        Translate a command that only touches the stack, returning False for anything
+        that has to be translated with an up to date SP in memory.
+        """
+
+        if isinstance(command, FusedBranch):
+            self._forget_cells()
+            self._fused_branch(command)
+            return True
+        if type(command) is not Command:  # pylint: disable=unidiomatic-typecheck
+            return False
+
+        if command.c_type == CType.PUSH:
+            self._push(command)
+            return True
+        if command.c_type == CType.POP:
+            self._pop(command)
+            return True
+
+        # Only a push or pop directly following another makes use of the cached cells
+        self._forget_cells()
+        if command.c_type == CType.ARITHMETIC and command.arg1 in BINARY_COMMANDS:
+            self._binary(command, BINARY_COMMANDS[command.arg1])
+        elif command.c_type == CType.ARITHMETIC and command.arg1 in UNARY_COMMANDS:
+            self._emit(command, self._address(self.offset - 1))
+            self._emit(command, [UNARY_COMMANDS[command.arg1]])
+            if self.d_slot == self.offset - 1:
+                self.d_slot = None
+        elif command.c_type == CType.ARITHMETIC and command.arg1 in COMPARE_JUMPS:
+            self._compare(command, COMPARE_JUMPS[command.arg1])
+        elif command.c_type == CType.IF:
+            self._if_goto(command)
+        else:
+            return False
+
+        return True
+
+    def _emit(self, command: Command, lines: list[str]) -> None:
+        command.translation.extend(lines)
+
+    def _forget_cells(self) -> None:
+        self.a_cell = None
+        self.d_cell = None
+        self.d_base = None
+
+    def _state(self) -> tuple:
+        return self.a_slot, self.d_slot, self.a_cell, self.d_cell, self.d_base
+
+    def _restore(self, state: tuple) -> None:
+        self.a_slot, self.d_slot, self.a_cell, self.d_cell, self.d_base = state
+
+    def _address(self, slot: int) -> list[str]:
+        """
+        Lines that point A at a stack slot, stepping from the slot A already addresses
+        when that is cheaper than starting again from @SP
+        """
+
+        if slot == 0:
+            fresh = ["@SP", "A=M"]
+        else:
+            step = "A=A+1" if slot > 0 else "A=A-1"
+            first = "A=M+1" if slot > 0 else "A=M-1"
+            fresh = ["@SP", first] + (abs(slot) - 1) * [step]
+
+        if self.a_slot is not None and abs(slot - self.a_slot) < len(fresh):
+            step = "A=A+1" if slot > self.a_slot else "A=A-1"
+            lines = abs(slot - self.a_slot) * [step]
+        else:
+            lines = fresh
+
+        self.a_slot = slot
+        self.a_cell = None
+        return lines
+
+    def _load(self, slot: int) -> list[str]:
+        """
+        Lines that put the value of a stack slot in D
+        """
+
+        if self.d_slot == slot:
+            return []
+
+        lines = self._address(slot) + ["D=M"]
+        self.d_slot = slot
+        self.d_cell = None
+        self.d_base = None
+        return lines
+
+    def _flush(self, keep_d: bool) -> list[str]:
+        """
+        Lines that write the pending offset back to SP in memory.  Slot numbers are
+        relative to SP, so the tracked A and D slots shift down with it.
+        """
+
+        offset = self.offset
+        if offset == 0:
+            return []
+
+        # Stepping SP one word at a time leaves D alone and is cheaper for small offsets
+        if abs(offset) > 3 and not keep_d:
+            lines = [f"@{abs(offset)}", "D=A", "@SP", "M=D+M" if offset > 0 else "M=M-D"]
+            self.d_slot = None
+            self.d_cell = None
+            self.d_base = None
+        else:
+            lines = ["@SP"] + abs(offset) * ["M=M+1" if offset > 0 else "M=M-1"]
+            if self.d_slot is not None:
+                self.d_slot -= offset
+
+        self.offset = 0
+        self.a_slot = None
+        self.a_cell = None
+        return lines
+
+    def _cell_address(self, segment: str, index: int, keep_d: bool) -> list[str]:
+        """
+        The shortest lines that point A at `segment[index]` for one of local, argument,
+        this and that: stepping from the cell A points at, offsetting a base held in D,
+        stepping up from the base with `A=M+1`, or adding the index to the base.
+
+        Args:
+            `segment` (str): The segment
+            `index` (int): The index into the segment
+            `keep_d` (bool): Whether D holds a value that has to survive
+        """
+
+        base = SEGMENTS[segment]
+        options = []
+        if self.a_cell is not None and self.a_cell[0] == segment:
+            step = "A=A+1" if index > self.a_cell[1] else "A=A-1"
+            options.append(abs(index - self.a_cell[1]) * [step])
+        if self.d_base == segment and not keep_d:
+            options.append(
+                ["A=D"] if index == 0 else ["A=D+1"] if index == 1 else [f"@{index}", "A=D+A"]
+            )
+        options.append([f"@{base}", "A=M" if index == 0 else "A=M+1", *(index - 1) * ["A=A+1"]])
+        if not keep_d:
+            options.append([f"@{index}", "D=A", f"@{base}", "A=D+M"])
+
+        return min(options, key=len)
+
+    def _load_cell(self, command: Command, segment: str, index: int) -> list[str]:
+        """
+        Lines that put the value of `segment[index]` in D, making use of the cell or base
+        already held in A or D
+        """
+
+        if self.d_cell == _cell(command, segment, index):
+            return []
+        if segment in SEGMENTS:
+            return self._cell_address(segment, index, keep_d=False) + ["D=M"]
+        return _load_segment(command, segment, index)
+
+    def _push(self, command: Command) -> None:
+        segment = command.arg1
+        index = int(command.arg2)
+
+        if abs(self.offset) >= MAX_OFFSET:
+            self._emit(command, self._flush(keep_d=False))
+
+        if segment == "constant" and index in (0, 1):
+            self._emit(command, self._address(self.offset) + [f"M={index}"])
+            if self.d_slot == self.offset:
+                self.d_slot = None
+            self.offset += 1
+            self._forget_cells()
+            return
+
+        if self.cache_bases:
+            lines = self._load_cell(command, segment, index)
+        else:
+            lines = _load_segment(command, segment, index)
+        self._emit(command, lines)
+        if lines:
+            self.a_slot = None
+        self.d_slot = None
+        self._emit(command, self._address(self.offset) + ["M=D"])
+        self.d_slot = self.offset
+        self.offset += 1
+
+        self._forget_cells()
+        if self.cache_bases and segment != "constant":
+            self.d_cell = _cell(command, segment, index)
+            if segment == "pointer":
+                self.d_base = POINTER_SEGMENTS[index]
+
+    def _pop(self, command: Command) -> None:
+        segment = command.arg1
+        index = int(command.arg2)
+        top = self.offset - 1
+
+        if self.cache_bases:
+            self._emit(command, self._pop_cached(command, segment, index))
+        elif segment in SEGMENTS and index > 1:
+            # D = base + index, then swap in the value with the add/subtract trick
+            self._emit(command, [f"@{index}", "D=A", f"@{SEGMENTS[segment]}", "D=D+M"])
+            self.a_slot = None
+            self.d_slot = None
+            self._emit(command, self._address(top) + ["D=D+M", "A=D-M", "M=D-A"])
+            self.a_slot = None
+        else:
+            self._emit(command, self._load(top))
+            self._emit(command, _store_segment(command, segment, index))
+            self.a_slot = None
+
+        self.offset -= 1
+        if self.d_slot is not None and self.d_slot >= self.offset:
+            self.d_slot = None
+
+    def _pop_cached(self, command: Command, segment: str, index: int) -> list[str]:
+        """
+        Lines that pop the top of the stack into `segment[index]`, leaving the cells and
+        base they hold in A and D for the next command.  For local, argument, this and
+        that the cheaper of two sequences is used: loading the value and then pointing A
+        at the cell, or computing the cell address in D first and swapping the value in.
+        """
+
+        top = self.offset - 1
+        start = self._state()
+
+        load = self._load(top) + (
+            self._cell_address(segment, index, keep_d=True)
+            if segment in SEGMENTS
+            else _store_segment(command, segment, index)[:-1]
+        )
+        load.append("M=D")
+        self.a_slot = None
+        self._forget_cells()
+        self.a_cell = (segment, index) if segment in SEGMENTS else None
+        self.d_cell = _cell(command, segment, index)
+        if segment == "pointer":
+            self.d_base = POINTER_SEGMENTS[index]
+        if segment not in SEGMENTS:
+            return load
+        loaded = self._state()
+
+        self._restore(start)
+        if self.d_base == segment:
+            swap = [] if index == 0 else ["D=D+1"] if index == 1 else [f"@{index}", "D=D+A"]
+        else:
+            swap = [f"@{index}", "D=A", f"@{SEGMENTS[segment]}", "D=D+M"]
+        self.a_slot = None
+        self.d_slot = None
+        swap += self._address(top) + ["D=D+M", "A=D-M", "M=D-A"]
+        self.a_slot = None
+        self._forget_cells()
+        self.a_cell = (segment, index)
+
+        if len(load) <= len(swap):
+            self._restore(loaded)
+            return load
+        return swap
+
+    def _binary(self, command: Command, operation: str) -> None:
+        top = self.offset - 1
+        self._emit(command, self._load(top))
+        self._emit(command, self._address(top - 1) + [operation])
+        self.offset -= 1
+        self.d_slot = None
+
+    def _compare(self, command: Command, jump: str) -> None:
+        """
+        Compute x - y into D, optimistically store true, and overwrite it with false
+        when the comparison does not hold
+        """
+
+        top = self.offset - 1
+        label = f"END_IF_{command.arg1.upper()}{Command.label_count}"
+        Command.label_count += 1
+
+        self._emit(command, self._load(top))
+        self._emit(command, self._address(top - 1) + ["D=M-D", "M=-1", f"@{label}", f"D;{jump}"])
+        self.a_slot = None
+        self._emit(command, self._address(top - 1) + ["M=0", f"({label})"])
+        self.a_slot = None
+        self.d_slot = None
+        self.offset -= 1
+
+    def _if_goto(self, command: Command) -> None:
+        """
+        Pop the condition into D, write SP back without disturbing D, and branch
+        """
+
+        self._emit(command, self._load(self.offset - 1))
+        self.offset -= 1
+        self._emit(command, self._flush(keep_d=True))
+        self._emit(command, [f"@{command.arg1}", "D;JNE"])
+        self.a_slot = None
+        self.d_slot = None
+
+    def _fused_branch(self, command: FusedBranch) -> None:
+        """
+        Compute x - y into D, drop both operands, write SP back and jump on D
+        """
+
+        command.translation = [f"{COMMENT} {fused}" for fused in command.fused]
+        top = self.offset - 1
+        self._emit(command, self._load(top))
+        self._emit(command, self._address(top - 1) + ["D=M-D"])
+        self.offset -= 2
+        self.d_slot = None
+        self._emit(command, self._flush(keep_d=True))
+        self._emit(command, [f"@{command.arg1}", f"D;{command.jump}"])
+        self.a_slot = None
+
+
+def _load_segment(command: Command, segment: str, index: int) -> list[str]:
+    """
+    Lines that put the value of `segment[index]` in D
+    """
+
+    if segment == "constant":
+        return [f"@{index}", "D=A"]
+    if segment in SEGMENTS:
+        if index == 0:
+            return [f"@{SEGMENTS[segment]}", "A=M", "D=M"]
+        if index == 1:
+            return [f"@{SEGMENTS[segment]}", "A=M+1", "D=M"]
+        return [f"@{index}", "D=A", f"@{SEGMENTS[segment]}", "A=D+M", "D=M"]
+    if segment == "temp":
+        return [f"@{5 + index}", "D=M"]
+    if segment == "pointer":
+        return ["@THIS" if index == 0 else "@THAT", "D=M"]
+    return [command.static_reference(index), "D=M"]
+
+
+def _cell(command: Command, segment: str, index: int) -> tuple[str, int]:
+    """
+    The key of the cell `segment[index]` as held in A or D.  Static cells are keyed by
+    their symbol, since each file, and so each inlined body, has its own statics.
+    """
+
+    if segment == "static":
+        return command.static_reference(index), index
+    return segment, index
+
+
+def _store_segment(command: Command, segment: str, index: int) -> list[str]:
+    """
+    Lines that store D into `segment[index]`, for any segment except `constant` and the
+    pointer-based segments with an index above 1
+    """
+
+    if segment in SEGMENTS:
+        return [f"@{SEGMENTS[segment]}", "A=M" if index == 0 else "A=M+1", "M=D"]
+    if segment == "temp":
+        return [f"@{5 + index}", "M=D"]
+    if segment == "pointer":
+        return ["@THIS" if index == 0 else "@THAT", "M=D"]
+    return [command.static_reference(index), "M=D"]
+
+
+def translate_program(program: Program, cache_bases: bool = False) -> None:
+    """
+    Translate every command of the program with the stack-tracking code generator.
+    `function` headers are translated as usual.
+
+    Args:
+        `program` (Program): The program to translate
+        `cache_bases` (bool): Whether to reuse the segment cells and bases held in A and D
+    """
+
+    translator = BlockTranslator(cache_bases)
+    for function in program.functions:
+        if function.header is not None:
+            function.header.translate()
+        for block in function.blocks:
+            translator.translate_block(block)
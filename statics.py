@@ -0,0 +1,103 @@
+"""
+Whole-program allocation of the static segment.  Assigns every static variable used by
+the program a RAM address directly, packing the indices each file actually uses, rather
+than leaving the assembler to allocate `Foo.i` symbols in order of first appearance.
+"""
+
+from __future__ import annotations
+
+from command import Command
+from constants import CType, STATIC_BASE, STATIC_LIMIT
+
+
+class StaticOverflowError(Exception):
+    """
+    Raised when a program uses more static variables than the static segment can hold
+    """
+
+
+def plan_statics(
+    commands: list[Command], base: int = STATIC_BASE, limit: int = STATIC_LIMIT
+) -> dict[str, dict[int, int]]:
+    """
+    Assign a RAM address to every static variable used in the program.  Files are laid
+    out in order of first appearance and within a file the used indices are packed in
+    ascending order, so unused indices take up no space.
+
+    Args:
+        `commands` (list[Command]): Every parsed command of the program
+        `base` (int): The first RAM address of the static segment
+        `limit` (int): The number of words available in the static segment
+
+    Returns:
+        dict[str, dict[int, int]]: For each filename, a map of static index to RAM address
+
+    Raises:
+        StaticOverflowError: If the program needs more than `limit` static variables
+    """
+
+    used: dict[str, set[int]] = {}
+    for command in commands:
+        if command.c_type in (CType.PUSH, CType.POP) and command.arg1 == "static":
+            used.setdefault(command.filename, set()).add(int(command.arg2))
+
+    total = sum(len(indices) for indices in used.values())
+    if total > limit:
+        usage = ", ".join(f"{filename}: {len(indices)}" for filename, indices in used.items())
+        raise StaticOverflowError(
+            f"Program uses {total} static variables but only {limit} fit "
+            f"in RAM[{base}-{base + limit - 1}] ({usage})"
+        )
+
+    allocation: dict[str, dict[int, int]] = {}
+    address = base
+    for filename, indices in used.items():
+        allocation[filename] = {}
+        for index in sorted(indices):
+            allocation[filename][index] = address
+            address += 1
+
+    return allocation
+
+
+def apply_statics(commands: list[Command], allocation: dict[str, dict[int, int]]) -> None:
+    """
+    Point every `push/pop static` command at its allocated address so it is translated
+    to a direct `@address` instead of a symbol.
+
+    Args:
+        `commands` (list[Command]): Every parsed command of the program
+        `allocation` (dict[str, dict[int, int]]): The result of `plan_statics`
+    """
+
+    for command in commands:
+        if command.c_type in (CType.PUSH, CType.POP) and command.arg1 == "static":
+            command.static_address = allocation[command.filename][int(command.arg2)]
+
+
+def format_static_report(
+    allocation: dict[str, dict[int, int]], limit: int = STATIC_LIMIT
+) -> str:
+    """
+    Format the per-file static usage of an allocation as a human readable report.
+
+    Args:
+        `allocation` (dict[str, dict[int, int]]): The result of `plan_statics`
+        `limit` (int): The number of words available in the static segment
+
+    Returns:
+        str: One line per file followed by a total line
+    """
+
+    lines = []
+    total = 0
+    for filename, addresses in allocation.items():
+        total += len(addresses)
+        first, last = min(addresses.values()), max(addresses.values())
+        lines.append(
+            f"{filename}: {len(addresses)} statics (max index {max(addresses)}) "
+            f"at RAM[{first}-{last}]"
+        )
+    lines.append(f"Total: {total}/{limit} static words used")
+
+    return "\n".join(lines)
@@ -0,0 +1,218 @@
+"""
+Shared call and return stubs.  Every `call` and `return` normally expands to its full
+frame handling sequence; with shared stubs each site only loads its parameters and jumps
+to a single copy of that sequence, trading a few cycles for a much smaller program.
+"""
+
+from __future__ import annotations
+
+from command import Command, PUSH_D, PUSH_POINTERS
+from constants import COMMENT, CType, LABEL
+from ir import Program
+
+CALL_STUB = "__VM_CALL"
+# The call stub after it has pushed the return address, where call entries join it
+CALL_FRAME_STUB = "__VM_CALL_FRAME"
+RETURN_STUB = "__VM_RETURN"
+STUBS_END = "__VM_STUBS_END"
+
+# Calls to a function with the same argument count share a call entry once there are at
+# least this many of them.  An entry costs 13 to 15 instructions and saves 6 to 8 at every
+# call site, so it pays for itself from the third site.
+CALL_ENTRY_MIN_SITES = 3
+
+
+class SharedCall(Command):
+    """
+    A `call` that passes the argument count in R13, the function address in R14 and the
+    return address in D to the shared call stub
+    """
+
+    def translate(self) -> None:
+        function = self.arg1
+        n_args = int(self.arg2)
+        return_label = f"{function}$ret.{Command.label_count}"
+        Command.label_count += 1
+
+        self.translation.append(f"{COMMENT} {self.command}")
+        if n_args in (0, 1):
+            self.translation.extend(["@R13", f"M={n_args}"])
+        else:
+            self.translation.extend([f"@{n_args}", "D=A", "@R13", "M=D"])
+        self.translation.extend(
+            [
+                f"@{function}",
+                "D=A",
+                "@R14",
+                "M=D",
+                f"@{return_label}",
+                "D=A",
+                f"@{CALL_STUB}",
+                "0;JMP",
+                LABEL.format(return_label),
+            ]
+        )
+
+
+class EntryCall(SharedCall):
+    """
+    A `call` that only loads the return address into D and jumps to the call entry its
+    function and argument count share with other call sites, see `call_entries`
+    """
+
+    def translate(self) -> None:
+        return_label = f"{self.arg1}$ret.{Command.label_count}"
+        Command.label_count += 1
+
+        self.translation.extend(
+            [
+                f"{COMMENT} {self.command}",
+                f"@{return_label}",
+                "D=A",
+                f"@{entry_label(self.arg1, int(self.arg2))}",
+                "0;JMP",
+                LABEL.format(return_label),
+            ]
+        )
+
+
+def entry_label(function: str, n_args: int) -> str:
+    """
+    The label of the call entry for calls to `function` with `n_args` arguments
+    """
+
+    return f"{CALL_STUB}.{function}.{n_args}"
+
+
+class SharedReturn(Command):
+    """
+    A `return` that jumps to the shared return stub
+    """
+
+    def translate(self) -> None:
+        self.translation.extend([f"{COMMENT} {self.command}", f"@{RETURN_STUB}", "0;JMP"])
+
+
+def shared_stubs_pass(program: Program) -> None:
+    """
+    Pass that replaces every `call` and `return` with its shared stub version.  Tail
+    calls are left alone since they do not build a frame.
+
+    Args:
+        `program` (Program): The program to rewrite in place
+    """
+
+    for function in program.functions:
+        for block in function.blocks:
+            terminator = block.terminator
+            if type(terminator) is Command:  # pylint: disable=unidiomatic-typecheck
+                if terminator.c_type == CType.CALL:
+                    block.commands[-1] = SharedCall(terminator.command, terminator.filename)
+                elif terminator.c_type == CType.RETURN:
+                    block.commands[-1] = SharedReturn(terminator.command, terminator.filename)
+
+
+def compact_calls_pass(program: Program) -> None:
+    """
+    Pass that gives the shared calls of a function with a given argument count a call
+    entry when there are at least `CALL_ENTRY_MIN_SITES` of them, turning them into
+    `EntryCall`s.  Runs after `shared_stubs_pass`.
+
+    Args:
+        `program` (Program): The program to rewrite in place
+    """
+
+    sites: dict[tuple[str, str], int] = {}
+    for command in program.commands():
+        if type(command) is SharedCall:  # pylint: disable=unidiomatic-typecheck
+            key = (command.arg1, command.arg2)
+            sites[key] = sites.get(key, 0) + 1
+
+    for function in program.functions:
+        for block in function.blocks:
+            call = block.terminator
+            if (
+                type(call) is SharedCall  # pylint: disable=unidiomatic-typecheck
+                and sites[(call.arg1, call.arg2)] >= CALL_ENTRY_MIN_SITES
+            ):
+                block.commands[-1] = EntryCall(call.command, call.filename)
+
+
+def call_entries(commands: list[Command]) -> list[tuple[str, int]]:
+    """
+    The call entries the commands jump to, in order of first use
+
+    Returns:
+        list[tuple[str, int]]: The function and argument count of each entry
+    """
+
+    return list(
+        dict.fromkeys(
+            (command.arg1, int(command.arg2))
+            for command in commands
+            if isinstance(command, EntryCall)
+        )
+    )
+
+
+def stub_routines(entries: list[tuple[str, int]] = ()) -> list[str]:
+    """
+    The ASM for the shared stubs, preceded by a jump over them so they can be placed
+    ahead of the program's own code.
+
+    A call entry pushes the return address in D, passes its argument count and function
+    to the call stub in R13 and R14 as a `SharedCall` would, and joins the call stub
+    after its own push of the return address.
+
+    Args:
+        `entries` (list[tuple[str, int]]): The call entries to include, see
+            `call_entries`
+
+    Returns:
+        list[str]: The stub routines
+    """
+
+    frame_return = Command("return")
+    frame_return.translate()
+
+    lines = [f"{COMMENT} shared call/return stubs", f"@{STUBS_END}", "0;JMP"]
+    for function, n_args in entries:
+        lines.append(LABEL.format(entry_label(function, n_args)))
+        lines.extend(PUSH_D)
+        if n_args in (0, 1):
+            lines.extend(["@R13", f"M={n_args}"])
+        else:
+            lines.extend([f"@{n_args}", "D=A", "@R13", "M=D"])
+        lines.extend([f"@{function}", "D=A", "@R14", "M=D", f"@{CALL_FRAME_STUB}", "0;JMP"])
+    lines.append(LABEL.format(CALL_STUB))
+    lines.extend(PUSH_D)
+    if entries:
+        lines.append(LABEL.format(CALL_FRAME_STUB))
+    lines.extend(PUSH_POINTERS)
+    lines.extend(
+        [
+            # ARG = SP - 5 - nArgs
+            "@SP",
+            "D=M",
+            "@R13",
+            "D=D-M",
+            "@5",
+            "D=D-A",
+            "@ARG",
+            "M=D",
+            # LCL = SP
+            "@SP",
+            "D=M",
+            "@LCL",
+            "M=D",
+            # goto function
+            "@R14",
+            "A=M",
+            "0;JMP",
+        ]
+    )
+    lines.append(LABEL.format(RETURN_STUB))
+    lines.extend(frame_return.translation[1:])
+    lines.append(LABEL.format(STUBS_END))
+
+    return lines
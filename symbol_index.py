@@ -0,0 +1,195 @@
+"""
+Sorted symbol index for translated programs.  The index is a binary sidecar to the .asm
+file mapping every label to its ROM address and every function to the range of ROM it
+occupies.  Records have a fixed size and are sorted, so a reader can memory-map the file
+and look symbols up by binary search without loading or parsing it.
+
+Layout, all integers little-endian unsigned 32-bit:
+
+    header     magic "HSYM", version, label count, function count, string table offset
+    labels     (name offset, name length, address), sorted by name bytes
+    functions  (name offset, name length, start, end), sorted by start address
+    strings    the UTF-8 names, back to back
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+import mmap
+import struct
+
+from constants import COMMENT
+
+SYMBOL_INDEX_EXTENSION = ".sym"
+MAGIC = b"HSYM"
+VERSION = 1
+
+HEADER = struct.Struct("<4sIIII")
+LABEL_RECORD = struct.Struct("<III")
+FUNCTION_RECORD = struct.Struct("<IIII")
+
+
+def label_addresses(lines: Iterable[str]) -> tuple[dict[str, int], int]:
+    """
+    Resolve the ROM address of every label the way the assembler does.
+
+    Args:
+        `lines` (Iterable[str]): Lines of Hack assembly
+
+    Returns:
+        tuple[dict[str, int], int]: The address of each label and the program length
+    """
+
+    labels = {}
+    address = 0
+    for line in lines:
+        line = line.split(COMMENT)[0].strip()
+        if not line:
+            continue
+        if line[0] == "(":
+            labels[line[1:-1]] = address
+        else:
+            address += 1
+
+    return labels, address
+
+
+def write_symbol_index(path: str, lines: Iterable[str], functions: Iterable[str]) -> int:
+    """
+    Write the symbol index of a program.  A function's range runs from its label up to
+    the next function's, or the end of the program.
+
+    Args:
+        `path` (str): The filepath of the index
+        `lines` (Iterable[str]): The program's Hack assembly
+        `functions` (Iterable[str]): The labels that start functions
+
+    Returns:
+        int: The number of labels indexed
+    """
+
+    labels, length = label_addresses(lines)
+    starts = sorted((labels[name], name) for name in set(functions) if name in labels)
+    ends = [start for start, _ in starts[1:]] + [length]
+
+    strings = bytearray()
+    offsets: dict[str, tuple[int, int]] = {}
+    for name in labels:
+        encoded = name.encode("UTF-8")
+        offsets[name] = (len(strings), len(encoded))
+        strings += encoded
+
+    records = bytearray()
+    for name in sorted(labels, key=lambda name: name.encode("UTF-8")):
+        records += LABEL_RECORD.pack(*offsets[name], labels[name])
+    for (start, name), end in zip(starts, ends):
+        records += FUNCTION_RECORD.pack(*offsets[name], start, end)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, len(labels), len(starts), HEADER.size + len(records)
+    )
+    with open(path, "wb") as f:
+        f.write(header + records + strings)
+
+    return len(labels)
+
+
+class _Column:
+    """
+    One field of a table of fixed-size records, read as a sequence so it can be searched
+    with `bisect`
+    """
+
+    def __init__(self, read, count: int) -> None:
+        self._read = read
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int):
+        return self._read(i)
+
+
+class SymbolIndex:
+    """
+    A memory-mapped symbol index written by `write_symbol_index`.  Lookups are binary
+    searches over the mapped records.
+
+    Attributes:
+        `n_labels` (int): the number of labels in the index
+        `n_functions` (int): the number of functions in the index
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.n_labels, self.n_functions, self._strings = HEADER.unpack_from(
+            self._map
+        )
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} symbol index")
+        self._functions = HEADER.size + self.n_labels * LABEL_RECORD.size
+
+        self._label_names = _Column(
+            lambda i: self._name(LABEL_RECORD.unpack_from(self._map, self._label(i))),
+            self.n_labels,
+        )
+        self._function_starts = _Column(
+            lambda i: FUNCTION_RECORD.unpack_from(self._map, self._function(i))[2],
+            self.n_functions,
+        )
+
+    def __enter__(self) -> SymbolIndex:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmap the index
+        """
+
+        self._map.close()
+
+    def _label(self, i: int) -> int:
+        return HEADER.size + i * LABEL_RECORD.size
+
+    def _function(self, i: int) -> int:
+        return self._functions + i * FUNCTION_RECORD.size
+
+    def _name(self, record: tuple) -> bytes:
+        start = self._strings + record[0]
+        return self._map[start : start + record[1]]
+
+    def address(self, label: str) -> int | None:
+        """
+        The ROM address of `label`, None if there is no such label
+        """
+
+        key = label.encode("UTF-8")
+        i = bisect_left(self._label_names, key)
+        if i == self.n_labels or self._label_names[i] != key:
+            return None
+        return LABEL_RECORD.unpack_from(self._map, self._label(i))[2]
+
+    def function_at(self, address: int) -> tuple[str, int, int] | None:
+        """
+        The function whose code contains ROM `address`.
+
+        Returns:
+            tuple[str, int, int] | None: The function's name, first address and the
+                address after its last instruction, or None outside every function
+        """
+
+        i = bisect_right(self._function_starts, address) - 1
+        if i < 0:
+            return None
+        record = FUNCTION_RECORD.unpack_from(self._map, self._function(i))
+        if address >= record[3]:
+            return None
+        return self._name(record).decode("UTF-8"), record[2], record[3]
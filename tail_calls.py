@@ -0,0 +1,119 @@
+"""
+Tail-call optimization.  A `call f n` immediately followed by `return` is translated as a
+jump that reuses the current frame, so tail-recursive code runs in constant stack depth.
+"""
+
+from __future__ import annotations
+
+from command import Command
+from constants import COMMENT, CType, GOTO, LABEL
+
+# Moves the word after R13 to the word after R14, advancing both pointers
+MOVE_WORD = ["@R13", "AM=M+1", "D=M", "@R14", "AM=M+1", "M=D"]
+
+
+class TailCall(Command):
+    """
+    A `call` whose caller returns the callee's result straight away.
+
+    Instead of pushing a new frame the arguments are moved down into the current
+    argument segment and the current frame (return address and saved pointers) is moved
+    to sit just above them, exactly where `call` would have built the callee's frame.
+    When the callee takes as many arguments as the current function, which is always the
+    case for self-recursion, the frame is already in place and only the arguments move.
+    """
+
+    def translate(self) -> None:
+        """
+        Translate the tail call, with the dropped `return` kept as a comment
+        """
+
+        function = self.arg1
+        n_args = int(self.arg2)
+        general = f"{function}$tail.{Command.label_count}"
+        Command.label_count += 1
+
+        self.translation.extend([f"{COMMENT} {self.command}", f"{COMMENT} return"])
+        self.translation.extend(
+            [
+                # Same number of arguments as the current function: LCL - ARG == n + 5
+                "@LCL",
+                "D=M",
+                "@ARG",
+                "D=D-M",
+                f"@{5 + n_args}",
+                "D=D-A",
+                f"@{general}",
+                "D;JNE",
+            ]
+        )
+
+        # Fast path: move the arguments to ARG[0..n-1], SP = LCL, goto function
+        self.translation.extend(_copy_arguments(n_args, n_args))
+        self.translation.extend(["@LCL", "D=M", "@SP", "M=D"])
+        self.translation.extend([line.format(function) for line in GOTO])
+
+        # General path: stage the frame above SP so that [args, frame] is contiguous,
+        # move it all down to ARG, then SP = LCL = ARG + n + 5
+        self.translation.append(LABEL.format(general))
+        self.translation.extend(["@LCL", "D=M", "@6", "D=D-A", "@R13", "M=D"])
+        self.translation.extend(["@SP", "D=M-1", "@R14", "M=D"])
+        self.translation.extend(5 * MOVE_WORD)
+        self.translation.extend(_copy_arguments(n_args, n_args + 5))
+        self.translation.extend(["@R14", "D=M+1", "@SP", "M=D", "@LCL", "M=D"])
+        self.translation.extend([line.format(function) for line in GOTO])
+
+
+def mark_tail_calls(commands: list[Command]) -> list[Command]:
+    """
+    Replace every `call` that is directly followed by `return` with a `TailCall`.  The
+    `return` is dropped since nothing can reach it: a jump could only land on a label,
+    and there is none between the two commands.
+
+    Args:
+        `commands` (list[Command]): Every parsed command of the program
+
+    Returns:
+        list[Command]: The program with tail calls marked
+    """
+
+    marked = []
+    i = 0
+    while i < len(commands):
+        command = commands[i]
+        if (
+            command.c_type == CType.CALL
+            and i + 1 < len(commands)
+            and commands[i + 1].c_type == CType.RETURN
+        ):
+            marked.append(TailCall(command.command, command.filename))
+            i += 2
+        else:
+            marked.append(command)
+            i += 1
+
+    return marked
+
+
+def _copy_arguments(n_args: int, n_words: int) -> list[str]:
+    """
+    Copy `n_words` words starting at SP - n_args (the arguments, followed by the staged
+    frame in the general case) down to ARG.  Copying in ascending order is safe since the
+    destination never lies above the source.
+    """
+
+    if n_words == 0:
+        return []
+
+    return [
+        "@SP",
+        "D=M",
+        f"@{n_args + 1}",
+        "D=D-A",
+        "@R13",
+        "M=D",
+        "@ARG",
+        "D=M-1",
+        "@R14",
+        "M=D",
+    ] + n_words * MOVE_WORD
@@ -0,0 +1,76 @@
+"""
+Shared fixtures for the test suite
+"""
+
+from pytest import fixture
+
+from asm_writer import format_init, format_translated_asm, translate_commands
+from command import Command
+from hack_emulator import HackEmulator
+from ir import Program
+from stack_codegen import translate_program
+from translator import translate_path
+from VMTranslator import initialize_argparser
+
+
+@fixture(autouse=True)
+def reset_label_count():
+    """
+    Every test starts numbering labels from 0, whatever earlier tests translated
+    """
+
+    Command.label_count = 0
+
+
+@fixture
+def run_program():
+    """
+    Translate commands or an IR program, place them after the bootstrap and any shared
+    routines in `stubs`, and run them on the emulator.  With `track_stack` an IR program
+    is translated by the stack-tracking code generator.
+    """
+
+    def run(program, stubs=(), track_stack=False, cache_bases=False) -> HackEmulator:
+        commands = program.commands() if isinstance(program, Program) else program
+        if track_stack:
+            translate_program(program, cache_bases)
+        else:
+            translate_commands(commands)
+        routines = "".join(f"{line}\n" for line in stubs)
+        emulator = HackEmulator(
+            (format_init() + routines + format_translated_asm(commands)).split("\n")
+        )
+        emulator.run()
+        return emulator
+
+    return run
+
+
+@fixture
+def run_output():
+    """
+    Run a translated .asm file on the emulator
+    """
+
+    def run(out_file_name: str) -> HackEmulator:
+        with open(out_file_name, encoding="UTF-8") as f:
+            emulator = HackEmulator(f.read().split("\n"))
+        emulator.run()
+        return emulator
+
+    return run
+
+
+@fixture
+def translate_project():
+    """
+    Translate a .vm file or directory with the command-line flags given, first writing
+    `files`, a mapping of filename to lines, into the directory when given
+    """
+
+    def translate(target, *flags, files=None):
+        for filename, lines in (files or {}).items():
+            (target / filename).write_text("\n".join(lines) + "\n", encoding="UTF-8")
+        return translate_path(str(target), initialize_argparser().parse_args([str(target), *flags]))
+
+    return translate
@@ -0,0 +1,71 @@
+"""
+Test methods for batch module
+"""
+
+from batch import format_batch_summary, read_manifest, translate_batch, unique_targets
+from VMTranslator import initialize_argparser
+
+PROGRAM = "function Sys.init 0\npush constant 1\npush constant 2\nlt\nlabel END\ngoto END\n"
+
+
+def make_projects(tmp_path, names):
+    for name in names:
+        project = tmp_path / name
+        project.mkdir()
+        (project / "Sys.vm").write_text(PROGRAM, encoding="UTF-8")
+    return [str(tmp_path / name) for name in names]
+
+
+def test_read_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# projects\nA\n\nsub/B.vm\n", encoding="UTF-8")
+    assert read_manifest(str(manifest)) == [f"{tmp_path}/A", f"{tmp_path}/sub/B.vm"]
+
+
+def test_translate_batch_serial_matches_parallel(tmp_path):
+    targets = make_projects(tmp_path, ["A", "B", "C"])
+    args = initialize_argparser().parse_args([targets[0]])
+
+    serial = translate_batch(targets, args, jobs=1)
+    serial_asm = [open(result.out_file_name, encoding="UTF-8").read() for result in serial]
+    parallel = translate_batch(targets, args, jobs=2)
+    parallel_asm = [open(result.out_file_name, encoding="UTF-8").read() for result in parallel]
+
+    assert [result.error for result in parallel] == [None, None, None]
+    assert serial_asm == parallel_asm
+    # Every program numbers its labels from zero, as a standalone run would
+    assert len(set(parallel_asm)) == 1
+
+
+def test_translate_batch_failure_does_not_stop_batch(tmp_path):
+    targets = make_projects(tmp_path, ["A"]) + [str(tmp_path / "missing.vm")]
+    args = initialize_argparser().parse_args([targets[0]])
+
+    results = translate_batch(targets, args, jobs=1)
+    assert results[0].error is None
+    assert results[1].error is not None
+
+    summary = format_batch_summary(results, 0.5).splitlines()
+    assert summary[0].startswith(f"ok      {targets[0]} -> ")
+    assert summary[1].startswith(f"FAILED  {targets[1]}: ")
+    assert summary[2] == "1 translated, 1 failed, 6 commands in 0.50 s"
+
+
+def test_translate_batch_malformed_program(tmp_path):
+    targets = make_projects(tmp_path, ["A", "B", "C"])
+    (tmp_path / "B" / "Sys.vm").write_text("function Sys.init 0\nbogus 1\n", encoding="UTF-8")
+    args = initialize_argparser().parse_args([targets[0]])
+
+    results = translate_batch(targets, args, jobs=2)
+
+    assert results[0].error is None and results[2].error is None
+    assert results[1].error.startswith("NotImplementedError")
+    assert format_batch_summary(results, 0.5).splitlines()[1].startswith(
+        f"FAILED  {targets[1]}: NotImplementedError"
+    )
+
+
+def test_unique_targets(tmp_path):
+    targets = [f"{tmp_path}/A", f"{tmp_path}/B", f"{tmp_path}/./A", f"{tmp_path}/B/"]
+
+    assert unique_targets(targets) == [f"{tmp_path}/A", f"{tmp_path}/B"]
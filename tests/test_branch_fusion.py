@@ -0,0 +1,138 @@
+"""
+Test methods for branch_fusion module
+"""
+
+from pytest import mark
+
+from branch_fusion import FusedBranch, fuse_branches_pass
+from ir import build_program
+from vm_parser import parse_commands
+
+# Counts loop iterations for each comparison/negation combination into static 0..5
+MAIN = [
+    "function Sys.init 0",
+    "push constant 0",
+    "pop temp 0",
+    "label LT_LOOP",
+    "push temp 0",
+    "push constant 1",
+    "add",
+    "pop temp 0",
+    "push temp 0",
+    "push constant 5",
+    "lt",
+    "if-goto LT_LOOP",
+    "push temp 0",
+    "pop static 0",
+    "push constant 9",
+    "pop temp 0",
+    "label GT_LOOP",
+    "push temp 0",
+    "push constant 1",
+    "sub",
+    "pop temp 0",
+    "push temp 0",
+    "push constant 3",
+    "neg",
+    "gt",
+    "if-goto GT_LOOP",
+    "push temp 0",
+    "pop static 1",
+    "push constant 0",
+    "pop temp 0",
+    "label EQ_LOOP",
+    "push temp 0",
+    "push constant 1",
+    "add",
+    "pop temp 0",
+    "push temp 0",
+    "push constant 4",
+    "eq",
+    "not",
+    "if-goto EQ_LOOP",
+    "push temp 0",
+    "pop static 2",
+    "push constant 0",
+    "pop temp 0",
+    "label NOT_LT_LOOP",
+    "push temp 0",
+    "push constant 1",
+    "add",
+    "pop temp 0",
+    "push constant 6",
+    "push temp 0",
+    "lt",
+    "not",
+    "if-goto NOT_LT_LOOP",
+    "push temp 0",
+    "pop static 3",
+    "push constant 2",
+    "push constant 2",
+    "eq",
+    "not",
+    "not",
+    "if-goto EQUAL",
+    "push constant 1",
+    "pop static 4",
+    "label EQUAL",
+    "push constant 3",
+    "push constant 1",
+    "gt",
+    "not",
+    "if-goto END",
+    "push constant 1",
+    "pop static 5",
+    "label END",
+    "goto END",
+]
+
+
+def program():
+    return build_program(parse_commands(MAIN, "Main"))
+
+
+def test_fuse_branches_pass():
+    ir = program()
+    fuse_branches_pass(ir)
+    fused = [command for command in ir.commands() if isinstance(command, FusedBranch)]
+    assert [(command.fused, command.jump) for command in fused] == [
+        (["lt", "if-goto LT_LOOP"], "JLT"),
+        (["gt", "if-goto GT_LOOP"], "JGT"),
+        (["eq", "not", "if-goto EQ_LOOP"], "JNE"),
+        (["lt", "not", "if-goto NOT_LT_LOOP"], "JGE"),
+        (["eq", "not", "not", "if-goto EQUAL"], "JEQ"),
+        (["gt", "not", "if-goto END"], "JLE"),
+    ]
+
+
+def test_fused_branch_translation():
+    ir = build_program(parse_commands(["lt", "not", "if-goto LOOP"], ""))
+    fuse_branches_pass(ir)
+    command = ir.commands()[0]
+    command.translate()
+    assert command.translation == [
+        "// lt",
+        "// not",
+        "// if-goto LOOP",
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "A=A-1",
+        "D=M-D",
+        "@SP",
+        "M=M-1",
+        "@LOOP",
+        "D;JGE",
+    ]
+
+
+@mark.parametrize("track_stack", [False, True])
+def test_fused_program_same_result_fewer_cycles(run_program, track_stack):
+    baseline = run_program(program())
+    fused_ir = program()
+    fuse_branches_pass(fused_ir)
+    fused = run_program(fused_ir, track_stack=track_stack)
+
+    assert [fused.word(i) for i in range(16, 22)] == [5, -3, 4, 7, 0, 1]
+    assert fused.ram[:22] == baseline.ram[:22]
+    assert fused.cycles < baseline.cycles
@@ -0,0 +1,143 @@
+"""
+Test methods for bytecode module
+"""
+
+import gzip
+import os
+
+import pytest
+
+from bytecode import (
+    CACHE_DIRECTORY,
+    cached_commands,
+    compile_file,
+    decode,
+    encode,
+    load_file,
+    read_header,
+)
+from command import Command
+from translator import translate_path
+from VMTranslator import initialize_argparser
+from vm_parser import parse_commands
+
+LINES = [
+    "function Main.main 2",
+    "push constant 300",
+    "pop local 1",
+    "push static 3",
+    "push local 1",
+    "add",
+    "label LOOP_π",
+    "push argument 0",
+    "eq",
+    "if-goto LOOP_π",
+    "call Math.multiply 2",
+    "pop pointer 1",
+    "goto LOOP_π",
+    "return",
+]
+
+
+def test_round_trip():
+    commands = decode(encode(LINES, "Main.vm"))
+
+    assert [command.command for command in commands] == LINES
+    assert commands == parse_commands(LINES, "Main.vm")
+    assert [command.opcode for command in commands] == [
+        command.opcode for command in parse_commands(LINES, "Main.vm")
+    ]
+    assert {command.filename for command in commands} == {"Main.vm"}
+
+
+def test_filename_override():
+    commands = decode(encode(LINES, "Main.vm"), "Other.vm")
+
+    assert {command.filename for command in commands} == {"Other.vm"}
+
+
+def test_header():
+    data = encode(LINES, "Main.vm", 1234, 10**18)
+
+    assert read_header(data)[:3] == ("Main.vm", 1234, 10**18)
+    with pytest.raises(ValueError):
+        read_header(b"HSYM" + data[4:])
+
+
+@pytest.mark.parametrize("line", ["push nowhere 1", "push local x", "jump 3", "add 1"])
+def test_invalid_command(line):
+    with pytest.raises(ValueError, match="cannot encode"):
+        encode([line])
+
+
+def test_smaller_than_text():
+    lines = LINES * 100
+
+    assert len(encode(lines)) * 3 < len("\n".join(lines))
+
+
+def test_compile_and_load(tmp_path):
+    source = tmp_path / "Main.vm"
+    source.write_text("\n".join(LINES) + "\n", encoding="UTF-8")
+
+    target = compile_file(str(source))
+
+    assert target == str(tmp_path / "Main.vmb")
+    assert [command.command for command in load_file(target)] == LINES
+
+
+def test_compile_compressed(tmp_path):
+    source = tmp_path / "Main.vm.gz"
+    source.write_bytes(gzip.compress(("\n".join(LINES) + "\n").encode()))
+
+    target = compile_file(str(source))
+
+    assert target == str(tmp_path / "Main.vmb")
+    with open(target, "rb") as f:
+        assert read_header(f.read())[0] == "Main.vm"
+    assert load_file(target) == parse_commands(LINES, "Main.vm")
+
+
+def test_cached_commands(tmp_path):
+    source = tmp_path / "Main.vm"
+    source.write_text("\n".join(LINES) + "\n", encoding="UTF-8")
+    cache = tmp_path / CACHE_DIRECTORY / "Main.vmb"
+
+    assert [command.command for command in cached_commands(str(source))] == LINES
+    assert cache.exists()
+    written = cache.stat().st_mtime_ns
+    assert cached_commands(str(source)) == parse_commands(LINES, "Main.vm")
+    assert cache.stat().st_mtime_ns == written
+
+    # A changed source makes the cache stale
+    source.write_text("push constant 1\n", encoding="UTF-8")
+    os.utime(source, ns=(written + 10**9, written + 10**9))
+    assert [command.command for command in cached_commands(str(source))] == ["push constant 1"]
+
+
+def test_translate_bytecode(tmp_path):
+    source = tmp_path / "Main.vm"
+    source.write_text("\n".join(LINES) + "\n", encoding="UTF-8")
+    translate_path(str(source), initialize_argparser().parse_args([str(source)]))
+    expected = (tmp_path / "Main.asm").read_text(encoding="UTF-8")
+
+    target = compile_file(str(source))
+    os.remove(tmp_path / "Main.asm")
+    Command.label_count = 0
+    translate_path(target, initialize_argparser().parse_args([target]))
+
+    assert (tmp_path / "Main.asm").read_text(encoding="UTF-8") == expected
+
+
+def test_translate_with_cache(tmp_path):
+    (tmp_path / "Main.vm").write_text("\n".join(LINES) + "\n", encoding="UTF-8")
+    args = initialize_argparser().parse_args([str(tmp_path)])
+    translate_path(str(tmp_path), args)
+    expected = (tmp_path / f"{tmp_path.name}.asm").read_text(encoding="UTF-8")
+
+    for _ in range(2):
+        Command.label_count = 0
+        args = initialize_argparser().parse_args([str(tmp_path), "--bytecode-cache"])
+        translate_path(str(tmp_path), args)
+        assert (tmp_path / f"{tmp_path.name}.asm").read_text(encoding="UTF-8") == expected
+    assert (tmp_path / CACHE_DIRECTORY / "Main.vmb").exists()
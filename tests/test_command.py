@@ -4,7 +4,7 @@ Test methods for Command class
 
 from pytest import raises
 
-from command import Command
+from command import Command, OP_ARITHMETIC, OP_CALL
 from constants import CType
 
 valid_parsed_file = [
@@ -194,15 +194,12 @@ def test_translate_pop_local():
     command.translate()
     assert command.translation == [
         "// pop local 1",
-        "@1",
-        "D=A",
-        "@LCL",
-        "D=D+M",
         "@SP",
         "AM=M-1",
-        "D=D+M",
-        "A=D-M",
-        "M=D-A",
+        "D=M",
+        "@LCL",
+        "A=M+1",
+        "M=D",
     ]
 
 
@@ -211,7 +208,22 @@ def test_translate_pop_local_2():
     command.translate()
     assert command.translation == [
         "// pop local 2",
-        "@2",
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "@LCL",
+        "A=M+1",
+        "A=A+1",
+        "M=D",
+    ]
+
+
+def test_translate_pop_local_large_index():
+    command = Command("pop local 4")
+    command.translate()
+    assert command.translation == [
+        "// pop local 4",
+        "@4",
         "D=A",
         "@LCL",
         "D=D+M",
@@ -242,15 +254,13 @@ def test_translate_pop_argument_2():
     command.translate()
     assert command.translation == [
         "// pop argument 2",
-        "@2",
-        "D=A",
-        "@ARG",
-        "D=D+M",
         "@SP",
         "AM=M-1",
-        "D=D+M",
-        "A=D-M",
-        "M=D-A",
+        "D=M",
+        "@ARG",
+        "A=M+1",
+        "A=A+1",
+        "M=D",
     ]
 
 
@@ -259,15 +269,11 @@ def test_translate_pop_temp():
     command.translate()
     assert command.translation == [
         "// pop temp 2",
-        "@2",
-        "D=A",
-        "@5",
-        "D=D+A",
         "@SP",
         "AM=M-1",
-        "D=D+M",
-        "A=D-M",
-        "M=D-A",
+        "D=M",
+        "@R7",
+        "M=D",
     ]
 
 
@@ -351,10 +357,7 @@ def test_translate_push_temp():
     command.translate()
     assert command.translation == [
         "// push temp 2",
-        "@5",
-        "D=A",
-        "@2",
-        "A=D+A",
+        "@R7",
         "D=M",
         "@SP",
         "A=M",
@@ -610,3 +613,24 @@ def test_translate_function_return():
         "A=M",
         "0;JMP",
     ]
+
+
+# Dispatch tests
+def test_command_opcode():
+    assert Command("eq").opcode == OP_ARITHMETIC
+    assert Command("call Main.main 0").opcode == OP_CALL
+    assert Command("bogus 1").opcode is None
+
+
+def test_translate_unknown_command():
+    with raises(NotImplementedError):
+        Command("bogus 1").translate()
+
+
+def test_translate_ready_made_lines_not_shared():
+    first = Command("add")
+    first.translate()
+    first.translation.append("@0")
+    second = Command("add")
+    second.translate()
+    assert second.translation == ["// add", "@SP", "AM=M-1", "D=M", "A=A-1", "M=D+M"]
@@ -0,0 +1,105 @@
+"""
+Test methods for compression module
+"""
+
+import gzip
+
+import pytest
+
+from compression import (
+    COMPRESSION_FORMATS,
+    compressed_name,
+    open_text,
+    strip_compression,
+)
+
+FILES = {
+    "Sys.vm": [
+        "function Sys.init 0",
+        "push constant 7",
+        "call Main.main 1",
+        "label END",
+        "goto END",
+    ],
+    "Main.vm": [
+        "function Main.main 0",
+        "push argument 0",
+        "pop static 1",
+        "push static 1",
+        "push constant 2",
+        "lt",
+        "return",
+    ],
+}
+
+
+def write_program(directory, compress=None):
+    for filename, lines in FILES.items():
+        with open_text(str(directory / compressed_name(filename, compress)), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("compress", COMPRESSION_FORMATS)
+def test_open_text(tmp_path, compress):
+    path = str(tmp_path / f"out.asm.{compress}")
+    with open_text(path, "w") as f:
+        f.write("@SP\n")
+    with open_text(path, "a") as f:
+        f.write("M=M+1\n")
+
+    with open_text(path) as f:
+        assert f.read() == "@SP\nM=M+1\n"
+    with open(path, "rb") as f:
+        assert not f.read().startswith(b"@SP")
+
+
+def test_strip_compression():
+    assert strip_compression("dir/Main.vm.gz") == "dir/Main.vm"
+    assert strip_compression("dir/Main.vm.xz") == "dir/Main.vm"
+    assert strip_compression("dir/Main.vm") == "dir/Main.vm"
+    assert compressed_name("Main.asm", None) == "Main.asm"
+
+
+@pytest.mark.parametrize("compress", COMPRESSION_FORMATS)
+@pytest.mark.parametrize("flags", [[], ["--shared-stubs", "--symbol-index"], ["--pipeline"]])
+def test_compressed_output(tmp_path, translate_project, compress, flags):
+    write_program(tmp_path)
+    expected = translate_project(tmp_path, *flags)
+    with open(expected.out_file_name, encoding="UTF-8") as f:
+        text = f.read()
+
+    result = translate_project(tmp_path, "--compress", compress, *flags)
+
+    assert result.out_file_name == f"{tmp_path}/{tmp_path.name}.asm.{compress}"
+    assert result.n_instructions == expected.n_instructions
+    with open_text(result.out_file_name) as f:
+        assert f.read() == text
+
+
+def test_compressed_input(tmp_path, translate_project):
+    plain = tmp_path / "plain"
+    plain.mkdir()
+    write_program(plain)
+    expected = translate_project(plain)
+    with open(expected.out_file_name, encoding="UTF-8") as f:
+        text = f.read().replace("plain", "packed")
+
+    packed = tmp_path / "packed"
+    packed.mkdir()
+    write_program(packed, "gz")
+    result = translate_project(packed, "--include", "*.vm.gz")
+
+    with open(result.out_file_name, encoding="UTF-8") as f:
+        assert f.read() == text
+
+
+def test_compressed_file(tmp_path, translate_project):
+    (tmp_path / "Main.vm.gz").write_bytes(
+        gzip.compress(("\n".join(FILES["Main.vm"]) + "\n").encode())
+    )
+
+    result = translate_project(tmp_path / "Main.vm.gz")
+
+    assert result.out_file_name == f"{tmp_path}/Main.asm"
+    with open(result.out_file_name, encoding="UTF-8") as f:
+        assert "@Main.vm.1" in f.read()
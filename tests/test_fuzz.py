@@ -0,0 +1,45 @@
+"""
+Test methods for fuzz module
+"""
+
+import fuzz
+from fuzz import check_seed, generate_program, run_program, shrink
+
+
+def test_generate_program_is_deterministic():
+    assert generate_program(7).files() == generate_program(7).files()
+    assert generate_program(7).files() != generate_program(8).files()
+
+
+def test_generated_program_halts():
+    program = generate_program(3)
+    state = run_program(program, [])
+    assert isinstance(state, list)
+    assert state[0] > 256
+
+
+def test_configurations_match_baseline():
+    for seed in range(4):
+        _, _, failures = check_seed(seed, list(fuzz.CONFIGURATIONS))
+        assert [failure.format() for failure in failures] == []
+
+
+def test_shrink():
+    program = generate_program(5)
+    contains_neg = lambda candidate: any(
+        line == "neg" for lines in candidate.files().values() for line in lines
+    )
+    assert contains_neg(program)
+    small = shrink(program, contains_neg)
+    assert contains_neg(small)
+    assert small.size() < program.size()
+
+
+def test_failure_is_found_and_shrunk(monkeypatch):
+    monkeypatch.setitem(fuzz.CONFIGURATIONS, "broken", ["--rom-budget", "10"])
+    seed, skipped, failures = check_seed(2, ["broken"])
+    assert (seed, skipped, len(failures)) == (2, False, 1)
+    failure = failures[0]
+    assert failure.reason.startswith("RomBudgetError")
+    assert failure.program.size() < generate_program(2).size()
+    assert failure.format().startswith("seed 2, broken: RomBudgetError")
@@ -0,0 +1,125 @@
+"""
+Test methods for inliner module
+"""
+
+from inliner import find_leaf_functions, inline_calls
+from vm_parser import parse_commands
+
+FOO = [
+    "function Foo.getY 0",
+    "push argument 0",
+    "pop pointer 0",
+    "push this 1",
+    "return",
+    "function Foo.sum 0",
+    "push argument 0",
+    "push argument 1",
+    "add",
+    "return",
+    "function Foo.loop 0",
+    "label LOOP",
+    "goto LOOP",
+    "return",
+    "function Foo.withLocal 1",
+    "push constant 1",
+    "return",
+]
+
+SYS = [
+    "function Sys.init 0",
+    "push constant 3000",
+    "pop pointer 0",
+    "push constant 4000",
+    "pop pointer 1",
+    "push constant 42",
+    "pop that 1",
+    "push constant 4000",
+    "call Foo.getY 1",
+    "push constant 5",
+    "call Foo.sum 2",
+    "pop static 0",
+    "push pointer 0",
+    "pop static 1",
+    "label END",
+    "goto END",
+]
+
+
+def program():
+    return parse_commands(SYS, "Sys") + parse_commands(FOO, "Foo")
+
+
+def test_find_leaf_functions():
+    leaves = find_leaf_functions(program())
+    assert sorted(leaves) == ["Foo.getY", "Foo.sum"]
+    assert leaves["Foo.getY"].pointers == {0}
+    assert leaves["Foo.sum"].max_argument == 1
+
+
+def test_find_leaf_functions_size_threshold():
+    assert sorted(find_leaf_functions(program(), max_size=2)) == []
+
+
+def test_inline_calls_replaces_call_sites():
+    inlined = inline_calls(program())
+    assert not any(command.command.startswith("call") for command in inlined)
+    assert [command.command for command in inlined[8:16]] == [
+        "push pointer 0",
+        "pop temp 6",
+        "pop temp 7",
+        "push temp 7",
+        "pop pointer 0",
+        "push this 1",
+        "push temp 6",
+        "pop pointer 0",
+    ]
+
+
+def test_inline_calls_not_enough_arguments():
+    commands = parse_commands(["call Foo.sum 1"], "Sys") + parse_commands(FOO, "Foo")
+    assert inline_calls(commands)[0].command == "call Foo.sum 1"
+
+
+def test_inlined_program_same_result_fewer_cycles(run_program):
+    baseline = run_program(program())
+    inlined = run_program(inline_calls(program()))
+
+    assert baseline.word(16) == inlined.word(16) == 47
+    assert baseline.word(17) == inlined.word(17) == 3000
+    assert inlined.ram[:5] == baseline.ram[:5]
+    assert inlined.cycles < baseline.cycles
+
+
+LIVE_TEMP = [
+    "function Sys.init 0",
+    "push constant 80",
+    "pop temp 7",
+    "push constant 5",
+    "call Leaf.inc 1",
+    "push temp 7",
+    "add",
+    "pop static 0",
+    "label END",
+    "goto END",
+    "function Leaf.inc 0",
+    "push argument 0",
+    "push constant 2",
+    "add",
+    "return",
+]
+
+
+def test_inline_keeps_temp_live_across_call(run_program):
+    inlined = inline_calls(parse_commands(LIVE_TEMP, "Sys"))
+
+    assert not any(command.command.startswith("call") for command in inlined)
+    assert "pop temp 6" in [command.command for command in inlined]
+    baseline = run_program(parse_commands(LIVE_TEMP, "Sys"))
+    assert run_program(inlined).word(16) == baseline.word(16) == 87
+
+
+def test_inline_needs_free_temp():
+    every_temp = [f"pop temp {i}" for i in range(8)]
+    commands = parse_commands(LIVE_TEMP[:2] + every_temp + LIVE_TEMP[3:], "Sys")
+
+    assert "call Leaf.inc 1" in [command.command for command in inline_calls(commands)]
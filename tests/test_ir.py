@@ -0,0 +1,96 @@
+"""
+Test methods for ir module
+"""
+
+from command import Command
+from ir import PassManager, build_program
+from passes import build_pass_manager, tail_call_pass
+from tail_calls import TailCall
+from vm_parser import parse_commands
+
+PROGRAM = [
+    "push constant 1",
+    "pop temp 0",
+    "function Main.loop 1",
+    "push constant 10",
+    "pop local 0",
+    "label LOOP",
+    "push local 0",
+    "if-goto BODY",
+    "goto DONE",
+    "label BODY",
+    "push local 0",
+    "call Main.dec 1",
+    "pop local 0",
+    "goto LOOP",
+    "label DONE",
+    "push constant 0",
+    "return",
+    "function Main.dec 0",
+    "push argument 0",
+    "push constant 1",
+    "sub",
+    "call Main.id 1",
+    "return",
+]
+
+
+def program():
+    return build_program(parse_commands(PROGRAM, "Main"))
+
+
+def block_labels(blocks):
+    return [block.label for block in blocks]
+
+
+def test_build_program_functions():
+    functions = program().functions
+    assert [function.name for function in functions] == ["", "Main.loop", "Main.dec"]
+    assert functions[1].n_vars == 1
+    assert functions[0].header is None
+
+
+def test_build_program_blocks():
+    blocks = program()["Main.loop"].blocks
+    assert [len(block.commands) for block in blocks] == [2, 3, 1, 3, 2, 3]
+    assert block_labels(blocks) == [None, "LOOP", None, "BODY", None, "DONE"]
+    assert blocks[1].terminator.command == "if-goto BODY"
+    assert blocks[0].terminator is None
+
+
+def test_build_program_edges():
+    blocks = program()["Main.loop"].blocks
+    assert blocks[0].successors == [blocks[1]]
+    assert blocks[1].successors == [blocks[3], blocks[2]]
+    assert blocks[2].successors == [blocks[5]]
+    assert blocks[3].successors == [blocks[4]]
+    assert blocks[4].successors == [blocks[1]]
+    assert blocks[5].successors == []
+    assert blocks[1].predecessors == [blocks[0], blocks[4]]
+
+
+def test_program_commands_round_trip():
+    commands = parse_commands(PROGRAM, "Main")
+    assert build_program(commands).commands() == commands
+
+
+def test_pass_manager_records_results():
+    pass_manager = PassManager()
+    pass_manager.add("count", lambda program: len(program.functions))
+    pass_manager.run(program())
+    assert pass_manager.results == {"count": 3}
+    assert set(pass_manager.timings) == {"count"}
+
+
+def test_default_pass_manager_has_no_passes():
+    assert build_pass_manager().passes == []
+
+
+def test_tail_call_pass():
+    ir = program()
+    tail_call_pass(ir)
+    dec = ir["Main.dec"]
+    assert isinstance(dec.blocks[-1].terminator, TailCall)
+    assert dec.blocks[-1].successors == []
+    assert [command.command for command in dec.commands()][-1] == "call Main.id 1"
+    assert Command("return") not in dec.commands()
@@ -0,0 +1,138 @@
+"""
+Test methods for linker module
+"""
+
+import pytest
+
+from linker import LinkError, link, make_object, read_object, write_object
+from vm_parser import parse_commands
+
+SYS = [
+    "function Sys.init 0",
+    "push constant 4",
+    "call Main.count 1",
+    "pop static 0",
+    "push constant 3",
+    "push constant 3",
+    "call Math.same 2",
+    "pop static 1",
+    "label END",
+    "goto END",
+]
+
+# Both files use a label called LOOP, which only works if labels are kept per file
+MAIN = [
+    "function Main.count 1",
+    "label LOOP",
+    "push local 0",
+    "push constant 1",
+    "add",
+    "pop local 0",
+    "push local 0",
+    "push argument 0",
+    "lt",
+    "if-goto LOOP",
+    "push local 0",
+    "return",
+]
+
+MATH = [
+    "function Math.same 0",
+    "push argument 0",
+    "push argument 1",
+    "eq",
+    "return",
+    "function Math.unused 0",
+    "label LOOP",
+    "goto LOOP",
+]
+
+
+FILES = {"Sys.vm": SYS, "Main.vm": MAIN, "Math.vm": MATH}
+
+
+def translated_object(name, lines):
+    commands = parse_commands(lines, name)
+    for command in commands:
+        command.translate()
+    return make_object(name, commands)
+
+
+def test_make_object_symbols():
+    obj = translated_object("Main.vm", MAIN + ["push static 2", "call Math.same 2"])
+    assert obj.defines == ["Main.count"]
+    assert obj.locals == {"LOOP", "IF_LT0", "END_IF_LT0", "Math.same$ret.1"}
+    assert obj.references == {"Math.same"}
+    assert obj.variables == {"Main.vm.2"}
+
+
+def test_make_object_duplicate_label():
+    with pytest.raises(LinkError, match="duplicate symbol LOOP in Math.vm"):
+        translated_object("Math.vm", MATH + ["label LOOP"])
+
+
+def test_object_round_trip(tmp_path):
+    obj = translated_object("Main.vm", MAIN)
+    write_object(str(tmp_path / "Main.obj"), obj)
+    read = read_object(str(tmp_path / "Main.obj"))
+    assert (read.name, read.lines, read.defines) == (obj.name, obj.lines, obj.defines)
+    assert (read.locals, read.references, read.variables) == (
+        obj.locals,
+        obj.references,
+        obj.variables,
+    )
+
+
+def test_link_relocates_local_labels():
+    lines = link([translated_object("Main.vm", MAIN), translated_object("Math.vm", MATH)])
+    assert "(Main.vm:LOOP)" in lines
+    assert "(Math.vm:LOOP)" in lines
+    assert "(Main.count)" in lines
+
+
+def test_link_undefined_symbol():
+    with pytest.raises(LinkError, match="undefined symbol Math.same referenced by Sys.vm"):
+        link([translated_object("Sys.vm", SYS), translated_object("Main.vm", MAIN)])
+
+
+def test_link_duplicate_function():
+    with pytest.raises(LinkError, match="Main.count defined in Main.vm and Copy.vm"):
+        link([translated_object("Main.vm", MAIN), translated_object("Copy.vm", MAIN)])
+
+
+def test_strip_unused_library():
+    # Without a bootstrap or top-level code nothing says which functions are used
+    objects = [translated_object("Main.vm", MAIN), translated_object("Math.vm", MATH)]
+
+    lines = link(objects, strip_unused=True)
+
+    assert lines == link(objects)
+    assert "(Math.unused)" in lines
+
+
+def test_objects_mode_runs(tmp_path, translate_project, run_output):
+    result = translate_project(tmp_path, "--objects", files=FILES)
+    emulator = run_output(result.out_file_name)
+    assert (emulator.word(16), emulator.word(17)) == (4, -1)
+    assert sorted(path.name for path in tmp_path.glob("*.obj")) == [
+        "Main.obj",
+        "Math.obj",
+        "Sys.obj",
+    ]
+
+
+def test_objects_do_not_depend_on_other_files(tmp_path, translate_project):
+    translate_project(tmp_path, "--objects", files=FILES)
+    before = (tmp_path / "Math.obj").read_text(encoding="UTF-8")
+    translate_project(tmp_path, "--objects", files={"Main.vm": MAIN + ["push constant 1", "eq"]})
+    assert (tmp_path / "Math.obj").read_text(encoding="UTF-8") == before
+
+
+def test_strip_unused(tmp_path, translate_project, run_output):
+    full = translate_project(tmp_path, "--objects", files=FILES)
+    stripped = translate_project(tmp_path, "--strip-unused")
+    assert stripped.n_instructions < full.n_instructions
+    with open(stripped.out_file_name, encoding="UTF-8") as f:
+        assert "(Math.unused)" not in f.read()
+    emulator = run_output(stripped.out_file_name)
+    assert (emulator.word(16), emulator.word(17)) == (4, -1)
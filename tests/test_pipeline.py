@@ -0,0 +1,125 @@
+"""
+Test methods for pipeline module
+"""
+
+import time
+
+import pytest
+
+from pipeline import OrderedWriter, prefetch
+
+FILES = {
+    "Sys.vm": [
+        "function Sys.init 0",
+        "push constant 3",
+        "call Main.count 1",
+        "pop static 0",
+        "label END",
+        "goto END",
+    ],
+    "Main.vm": [
+        "function Main.count 0",
+        "label LOOP",
+        "push argument 0",
+        "push constant 0",
+        "eq",
+        "if-goto DONE",
+        "push argument 0",
+        "push constant 1",
+        "sub",
+        "pop argument 0",
+        "goto LOOP",
+        "label DONE",
+        "push argument 0",
+        "call Util.twice 1",
+        "return",
+    ],
+    "Util.vm": [
+        "function Util.twice 0",
+        "push argument 0",
+        "push argument 0",
+        "add",
+        "return",
+    ],
+}
+
+
+@pytest.mark.parametrize(
+    "flags",
+    [
+        [],
+        ["--tail-calls", "--fuse-branches", "--shared-stubs"],
+        ["--track-stack", "--cache-bases", "--translation-cache"],
+        ["--inline", "--allocate-statics"],
+    ],
+)
+def test_same_output(tmp_path, translate_project, flags):
+    expected = translate_project(tmp_path, *flags, files=FILES).out_file_name
+    with open(expected, encoding="UTF-8") as f:
+        text = f.read()
+
+    result = translate_project(tmp_path, "--pipeline", *flags)
+
+    with open(result.out_file_name, encoding="UTF-8") as f:
+        assert f.read() == text
+
+
+def test_prefetch_order():
+    files = [f"File{i}.vm" for i in range(10)]
+
+    assert list(prefetch(files, str.lower, depth=2)) == [(file, file.lower()) for file in files]
+
+
+def test_prefetch_error():
+    def load(file):
+        if file == "Bad.vm":
+            raise FileNotFoundError(file)
+        return file
+
+    loaded = []
+    with pytest.raises(FileNotFoundError):
+        for file, _ in prefetch(["A.vm", "Bad.vm", "C.vm"], load):
+            loaded.append(file)
+    assert loaded == ["A.vm"]
+
+
+def test_prefetch_stopped_early():
+    files = [f"File{i}.vm" for i in range(100)]
+
+    for file, _ in prefetch(files, str.lower, depth=1):
+        if file == "File3.vm":
+            break
+
+
+def test_prefetch_overlaps():
+    # Loading and consuming each take 20ms; in turn that would be 200ms for five files
+    def load(file):
+        time.sleep(0.02)
+        return file
+
+    start = time.perf_counter()
+    for _ in prefetch([f"File{i}.vm" for i in range(5)], load):
+        time.sleep(0.02)
+
+    assert time.perf_counter() - start < 0.17
+
+
+def test_ordered_writer(tmp_path):
+    path = tmp_path / "out.asm"
+    with OrderedWriter(str(path), depth=1) as writer:
+        for i in range(50):
+            writer.write(f"{i}\n")
+
+    assert path.read_text(encoding="UTF-8") == "".join(f"{i}\n" for i in range(50))
+
+
+def test_ordered_writer_reraises_write_error(tmp_path):
+    writer = OrderedWriter(str(tmp_path / "out.asm"), depth=1)
+    writer._file.write = lambda text: 1 / 0  # pylint: disable=protected-access
+
+    # The failed write is reported rather than leaving the writer blocked on a full queue
+    with pytest.raises(ZeroDivisionError):
+        for i in range(50):
+            writer.write(f"{i}\n")
+    with pytest.raises(ZeroDivisionError):
+        writer.close()
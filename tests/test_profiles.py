@@ -0,0 +1,180 @@
+"""
+Test methods for profiles module
+"""
+
+from profiles import (
+    PROFILES,
+    TEMPLATES,
+    Cost,
+    apply_profile,
+    cost_table,
+    estimate_cycles,
+    format_profile_summary,
+    program_cost,
+)
+from stubs import SharedCall
+from VMTranslator import initialize_argparser
+from vm_parser import parse_commands
+
+# A loop calling a leaf function and a method that works on `this`
+PROGRAM = [
+    "function Sys.init 0",
+    "push constant 3000",
+    "pop pointer 0",
+    "push constant 5",
+    "pop static 0",
+    "label LOOP",
+    "push static 0",
+    "push constant 2",
+    "call Main.add 2",
+    "call Main.store 1",
+    "pop temp 0",
+    "push static 0",
+    "push constant 1",
+    "sub",
+    "pop static 0",
+    "push static 0",
+    "push constant 0",
+    "gt",
+    "if-goto LOOP",
+    "label END",
+    "goto END",
+    "function Main.add 0",
+    "push argument 0",
+    "push argument 1",
+    "add",
+    "return",
+    "function Main.store 0",
+    "push this 0",
+    "push argument 0",
+    "add",
+    "pop this 0",
+    "push this 0",
+    "push this 1",
+    "add",
+    "pop this 1",
+    "push this 1",
+    "return",
+]
+
+
+def test_estimate_cycles_straight_line():
+    assert estimate_cycles(["// push constant 1", "@1", "D=A", "@SP", "M=D"]) == 4
+
+
+def test_estimate_cycles_branch_takes_mean():
+    # Not taken runs @1 and @2, taken only @2
+    assert estimate_cycles(["@X", "D;JEQ", "@1", "(X)", "@2"]) == 2 + (2 + 1) / 2
+
+
+def test_estimate_cycles_leaves_at_outside_jump():
+    assert estimate_cycles(["@Main.f", "0;JMP", "@1"]) == 2
+
+
+def test_shared_call_pays_for_stub():
+    call = SharedCall("call Main.f 2", "Main.vm")
+    call.translate()
+    cost = program_cost([call])
+
+    assert cost.instructions > program_cost([call], routines=False).instructions
+    assert cost.cycles > program_cost([call], routines=False).instructions
+
+
+def test_cost_table_has_every_lowering():
+    table = cost_table()
+
+    for template, (option, _) in TEMPLATES.items():
+        assert set(table[template]) == {"expanded", option}
+    # Shared stubs trade cycles for size, tail calls size for cycles
+    shared = table["call/return"]
+    assert shared["shared_stubs"].instructions < shared["expanded"].instructions
+    assert shared["shared_stubs"].cycles > shared["expanded"].cycles
+    tail = table["tail call"]
+    assert tail["tail_calls"].cycles < tail["expanded"].cycles
+    assert tail["tail_calls"].instructions > tail["expanded"].instructions
+
+
+def test_profile_options():
+    assert not PROFILES["0"].options()
+    assert "inline" in PROFILES["2"].options()
+    assert "tail_calls" in PROFILES["2"].options()
+    assert "shared_stubs" not in PROFILES["2"].options()
+    assert "tail_calls" not in PROFILES["s"].options()
+    assert "shared_stubs" in PROFILES["s"].options(n_calls=100)
+    assert "shared_stubs" not in PROFILES["s"].options(n_calls=1)
+
+
+def test_apply_profile_keeps_explicit_options():
+    args = initialize_argparser().parse_args(["Main.vm", "-O0", "--track-stack"])
+    applied = apply_profile(args, parse_commands(["call Main.f 0"], "Main.vm"))
+
+    assert applied.track_stack
+    assert not applied.inline
+
+
+def test_format_profile_summary():
+    summary = format_profile_summary("s", Cost(200, 180.0), Cost(150, 190.5))
+
+    assert summary == (
+        "-Os: 200 -> 150 instructions (-25.0%), 180 -> 190 estimated cycles (+5.8%)"
+    )
+
+
+# Keeps a value in temp across a call to a leaf function
+LIVE_TEMP = [
+    "function Sys.init 0",
+    "push constant 80",
+    "pop temp 7",
+    "push constant 5",
+    "call Main.inc 1",
+    "push temp 7",
+    "add",
+    "pop static 0",
+    "label END",
+    "goto END",
+    "function Main.inc 0",
+    "push argument 0",
+    "push constant 2",
+    "add",
+    "return",
+]
+
+
+def test_profiles_live_temp(tmp_path, translate_project, run_output):
+    for profile in PROFILES:
+        result = translate_project(tmp_path, f"-O{profile}", files={"Sys.vm": LIVE_TEMP})
+        assert run_output(result.out_file_name).ram[16] == 87
+
+
+def test_profiles_same_result(tmp_path, translate_project, run_output):
+    results = {}
+    for profile in PROFILES:
+        result = translate_project(tmp_path, f"-O{profile}", files={"Sys.vm": PROGRAM})
+        assert result.reports[0].startswith(f"-O{profile}: ")
+        emulator = run_output(result.out_file_name)
+        results[profile] = (emulator.ram[:5], emulator.ram[16], emulator.ram[3000:3002])
+        results[profile, "cycles"] = emulator.cycles
+
+    assert results["0"] == results["2"] == results["s"]
+    assert results["2", "cycles"] < results["0", "cycles"]
+
+
+# Sys.vm's static 3 and Main.vm's static 3 end up in one block once Main.get is inlined
+STATIC_PER_FILE = {
+    "Sys.vm": [
+        "function Sys.init 0",
+        "push constant 5",
+        "pop static 3",
+        "call Main.get 0",
+        "pop static 0",
+        "label END",
+        "goto END",
+    ],
+    "Main.vm": ["function Main.get 0", "push static 3", "return"],
+}
+
+
+def test_profiles_static_per_file(tmp_path, translate_project, run_output):
+    for profile in PROFILES:
+        result = translate_project(tmp_path, f"-O{profile}", files=STATIC_PER_FILE)
+        assert run_output(result.out_file_name).ram[16:19] == [5, 0, 0]
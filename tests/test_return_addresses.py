@@ -0,0 +1,87 @@
+"""
+Test methods for return_addresses module
+"""
+
+from command import Command
+from hack_emulator import HackEmulator
+from return_addresses import format_call_report, resolve_return_labels
+
+SYS = [
+    "function Sys.init 0",
+    "push constant 1",
+    "call Main.inc 1",
+    "call Main.inc 1",
+    "call Main.inc 1",
+    "call Main.double 1",
+    "pop static 0",
+    "label END",
+    "goto END",
+]
+MAIN = [
+    "function Main.inc 0",
+    "push argument 0",
+    "push constant 1",
+    "add",
+    "return",
+    "function Main.double 0",
+    "push argument 0",
+    "push argument 0",
+    "add",
+    "return",
+]
+
+FILES = {"Sys.vm": SYS, "Main.vm": MAIN}
+
+
+def read_lines(result):
+    with open(result.out_file_name, encoding="UTF-8") as f:
+        return f.read().split("\n")
+
+
+def test_resolve_return_labels():
+    lines = ["// call", "@Main.f$ret.0", "D=A", "@Main.f", "0;JMP", "(Main.f$ret.0)", "(LOOP)"]
+
+    resolved, n_labels = resolve_return_labels(lines, 100)
+
+    assert n_labels == 1
+    assert resolved == ["// call", "@104", "D=A", "@Main.f", "0;JMP", "(LOOP)"]
+    assert resolve_return_labels(["@SP", "(LOOP)"]) == (["@SP", "(LOOP)"], 0)
+
+
+def test_compact_calls(tmp_path, translate_project):
+    expected = read_lines(translate_project(tmp_path, "--shared-stubs", files=FILES))
+    result = translate_project(tmp_path, "--compact-calls")
+    lines = read_lines(result)
+
+    assert not any("$ret." in line for line in lines)
+    assert "(__VM_CALL.Main.inc.1)" in lines
+    assert result.n_instructions < sum(
+        1 for line in expected if line and line[0] != "(" and not line.startswith("//")
+    )
+    assert result.reports == [
+        "compact calls: 4 return addresses written as ROM addresses, 3 call sites sharing "
+        "1 call entries; program labels 8 -> 5 (-37.5%)"
+    ]
+    baseline, compact = HackEmulator(expected), HackEmulator(lines)
+    baseline.run()
+    compact.run()
+    assert compact.word(16) == baseline.word(16) == 8
+    assert compact.ram[:5] == baseline.ram[:5]
+
+
+def test_compact_calls_linked(tmp_path, translate_project):
+    expected = read_lines(translate_project(tmp_path, "--compact-calls", files=FILES))
+    linked = read_lines(translate_project(tmp_path, "--compact-calls", "--objects"))
+
+    assert not any("$ret." in line for line in linked)
+    baseline, compact = HackEmulator(expected), HackEmulator(linked)
+    baseline.run()
+    compact.run()
+    assert compact.word(16) == baseline.word(16) == 8
+
+
+def test_call_report_without_calls():
+    command = Command("push constant 1")
+    command.translate()
+
+    assert format_call_report([command]).endswith("program labels 0 -> 0 (n/a)")
@@ -0,0 +1,94 @@
+"""
+Test methods for rom_budget module
+"""
+
+import pytest
+
+from asm_writer import translate_commands
+from rom_budget import RomBudgetError, count_instructions, format_rom_report, rom_usage
+from vm_parser import parse_commands
+
+# Enough call sites for the shared stubs to pay for themselves
+CALLS = 12
+
+PROGRAM = [
+    "function Sys.init 0",
+    *[line for i in range(CALLS) for line in (f"push constant {i}", "call Main.twice 1")],
+    *[f"pop static {i}" for i in range(CALLS)],
+    "label END",
+    "goto END",
+    "function Main.twice 0",
+    "push argument 0",
+    "push argument 0",
+    "add",
+    "return",
+]
+
+
+FILES = {"Sys.vm": PROGRAM[:-5], "Main.vm": PROGRAM[-5:]}
+
+
+def test_count_instructions():
+    assert count_instructions(["// push constant 1", "(LOOP)", "@1", "D=A", ""]) == 2
+
+
+def test_rom_usage():
+    commands = parse_commands(PROGRAM, "Main.vm")
+    translate_commands(commands)
+    functions, files = rom_usage(commands)
+    assert set(functions) == {"Sys.init", "Main.twice"}
+    assert functions["Main.twice"] < functions["Sys.init"]
+    assert sum(functions.values()) == count_instructions(
+        [line for command in commands for line in command.translation]
+    )
+    assert files == {"Main.vm": sum(functions.values())}
+
+
+def test_format_rom_report():
+    commands = parse_commands(PROGRAM, "Main.vm")
+    translate_commands(commands)
+    functions, _ = rom_usage(commands)
+    total = sum(functions.values())
+    lines = format_rom_report(total, commands, budget=1000, top=1).split("\n")
+    assert lines[0] == f"ROM: {total}/1000 instructions ({total / 10:.1f}%)"
+    assert lines[1:3] == ["largest functions:", f"  {functions['Sys.init']:>7}  Sys.init"]
+    assert lines[3] == "largest files:"
+
+
+def test_translate_path_counts_instructions(tmp_path, translate_project):
+    result = translate_project(tmp_path, files=FILES)
+    with open(result.out_file_name, encoding="UTF-8") as f:
+        assert result.n_instructions == count_instructions(f.read().split("\n"))
+
+
+def test_translate_path_over_budget(tmp_path, translate_project):
+    with pytest.raises(RomBudgetError, match="does not fit in 50 instructions"):
+        translate_project(tmp_path, "--rom-budget", "50", files=FILES)
+
+
+@pytest.mark.parametrize(
+    "flags", [[], ["--objects"], ["--function-units"], ["--pipeline"], ["--compact-calls"]]
+)
+def test_translate_path_over_budget_writes_nothing(tmp_path, translate_project, flags):
+    with pytest.raises(RomBudgetError):
+        translate_project(tmp_path, "--rom-budget", "50", *flags, files=FILES)
+    assert not (tmp_path / f"{tmp_path.name}.asm").exists()
+
+
+def test_translate_path_shrink_retries_with_shared_stubs(tmp_path, translate_project):
+    full = translate_project(tmp_path, files=FILES)
+    budget = full.n_instructions - 1
+    result = translate_project(tmp_path, "--rom-budget", str(budget), "--shrink")
+    assert result.n_instructions <= budget
+    with open(result.out_file_name, encoding="UTF-8") as f:
+        assert "(__VM_CALL)" in f.read()
+
+
+def test_single_file_output_is_rewritten(tmp_path, translate_project):
+    vm_file = tmp_path / "Main.vm"
+    vm_file.write_text("push constant 1\n", encoding="UTF-8")
+    first = translate_project(vm_file)
+    second = translate_project(vm_file)
+    assert first.n_instructions == second.n_instructions
+    with open(second.out_file_name, encoding="UTF-8") as f:
+        assert count_instructions(f.read().split("\n")) == second.n_instructions
@@ -0,0 +1,120 @@
+"""
+Test methods for stack_analysis module
+"""
+
+from ir import build_program
+from passes import tail_call_pass
+from stack_analysis import analyze_stack, stack_effect
+from vm_parser import Command, parse_commands
+
+SYS = [
+    "function Sys.init 1",
+    "push constant 1",
+    "push constant 2",
+    "call Main.add 2",
+    "pop local 0",
+    "label END",
+    "goto END",
+]
+
+MAIN = [
+    "function Main.add 2",
+    "push argument 0",
+    "push argument 1",
+    "add",
+    "push constant 3",
+    "call Main.twice 1",
+    "return",
+    "function Main.twice 0",
+    "push argument 0",
+    "push argument 0",
+    "push argument 0",
+    "add",
+    "add",
+    "return",
+]
+
+
+def analyze(*files):
+    commands = []
+    for filename, lines in files:
+        commands.extend(parse_commands(lines, filename))
+    return analyze_stack(build_program(commands))
+
+
+def test_stack_effect():
+    assert stack_effect(Command("push constant 1")) == 1
+    assert stack_effect(Command("add")) == -1
+    assert stack_effect(Command("not")) == 0
+    assert stack_effect(Command("if-goto X")) == -1
+    assert stack_effect(Command("call Foo.bar 3")) == -2
+
+
+def test_analyze_stack_call_chain():
+    analysis = analyze(("Sys", SYS), ("Main", MAIN))
+    # Main.add: 2 locals + 2 working words at the call + frame + Main.twice's 3 words
+    assert analysis.usage == {"Main.twice": 3, "Main.add": 12, "Sys.init": 20}
+    assert analysis.entry_points == {"Sys.init": 25}
+    assert not analysis.exceeds()
+    assert analysis.exceeds(24)
+
+
+def test_analyze_stack_recursion_unbounded():
+    fib = [
+        "function Main.fib 0",
+        "push argument 0",
+        "push constant 2",
+        "lt",
+        "if-goto BASE",
+        "push argument 0",
+        "push constant 1",
+        "sub",
+        "call Main.fib 1",
+        "return",
+        "label BASE",
+        "push argument 0",
+        "return",
+    ]
+    sys = ["function Sys.init 0", "push constant 9", "call Main.fib 1", "label END", "goto END"]
+    analysis = analyze(("Sys", sys), ("Main", fib))
+    assert analysis.entry_points == {"Sys.init": None}
+    assert analysis.recursive == [["Main.fib"]]
+    assert analysis.exceeds()
+    assert "recursion: Main.fib -> Main.fib" in analysis.format()
+
+
+def test_analyze_stack_tail_recursion_bounded():
+    loop = [
+        "function Main.loop 0",
+        "push argument 0",
+        "if-goto AGAIN",
+        "push constant 0",
+        "return",
+        "label AGAIN",
+        "push argument 0",
+        "push constant 1",
+        "sub",
+        "call Main.loop 1",
+        "return",
+    ]
+    sys = ["function Sys.init 0", "push constant 9", "call Main.loop 1", "label END", "goto END"]
+    program = build_program(parse_commands(sys, "Sys") + parse_commands(loop, "Main"))
+    tail_call_pass(program)
+    analysis = analyze_stack(program)
+    assert analysis.recursive == []
+    # The tail call stages the 5 word frame above its 1 word of working stack
+    assert analysis.usage["Main.loop"] == 6
+    assert analysis.entry_points == {"Sys.init": 5 + 1 + 5 + 6}
+
+
+def test_analyze_stack_unbalanced_loop():
+    grow = ["function Sys.init 0", "label LOOP", "push constant 1", "goto LOOP"]
+    analysis = analyze(("Sys", grow))
+    assert analysis.unbalanced == ["Sys.init"]
+    assert analysis.entry_points == {"Sys.init": None}
+
+
+def test_analyze_stack_external_and_top_level():
+    analysis = analyze(("Main", ["push constant 1", "push constant 2", "call Math.max 2"]))
+    assert analysis.external == {"Math.max"}
+    assert analysis.entry_points == {"": 7}
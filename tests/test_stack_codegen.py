@@ -0,0 +1,239 @@
+"""
+Test methods for stack_codegen module
+"""
+
+from inliner import inline_calls
+from ir import build_program
+from stack_codegen import translate_program
+from vm_parser import parse_commands
+
+SYS = [
+    "function Sys.init 0",
+    "push constant 3000",
+    "pop pointer 0",
+    "push constant 4000",
+    "pop pointer 1",
+    "push constant 7",
+    "push constant 9",
+    "call Main.mix 2",
+    "pop static 0",
+    "push constant 5",
+    "call Main.count 1",
+    "pop static 1",
+    "label END",
+    "goto END",
+]
+
+MAIN = [
+    "function Main.mix 3",
+    "push argument 0",
+    "push argument 1",
+    "push constant 1",
+    "push constant 0",
+    "or",
+    "add",
+    "sub",
+    "neg",
+    "pop local 2",
+    "push local 2",
+    "push argument 0",
+    "lt",
+    "push local 2",
+    "push argument 1",
+    "gt",
+    "and",
+    "push argument 0",
+    "push argument 0",
+    "eq",
+    "not",
+    "pop that 3",
+    "pop this 0",
+    "push constant 100",
+    "push constant 200",
+    "push constant 300",
+    "push constant 400",
+    "push constant 500",
+    "pop temp 3",
+    "pop this 2",
+    "add",
+    "add",
+    "pop local 0",
+    "push local 0",
+    "push this 2",
+    "push temp 3",
+    "push that 3",
+    "push this 0",
+    "add",
+    "add",
+    "add",
+    "add",
+    "push local 2",
+    "add",
+    "return",
+    "function Main.count 1",
+    "label LOOP",
+    "push argument 0",
+    "push constant 0",
+    "gt",
+    "not",
+    "if-goto DONE",
+    "push local 0",
+    "push argument 0",
+    "add",
+    "pop local 0",
+    "push argument 0",
+    "push constant 1",
+    "sub",
+    "pop argument 0",
+    "goto LOOP",
+    "label DONE",
+    "push local 0",
+    "return",
+]
+
+
+# Object-heavy code: a method moving a point held in `this` and summing an array through
+# `that`, called in a loop
+OBJECTS = [
+    "function Sys.init 0",
+    "push constant 3000",
+    "pop pointer 0",
+    "push constant 2",
+    "pop this 0",
+    "push constant 3",
+    "pop this 1",
+    "push constant 10",
+    "pop static 0",
+    "label LOOP",
+    "push constant 3000",
+    "push static 0",
+    "push constant 4000",
+    "call Point.move 3",
+    "pop temp 0",
+    "push static 0",
+    "push constant 1",
+    "sub",
+    "pop static 0",
+    "push static 0",
+    "if-goto LOOP",
+    "label END",
+    "goto END",
+    "function Point.move 0",
+    "push argument 0",
+    "pop pointer 0",
+    "push this 0",
+    "push argument 1",
+    "add",
+    "pop this 0",
+    "push this 1",
+    "push argument 1",
+    "sub",
+    "pop this 1",
+    "push this 0",
+    "push this 1",
+    "add",
+    "pop this 2",
+    "push this 2",
+    "push this 3",
+    "add",
+    "pop this 3",
+    "push argument 2",
+    "push argument 1",
+    "add",
+    "pop pointer 1",
+    "push that 0",
+    "push that 1",
+    "push that 2",
+    "add",
+    "add",
+    "push this 0",
+    "add",
+    "pop that 3",
+    "push that 3",
+    "push this 3",
+    "add",
+    "return",
+]
+
+
+def program(lines=None):
+    if lines is not None:
+        return build_program(parse_commands(lines, "Sys"))
+    return build_program(parse_commands(SYS, "Sys") + parse_commands(MAIN, "Main"))
+
+
+def test_tracked_program_same_result_fewer_cycles(run_program):
+    baseline = run_program(program())
+    tracked = run_program(program(), track_stack=True)
+
+    assert tracked.ram[:5] == baseline.ram[:5]
+    assert tracked.ram[16:18] == baseline.ram[16:18]
+    assert tracked.word(17) == 15
+    assert tracked.ram[3000:3003] == baseline.ram[3000:3003]
+    assert tracked.ram[4003] == baseline.ram[4003]
+    assert tracked.ram[5:13] == baseline.ram[5:13]
+    assert tracked.cycles < baseline.cycles
+
+
+def test_tracked_block_writes_sp_once():
+    ir = build_program(
+        parse_commands(["push constant 2", "push constant 3", "add", "push constant 4"], "")
+    )
+    translate_program(ir)
+    lines = [line for command in ir.commands() for line in command.translation]
+    assert lines.count("M=M+1") == 2
+    assert "AM=M-1" not in lines
+
+
+def test_cached_bases_same_result_fewer_cycles(run_program):
+    for lines in (SYS + MAIN, OBJECTS):
+        tracked = run_program(program(lines), track_stack=True)
+        cached = run_program(program(lines), track_stack=True, cache_bases=True)
+
+        assert cached.ram[:20] == tracked.ram[:20]
+        assert cached.ram[3000:3004] == tracked.ram[3000:3004]
+        assert cached.ram[4000:4014] == tracked.ram[4000:4014]
+        assert cached.cycles < tracked.cycles
+
+
+def test_cached_bases_step_between_cells():
+    ir = program(["push argument 0", "pop pointer 0", "push this 5", "pop this 0", "push this 1"])
+    translate_program(ir, cache_bases=True)
+    push_five, pop_zero, push_one = [command.translation[1:] for command in ir.commands()[2:]]
+
+    # The base is still in D after `pop pointer 0`, and A still points at this 0
+    assert push_five[:2] == ["@5", "A=D+A"]
+    assert pop_zero[-3:] == ["@THIS", "A=M", "M=D"]
+    assert push_one[:2] == ["A=A+1", "D=M"]
+
+
+# Sys.vm's static 3 and the inlined Main.vm's static 3 are different variables
+SHARED_STATIC_INDEX = {
+    "Sys.vm": [
+        "function Sys.init 0",
+        "push constant 5",
+        "pop static 3",
+        "call Main.get 0",
+        "pop static 0",
+        "label END",
+        "goto END",
+    ],
+    "Main.vm": ["function Main.get 0", "push static 3", "return"],
+}
+
+
+def test_cached_static_cells_belong_to_their_file(run_program):
+    def commands():
+        return [
+            command
+            for filename, lines in SHARED_STATIC_INDEX.items()
+            for command in parse_commands(lines, filename)
+        ]
+
+    baseline = run_program(commands())
+    inlined = inline_calls(commands())
+    assert "call Main.get 0" not in [command.command for command in inlined]
+    cached = run_program(build_program(inlined), track_stack=True, cache_bases=True)
+
+    # Sys.vm.3, Main.vm.3 and Sys.vm.0 in the order the assembler allocates them
+    assert cached.ram[16:19] == baseline.ram[16:19] == [5, 0, 0]
@@ -0,0 +1,57 @@
+"""
+Test methods for statics module
+"""
+
+from pytest import raises
+
+from command import Command
+from statics import StaticOverflowError, apply_statics, format_static_report, plan_statics
+
+
+def make_commands(file_commands):
+    return [
+        Command(command, filename)
+        for filename, commands in file_commands
+        for command in commands
+    ]
+
+
+def test_plan_statics_packs_indices():
+    commands = make_commands(
+        [
+            ("Foo", ["push static 7", "pop static 2", "push static 7"]),
+            ("Bar", ["pop static 0", "push local 3"]),
+        ]
+    )
+    assert plan_statics(commands) == {"Foo": {2: 16, 7: 17}, "Bar": {0: 18}}
+
+
+def test_plan_statics_overflow():
+    commands = make_commands([("Foo", [f"pop static {i}" for i in range(241)])])
+    with raises(StaticOverflowError):
+        plan_statics(commands)
+
+
+def test_plan_statics_custom_limit():
+    commands = make_commands([("Foo", ["push static 0", "push static 1"])])
+    with raises(StaticOverflowError):
+        plan_statics(commands, limit=1)
+
+
+def test_apply_statics_direct_addresses():
+    commands = make_commands([("Foo", ["push static 4"]), ("Bar", ["pop static 9"])])
+    apply_statics(commands, plan_statics(commands))
+    for command in commands:
+        command.translate()
+
+    assert commands[0].translation[1] == "@16"
+    assert commands[1].translation == ["// pop static 9", "@SP", "AM=M-1", "D=M", "@17", "M=D"]
+
+
+def test_format_static_report():
+    report = format_static_report({"Foo": {2: 16, 7: 17}, "Bar": {0: 18}})
+    assert report.splitlines() == [
+        "Foo: 2 statics (max index 7) at RAM[16-17]",
+        "Bar: 1 statics (max index 0) at RAM[18-18]",
+        "Total: 3/240 static words used",
+    ]
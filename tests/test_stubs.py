@@ -0,0 +1,103 @@
+"""
+Test methods for stubs module
+"""
+
+from ir import build_program
+from stubs import (
+    EntryCall,
+    SharedCall,
+    SharedReturn,
+    call_entries,
+    compact_calls_pass,
+    shared_stubs_pass,
+    stub_routines,
+)
+from vm_parser import parse_commands
+
+PROGRAM = [
+    "function Sys.init 0",
+    "push constant 6",
+    "call Main.fib 1",
+    "pop static 0",
+    "push constant 3",
+    "push constant 4",
+    "call Main.add 2",
+    "pop static 1",
+    "label END",
+    "goto END",
+    "function Main.fib 0",
+    "push argument 0",
+    "push constant 2",
+    "lt",
+    "if-goto BASE",
+    "push argument 0",
+    "push constant 1",
+    "sub",
+    "call Main.fib 1",
+    "push argument 0",
+    "push constant 2",
+    "sub",
+    "call Main.fib 1",
+    "add",
+    "return",
+    "label BASE",
+    "push argument 0",
+    "return",
+    "function Main.add 1",
+    "push argument 0",
+    "push argument 1",
+    "add",
+    "pop local 0",
+    "push local 0",
+    "return",
+]
+
+
+def program(shared):
+    ir = build_program(parse_commands(PROGRAM, "Main.vm"))
+    if shared:
+        shared_stubs_pass(ir)
+    return ir
+
+
+def test_shared_stubs_pass_replaces_calls_and_returns():
+    commands = program(shared=True).commands()
+    assert sum(isinstance(command, SharedCall) for command in commands) == 4
+    assert sum(isinstance(command, SharedReturn) for command in commands) == 3
+
+
+def test_shared_stubs_match_baseline(run_program):
+    expected = run_program(program(shared=False))
+    actual = run_program(program(shared=True), stubs=stub_routines())
+    assert (expected.word(16), expected.word(17)) == (8, 7)
+    assert (actual.word(16), actual.word(17)) == (8, 7)
+    assert actual.ram[:5] == expected.ram[:5]
+
+
+def test_shared_stubs_are_smaller(run_program):
+    baseline = run_program(program(shared=False))
+    shared = run_program(program(shared=True), stubs=stub_routines())
+    assert len(shared.rom) < len(baseline.rom)
+
+
+def test_shared_call_small_argument_count():
+    call = SharedCall("call Main.fib 1", "Main.vm")
+    call.translate()
+    assert call.translation[1:3] == ["@R13", "M=1"]
+    assert call.translation[-3:] == ["@__VM_CALL", "0;JMP", "(Main.fib$ret.0)"]
+
+
+def test_compact_calls_share_entries(run_program):
+    ir = program(shared=True)
+    compact_calls_pass(ir)
+    commands = ir.commands()
+    entries = call_entries(commands)
+
+    # Main.fib is called from three sites, Main.add from one
+    assert entries == [("Main.fib", 1)]
+    assert sum(isinstance(command, EntryCall) for command in commands) == 3
+    assert sum(type(command) is SharedCall for command in commands) == 1
+    emulator = run_program(ir, stubs=stub_routines(entries))
+    assert (emulator.word(16), emulator.word(17)) == (8, 7)
+    shared = run_program(program(shared=True), stubs=stub_routines())
+    assert len(emulator.rom) < len(shared.rom)
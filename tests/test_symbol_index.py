@@ -0,0 +1,73 @@
+"""
+Test methods for symbol_index module
+"""
+
+import pytest
+
+from hack_emulator import assemble
+from symbol_index import SymbolIndex, label_addresses, write_symbol_index
+from translator import translate_path
+from VMTranslator import initialize_argparser
+
+LINES = ["// start", "@1", "(Main.main)", "D=A", "(LOOP)", "@LOOP", "0;JMP", "(Main.other)", "@0"]
+
+PROGRAM = [
+    "function Sys.init 0",
+    "push constant 1",
+    "push constant 2",
+    "eq",
+    "call Main.id 1",
+    "pop static 0",
+    "label END",
+    "goto END",
+    "function Main.id 0",
+    "push argument 0",
+    "push argument 0",
+    "lt",
+    "pop temp 0",
+    "return",
+]
+
+
+def test_label_addresses():
+    assert label_addresses(LINES) == ({"Main.main": 1, "LOOP": 2, "Main.other": 4}, 5)
+
+
+def test_lookup(tmp_path):
+    path = str(tmp_path / "Main.sym")
+    assert write_symbol_index(path, LINES, ["Main.main", "Main.other"]) == 3
+    with SymbolIndex(path) as index:
+        assert (index.n_labels, index.n_functions) == (3, 2)
+        assert index.address("LOOP") == 2
+        assert index.address("Main.other") == 4
+        assert index.address("Main") is None
+        assert index.address("ZZZ") is None
+        assert index.function_at(0) is None
+        assert index.function_at(3) == ("Main.main", 1, 4)
+        assert index.function_at(4) == ("Main.other", 4, 5)
+        assert index.function_at(5) is None
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "bad.sym"
+    path.write_bytes(b"\0" * 32)
+    with pytest.raises(ValueError, match="not a version 1 symbol index"):
+        SymbolIndex(str(path))
+
+
+def test_translate_writes_index_matching_assembler(tmp_path):
+    (tmp_path / "Sys.vm").write_text("\n".join(PROGRAM) + "\n", encoding="UTF-8")
+    project = str(tmp_path)
+    result = translate_path(project, initialize_argparser().parse_args([project, "--symbol-index"]))
+
+    with open(result.out_file_name, encoding="UTF-8") as f:
+        lines = f.read().split("\n")
+    _, symbols = assemble(lines)
+    labels, _ = label_addresses(lines)
+    with SymbolIndex(str(tmp_path / f"{tmp_path.name}.sym")) as index:
+        assert index.n_labels == len(labels)
+        for label in labels:
+            assert index.address(label) == symbols[label]
+        start = symbols["Main.id"]
+        assert index.function_at(start + 1)[0] == "Main.id"
+        assert index.function_at(start - 1)[0] == "Sys.init"
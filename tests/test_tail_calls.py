@@ -0,0 +1,88 @@
+"""
+Test methods for tail_calls module
+"""
+
+from tail_calls import TailCall, mark_tail_calls
+from vm_parser import parse_commands
+
+SYS = [
+    "function Sys.init 0",
+    "push constant 0",
+    "push constant {depth}",
+    "call Acc.sum 2",
+    "pop static 0",
+    "push constant 7",
+    "call Acc.spread 1",
+    "pop static 1",
+    "label END",
+    "goto END",
+]
+
+# Acc.sum is self-recursive with the same argument count; Acc.spread and Acc.gather
+# tail-call functions with more and fewer arguments than themselves
+ACC = [
+    "function Acc.sum 0",
+    "push argument 1",
+    "push constant 0",
+    "eq",
+    "if-goto SUM_DONE",
+    "push argument 0",
+    "push argument 1",
+    "add",
+    "push argument 1",
+    "push constant 1",
+    "sub",
+    "call Acc.sum 2",
+    "return",
+    "label SUM_DONE",
+    "push argument 0",
+    "return",
+    "function Acc.spread 2",
+    "push argument 0",
+    "push constant 1",
+    "push constant 2",
+    "call Acc.gather 3",
+    "return",
+    "function Acc.gather 0",
+    "push argument 0",
+    "push argument 1",
+    "add",
+    "push argument 2",
+    "call Acc.triple 2",
+    "return",
+    "function Acc.triple 0",
+    "push argument 0",
+    "push argument 1",
+    "add",
+    "push argument 1",
+    "add",
+    "return",
+]
+
+
+def program(depth):
+    sys = [line.format(depth=depth) for line in SYS]
+    return parse_commands(sys, "Sys") + parse_commands(ACC, "Acc")
+
+
+def test_mark_tail_calls():
+    commands = mark_tail_calls(program(3))
+    tail_calls = [command.command for command in commands if isinstance(command, TailCall)]
+    assert tail_calls == ["call Acc.sum 2", "call Acc.gather 3", "call Acc.triple 2"]
+    assert len(commands) == len(program(3)) - 3
+
+
+def test_tail_calls_same_result(run_program):
+    baseline = run_program(program(20))
+    optimized = run_program(mark_tail_calls(program(20)))
+
+    assert baseline.word(16) == optimized.word(16) == 210
+    assert baseline.word(17) == optimized.word(17) == 7 + 1 + 2 + 2
+    assert baseline.ram[:5] == optimized.ram[:5]
+    assert optimized.cycles < baseline.cycles
+
+
+def test_tail_calls_constant_stack_depth(run_program):
+    # 5000 frames would run the baseline translation off the end of RAM
+    optimized = run_program(mark_tail_calls(program(5000)))
+    assert optimized.ram[16] == (5000 * 5001 // 2) & 0xFFFF
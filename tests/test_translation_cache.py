@@ -0,0 +1,77 @@
+"""
+Test methods for translation_cache module
+"""
+
+from asm_writer import format_translated_asm, translate_commands
+from command import Command
+from tail_calls import TailCall
+from translation_cache import TranslationCache
+from vm_parser import parse_commands
+
+LINES = [
+    "function Main.f 1",
+    "push constant 0",
+    "push static 1",
+    "eq",
+    "push local 0",
+    "call Main.g 1",
+    "lt",
+    "label LOOP",
+    "if-goto LOOP",
+    "pop static 1",
+    "return",
+]
+
+
+def program():
+    return parse_commands(LINES * 3, "Main.vm") + parse_commands(LINES * 2, "Other.vm")
+
+
+def test_cached_translation_matches():
+    expected = program()
+    translate_commands(expected)
+    Command.label_count = 0
+    cache = TranslationCache()
+    actual = program()
+    translate_commands(actual, cache)
+
+    assert format_translated_asm(actual) == format_translated_asm(expected)
+    assert Command.label_count == 15
+    # Each file has its own statics, so static commands are cached per file
+    assert cache.misses == len(LINES) + 2
+    assert cache.hits == 5 * len(LINES) - cache.misses
+
+
+def test_translations_are_copies():
+    cache = TranslationCache()
+    first, second, third = parse_commands(["add", "add", "add"], "Main.vm")
+    cache.translate(first)
+    cache.translate(second)
+    assert isinstance(second.translation, list)
+    assert first.translation == second.translation
+    assert first.translation is not second.translation
+
+    # Rewriting a handed out translation leaves the cached one alone
+    second.translation[0] = "@R13"
+    cache.translate(third)
+    assert third.translation == first.translation
+
+
+def test_lru_eviction():
+    cache = TranslationCache(maxsize=2)
+    for line in ["push constant 1", "push constant 2", "push constant 1", "push constant 3"]:
+        cache.translate(Command(line))
+    assert (cache.hits, cache.misses, cache.evictions, len(cache)) == (1, 3, 1, 2)
+    cache.translate(Command("push constant 1"))
+    assert cache.hits == 2
+    assert cache.format_stats() == (
+        "translation cache: 2 hits, 3 misses (40.0% hit rate), 2/2 entries, 1 evictions"
+    )
+
+
+def test_subclasses_not_cached():
+    cache = TranslationCache()
+    call = TailCall("call Main.f 1", "Main.vm")
+    cache.translate(call)
+    assert call.translation
+    assert len(cache) == 0
@@ -0,0 +1,107 @@
+"""
+Test methods for units module
+"""
+
+import os
+
+from units import UnitCache, make_units, translate_units, unit_options
+import units
+from VMTranslator import initialize_argparser
+
+FILES = {
+    "Sys.vm": [
+        "function Sys.init 0",
+        "push constant 4",
+        "call Main.sum 1",
+        "pop static 0",
+        "push constant 3",
+        "push constant 5",
+        "call Main.max 2",
+        "pop static 1",
+        "label END",
+        "goto END",
+    ],
+    "Main.vm": [
+        "function Main.sum 1",
+        "label LOOP",
+        "push argument 0",
+        "push constant 0",
+        "eq",
+        "if-goto DONE",
+        "push local 0",
+        "push argument 0",
+        "add",
+        "pop local 0",
+        "push argument 0",
+        "push constant 1",
+        "sub",
+        "pop argument 0",
+        "goto LOOP",
+        "label DONE",
+        "push local 0",
+        "return",
+        "function Main.max 0",
+        "push argument 0",
+        "push argument 1",
+        "gt",
+        "if-goto FIRST",
+        "push argument 1",
+        "return",
+        "label FIRST",
+        "push argument 0",
+        "return",
+    ],
+}
+
+
+def test_make_units():
+    options = unit_options(initialize_argparser().parse_args(["Main"]))
+    made = make_units("Main.vm", FILES["Main.vm"], options)
+
+    assert [unit.name for unit in made] == ["Main.vm:Main.sum", "Main.vm:Main.max"]
+    assert made[1].lines == FILES["Main.vm"][18:]
+    # The hash covers the file and the options, since static names and code depend on them
+    assert make_units("Main.vm", FILES["Main.vm"], options)[0].digest == made[0].digest
+    assert make_units("Other.vm", FILES["Main.vm"], options)[0].digest != made[0].digest
+    tail = make_units("Main.vm", FILES["Main.vm"], {**options, "tail_calls": True})
+    assert tail[0].digest != made[0].digest
+
+
+def test_function_units_same_result(tmp_path, translate_project, run_output):
+    for flags in ([], ["--shared-stubs", "--fuse-branches"], ["--track-stack"]):
+        expected_result = translate_project(tmp_path, *flags, files=FILES)
+        expected = run_output(expected_result.out_file_name)
+        result = translate_project(tmp_path, "--function-units", *flags)
+        actual = run_output(result.out_file_name)
+        assert (actual.word(16), actual.word(17)) == (expected.word(16), expected.word(17))
+        assert (actual.word(16), actual.word(17)) == (10, 5)
+        assert result.n_instructions == expected_result.n_instructions
+
+
+def test_function_units_retranslate_changed(tmp_path, translate_project, run_output):
+    result = translate_project(tmp_path, "--function-units", "--cache-report", files=FILES)
+    assert result.reports == ["function units: 0/3 reused, 3 translated"]
+
+    result = translate_project(tmp_path, "--function-units", "--cache-report")
+    assert result.reports == ["function units: 3/3 reused, 0 translated"]
+
+    main = list(FILES["Main.vm"])
+    main[main.index("push constant 1")] = "push constant 2"
+    result = translate_project(
+        tmp_path, "--function-units", "--cache-report", files={"Main.vm": main}
+    )
+    assert result.reports == ["function units: 2/3 reused, 1 translated"]
+    assert run_output(result.out_file_name).word(16) == 6
+    # The old version of the changed function is pruned
+    assert len(os.listdir(tmp_path / "__vmcache__" / "units")) == 3
+
+
+def test_translate_units_in_parallel(tmp_path, monkeypatch):
+    options = unit_options(initialize_argparser().parse_args(["Main"]))
+    made = make_units("Main.vm", FILES["Main.vm"], options) * 4
+    expected = translate_units(made, options, UnitCache(str(tmp_path / "serial")), jobs=1)
+
+    monkeypatch.setattr(units, "MIN_UNITS_PER_JOB", 1)
+    objects = translate_units(made, options, UnitCache(str(tmp_path / "parallel")), jobs=2)
+
+    assert [obj.lines for obj in objects] == [obj.lines for obj in expected]
@@ -5,7 +5,14 @@ Test methods for vm_parser module
 import os
 from pytest import raises
 
-from vm_parser import Command, parse_commands, parse_file
+from vm_parser import (
+    Command,
+    DuplicateFileError,
+    parse_commands,
+    parse_directory,
+    parse_file,
+    split_functions,
+)
 
 
 valid_parsed_file = ["push constant 17", "push local 2", "add", "pop argument 1"]
@@ -37,3 +44,73 @@ def test_parse_file_comments():
 
 def test_parse_commands():
     assert parse_commands(valid_parsed_file, filename="") == valid_parsed_commands
+
+
+def make_files(directory, names):
+    for name in names:
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("push constant 0\n", encoding="UTF-8")
+
+
+def test_parse_directory_sys_first_then_lexical(tmp_path):
+    make_files(tmp_path, ["Main.vm", "Sys.vm", "Array.vm", "Memory.vm", "notes.txt"])
+    assert parse_directory(str(tmp_path)) == [
+        f"{tmp_path}/Sys.vm",
+        f"{tmp_path}/Array.vm",
+        f"{tmp_path}/Main.vm",
+        f"{tmp_path}/Memory.vm",
+    ]
+
+
+def test_parse_directory_not_recursive_by_default(tmp_path):
+    make_files(tmp_path, ["Main.vm", "lib/Math.vm"])
+    assert parse_directory(str(tmp_path)) == [f"{tmp_path}/Main.vm"]
+
+
+def test_parse_directory_recursive(tmp_path):
+    make_files(tmp_path, ["Main.vm", "lib/Math.vm", "lib/Array.vm", "Sys.vm"])
+    assert parse_directory(str(tmp_path), recursive=True) == [
+        f"{tmp_path}/Sys.vm",
+        f"{tmp_path}/Main.vm",
+        f"{tmp_path}/lib/Array.vm",
+        f"{tmp_path}/lib/Math.vm",
+    ]
+
+
+def test_parse_directory_rejects_shared_statics(tmp_path):
+    make_files(tmp_path, ["Main.vm", "Math.vm", "lib/Math.vm"])
+    with raises(DuplicateFileError, match="Math.vm"):
+        parse_directory(str(tmp_path), recursive=True)
+
+
+def test_parse_directory_symlink_loop(tmp_path):
+    make_files(tmp_path, ["Main.vm", "lib/Math.vm"])
+    (tmp_path / "lib" / "up").symlink_to(tmp_path, target_is_directory=True)
+    assert parse_directory(str(tmp_path), recursive=True) == [
+        f"{tmp_path}/Main.vm",
+        f"{tmp_path}/lib/Math.vm",
+    ]
+
+
+def test_parse_directory_include_exclude(tmp_path):
+    make_files(tmp_path, ["Main.vm", "MainTest.vm", "Math.vm", "lib/Math.vm"])
+    files = parse_directory(
+        str(tmp_path), recursive=True, include=("Ma*.vm",), exclude=("*Test.vm", "lib/*")
+    )
+    assert files == [f"{tmp_path}/Main.vm", f"{tmp_path}/Math.vm"]
+
+
+def test_split_functions():
+    lines = [
+        "push constant 1",
+        "function Main.f 0",
+        "return",
+        "function Main.g 1",
+        "push local 0",
+        "return",
+    ]
+
+    assert split_functions(lines) == [lines[:1], lines[1:3], lines[3:]]
+    assert split_functions(lines[1:]) == [lines[1:3], lines[3:]]
+    assert split_functions([]) == []
@@ -2,18 +2,33 @@
 Test methods for main VMTranslator module
 """
 
-from pytest import MonkeyPatch, raises
-from VMTranslator import initialize_argparser, initialize_arguments, Namespace
+import os
+import subprocess
+import sys
+
+from pytest import fixture, MonkeyPatch, raises
+from VMTranslator import (
+    initialize_argparser,
+    initialize_arguments,
+    Namespace,
+    unsupported_watch_options,
+)
 
 monkeypatch = MonkeyPatch()
 arg_parser = initialize_argparser()
 
 
+@fixture(autouse=True)
+def undo_patches():
+    yield
+    monkeypatch.undo()
+
+
 def test_initialize_arguments():
     mock_filepath = "C:/File/Path.vm"
 
     monkeypatch.setattr(
-        "argparse.ArgumentParser.parse_args", lambda _: Namespace(file_or_dir=mock_filepath)
+        "argparse.ArgumentParser.parse_args", lambda _: Namespace(file_or_dir=mock_filepath, manifest=None, more=[])
     )
 
     args = initialize_arguments(arg_parser)
@@ -25,8 +40,92 @@ def test_initialize_arguments_invalid_file():
     mock_filepath = "C:/File/Path.asm"
 
     monkeypatch.setattr(
-        "argparse.ArgumentParser.parse_args", lambda _: Namespace(file_or_dir=mock_filepath)
+        "argparse.ArgumentParser.parse_args", lambda _: Namespace(file_or_dir=mock_filepath, manifest=None, more=[])
+    )
+
+    with raises(SystemExit):
+        initialize_arguments(arg_parser)
+
+
+def test_initialize_arguments_manifest_only():
+    monkeypatch.setattr(
+        "argparse.ArgumentParser.parse_args",
+        lambda _: Namespace(file_or_dir=None, manifest="m.txt", more=[]),
+    )
+
+    assert initialize_arguments(arg_parser).manifest == "m.txt"
+
+
+def test_initialize_arguments_no_target():
+    monkeypatch.setattr(
+        "argparse.ArgumentParser.parse_args",
+        lambda _: Namespace(file_or_dir=None, manifest=None, more=[]),
     )
 
     with raises(SystemExit):
         initialize_arguments(arg_parser)
+
+
+def test_manifest_alone(tmp_path):
+    for name in ("A", "B"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "Sys.vm").write_text("function Sys.init 0\n", encoding="UTF-8")
+    (tmp_path / "m.txt").write_text("A\nB\n./A\n", encoding="UTF-8")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, os.path.join(root, "VMTranslator.py"), "--manifest"]
+
+    completed = subprocess.run(
+        command + [str(tmp_path / "m.txt"), "--jobs", "1"], capture_output=True, text=True
+    )
+
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.splitlines()[-1].startswith("2 translated, 0 failed")
+
+
+def test_unsupported_watch_options():
+    parser = initialize_argparser()
+    scan_only = parser.parse_args(["dir", "--watch", "--recursive", "--include", "*.vm"])
+    translating = parser.parse_args(["dir", "--watch", "-O2", "--tail-calls", "--compress", "gz"])
+
+    assert not unsupported_watch_options(parser, scan_only)
+    assert unsupported_watch_options(parser, translating) == ["--compress", "-O", "--tail-calls"]
+
+
+# Modules only batch mode, watch mode, --symbol-index and --pipeline need.  Importing them
+# at startup would cost more than translating a small program, so none of them may be
+# loaded by `import VMTranslator`.
+LAZY_MODULES = {
+    "batch",
+    "watch",
+    "symbol_index",
+    "pipeline",
+    "queue",
+    "concurrent.futures",
+    "multiprocessing",
+    "hashlib",
+    "mmap",
+    "typing",
+}
+
+
+def imported_modules() -> set[str]:
+    """
+    The names of the modules `import VMTranslator` loads in a fresh interpreter
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [
+        sys.executable,
+        "-c",
+        "import sys; before = set(sys.modules); import VMTranslator; "
+        "print('\\n'.join(set(sys.modules) - before))",
+    ]
+    stdout = subprocess.run(command, cwd=root, capture_output=True, check=True, text=True).stdout
+    return set(stdout.split())
+
+
+def test_startup_imports():
+    modules = imported_modules()
+
+    assert "translator" in modules
+    assert not LAZY_MODULES & modules
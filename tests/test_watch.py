@@ -0,0 +1,129 @@
+"""
+Test methods for watch module
+"""
+
+import os
+
+from asm_writer import format_init
+from watch import ProjectWatcher
+
+
+def write_vm(path, text):
+    with open(path, "w", encoding="UTF-8") as f:
+        f.write(text)
+    # Make sure the stat check sees a change even on coarse mtime filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def read_asm(watcher):
+    with open(watcher.out_file_name, encoding="UTF-8") as f:
+        return f.read()
+
+
+def test_build_writes_all_sections(tmp_path):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    write_vm(tmp_path / "B.vm", "push constant 2\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+
+    asm = read_asm(watcher)
+    assert asm.startswith(format_init())
+    assert "// push constant 1" in asm and "// push constant 2" in asm
+
+
+def test_poll_unchanged(tmp_path):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+
+    assert watcher.poll() == []
+
+
+def test_poll_touched_but_same_contents(tmp_path):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+
+    assert watcher.poll() == []
+
+
+def test_poll_splices_changed_file(tmp_path):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    write_vm(tmp_path / "B.vm", "push constant 2\n")
+    write_vm(tmp_path / "C.vm", "push constant 3\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+
+    write_vm(tmp_path / "B.vm", "push constant 2\npush local 4\nadd\n")
+    changed = watcher.poll()
+
+    assert changed == [str(tmp_path / "B.vm")]
+    expected = format_init() + "".join(
+        watched.section.decode("UTF-8") for watched in watcher.files
+    )
+    asm = read_asm(watcher)
+    assert asm == expected
+    assert asm.index("// push constant 2") < asm.index("// push local 4")
+    assert asm.index("// add") < asm.index("// push constant 3")
+
+
+def test_poll_same_size_section_overwritten_in_place(tmp_path):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    write_vm(tmp_path / "B.vm", "push constant 2\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+
+    write_vm(tmp_path / "A.vm", "push constant 7\n")
+    watcher.poll()
+
+    asm = read_asm(watcher)
+    assert "// push constant 7" in asm and "// push constant 1" not in asm
+    assert asm.endswith(watcher.files[1].section.decode("UTF-8"))
+
+
+def test_poll_new_file_rebuilds(tmp_path):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+
+    write_vm(tmp_path / "B.vm", "push constant 2\n")
+    watcher.poll()
+
+    assert len(watcher.files) == 2
+    assert "// push constant 2" in read_asm(watcher)
+
+
+def test_poll_keeps_watching_after_bad_file(tmp_path):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    write_vm(tmp_path / "B.vm", "push constant 2\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+    before = read_asm(watcher)
+
+    write_vm(tmp_path / "B.vm", "push constant\n")
+    assert watcher.poll() == []
+    assert len(watcher.errors) == 1 and watcher.errors[0].startswith(str(tmp_path / "B.vm"))
+    assert read_asm(watcher) == before
+
+    # The failed file is retried until it translates
+    assert watcher.poll() == [] and len(watcher.errors) == 1
+    write_vm(tmp_path / "B.vm", "push constant 3\n")
+    assert watcher.poll() == [str(tmp_path / "B.vm")]
+    assert not watcher.errors
+    assert "@3" in read_asm(watcher)
+
+
+def test_poll_file_deleted_after_scan(tmp_path, monkeypatch):
+    write_vm(tmp_path / "A.vm", "push constant 1\n")
+    write_vm(tmp_path / "B.vm", "push constant 2\n")
+    watcher = ProjectWatcher(str(tmp_path))
+    watcher.build()
+    paths = [watched.path for watched in watcher.files]
+
+    os.remove(tmp_path / "B.vm")
+    monkeypatch.setattr("watch.parse_directory", lambda *_, **__: paths)
+
+    assert watcher.poll() == []
+    assert "FileNotFoundError" in watcher.errors[0]
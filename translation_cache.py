@@ -0,0 +1,139 @@
+"""
+Memoized translation of commands.  Most lines of a real program are one of a few thousand
+distinct commands, so translating each distinct command once and copying the result saves
+building the same lines over and over.  Commands that create labels keep a template of
+each labelled line and are relabeled with the current `Command.label_count` on every use.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import re
+
+from command import OP_ARITHMETIC, OP_CALL, OP_FUNCTION, Command
+
+TRANSLATION_CACHE_SIZE = 4096
+
+# Labels numbered by `Command.label_count`: IF_EQn, END_IF_EQn, ..., and f$ret.n
+NUMBERED_LABEL = re.compile(r"^([@(](?:END_)?IF_(?:EQ|GT|LT)|[@(].*\$ret\.)(\d+)(\)?)$")
+
+
+class TranslationCache:
+    """
+    A bounded, least recently used cache of command translations.
+
+    An entry is keyed by the command text and, for `static` accesses, the file and static
+    address.  Each command is handed its own copy of the cached lines, so translations
+    can be rewritten afterwards without touching the cache.
+
+    Attributes:
+        `maxsize` (int): the most translations kept
+        `hits` (int): lookups answered from the cache
+        `misses` (int): lookups that had to translate the command
+        `evictions` (int): entries dropped to stay within `maxsize`
+    """
+
+    def __init__(self, maxsize: int = TRANSLATION_CACHE_SIZE) -> None:
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._entries: OrderedDict[tuple, tuple[tuple[str, ...], tuple]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of lookups answered from the cache
+        """
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def translate(self, command: Command) -> None:
+        """
+        Translate `command`, reusing the translation of an identical command if there is
+        one.  Subclasses of `Command` have their own translations and are not cached.
+
+        Args:
+            `command` (Command): The command to translate
+        """
+
+        if type(command) is not Command:  # pylint: disable=unidiomatic-typecheck
+            command.translate()
+            return
+
+        key = (
+            command.command,
+            command.filename if "static" in command.command else None,
+            command.static_address,
+        )
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self._store(key, command)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            lines, labels = entry
+            if labels:
+                label_count = Command.label_count
+                Command.label_count += 1
+                translation = list(lines)
+                for i, template in labels:
+                    translation[i] = template.format(label_count)
+                command.translation = translation
+            else:
+                command.translation = list(lines)
+            if command.opcode in (OP_FUNCTION, OP_CALL):
+                command._current_function = command.arg1  # pylint: disable=protected-access
+
+    def _store(self, key: tuple, command: Command) -> tuple[tuple[str, ...], tuple]:
+        """
+        Translate the command and cache the result along with a template for every line
+        holding a numbered label
+        """
+
+        label_count = Command.label_count
+        command.translate()
+        labels: tuple = ()
+        if command.opcode in (OP_ARITHMETIC, OP_CALL) and label_count != Command.label_count:
+            labels = tuple(
+                (i, template)
+                for i, line in enumerate(command.translation)
+                if (template := _template(line, label_count)) is not None
+            )
+
+        entry = (tuple(command.translation), labels)
+        self._entries[key] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return entry
+
+    def format_stats(self) -> str:
+        """
+        Format the cache statistics as a one line report
+        """
+
+        return (
+            f"translation cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate * 100:.1f}% hit rate), {len(self)}/{self.maxsize} entries, "
+            f"{self.evictions} evictions"
+        )
+
+
+def _template(line: str, label_count: int) -> str | None:
+    """
+    Turn a line holding a numbered label into a format string with the label number as
+    its only field, None for any other line
+    """
+
+    match = NUMBERED_LABEL.match(line)
+    if match is None or int(match.group(2)) != label_count:
+        return None
+    prefix = match.group(1).replace("{", "{{").replace("}", "}}")
+    return f"{prefix}{{0}}{match.group(3)}"
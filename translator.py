@@ -0,0 +1,476 @@
+"""
+Translation of a single program, a .vm file or a directory of them, from parsing through
+the optimization passes to writing the .asm file
+"""
+
+from __future__ import annotations
+
+from argparse import Namespace
+import os
+
+from asm_writer import (
+    asm_path,
+    format_init,
+    format_translated_asm,
+    translate_commands,
+    write_asm_lines,
+    write_translated_asm,
+)
+from bytecode import BYTECODE_EXTENSION, cached_commands, load_file
+from command import Command
+from compression import open_text, strip_compression
+from constants import CType, ROM_SIZE
+from ir import Function, Program, build_program
+from linker import OBJECT_EXTENSION, link, make_object, write_object
+from passes import build_pass_manager
+from profiles import (
+    Cost,
+    apply_profile,
+    format_profile_summary,
+    program_cost,
+    translation_cost,
+)
+from return_addresses import (
+    format_call_report,
+    resolve_return_addresses,
+    resolve_return_labels,
+)
+from rom_budget import RomBudgetError, check_rom_budget, count_instructions, format_rom_report
+from stack_analysis import STACK_LIMIT, StackLimitError
+from stack_codegen import translate_program
+from statics import format_static_report
+from stubs import call_entries, stub_routines
+from translation_cache import TranslationCache
+from vm_parser import parse_commands, parse_directory, parse_file
+
+
+class TranslationResult:
+    """
+    What translating one program produced
+
+    Attributes:
+        `out_file_name` (str): the .asm file written
+        `n_commands` (int): the number of VM commands translated
+        `reports` (list[str]): any reports that were asked for, ready to print
+        `n_instructions` (int): the number of instructions written
+    """
+
+    def __init__(
+        self, out_file_name: str, n_commands: int, reports: list[str], n_instructions: int = 0
+    ) -> None:
+        self.out_file_name: str = out_file_name
+        self.n_commands: int = n_commands
+        self.reports: list[str] = reports
+        self.n_instructions: int = n_instructions
+
+
+def scan_options(args: Namespace) -> dict:
+    """
+    The keyword arguments for `parse_directory` given by the command-line-arguments
+    """
+
+    return {
+        "recursive": args.recursive,
+        "include": tuple(args.include or ("*.vm",)),
+        "exclude": tuple(args.exclude or ()),
+    }
+
+
+def read_program(file_or_dir: str, args: Namespace) -> tuple[str, list[Command]]:
+    """
+    Parse a .vm file or every .vm file in a directory.  Bytecode files are read in their
+    place when given or included.
+
+    Args:
+        `file_or_dir` (str): The .vm file or directory to read
+        `args` (Namespace): The command-line-arguments
+
+    Returns:
+        tuple[str, list[Command]]: The output filename (without extension) and the
+            parsed commands
+    """
+
+    if os.path.isdir(file_or_dir):
+        out_file_name = f"{file_or_dir}/{os.path.basename(file_or_dir)}"
+        commands = []
+        files = parse_directory(file_or_dir, **scan_options(args))
+        if args.pipeline:
+            # The threads are only needed here, so the pipeline module loads on demand
+            # pylint: disable-next=import-outside-toplevel
+            from pipeline import prefetch
+
+            for _, file_commands in prefetch(files, lambda file: read_file(file, args)):
+                commands.extend(file_commands)
+        else:
+            for file in files:
+                commands.extend(read_file(file, args))
+    else:
+        out_file_name = os.path.splitext(strip_compression(file_or_dir))[0]
+        commands = read_file(file_or_dir, args)
+
+    return out_file_name, commands
+
+
+def read_file(file: str, args: Namespace) -> list[Command]:
+    """
+    Parse a .vm file, decompressing it when it has a compression extension, or load a
+    bytecode file.  With `args.bytecode_cache` a .vm file is read through its cached
+    bytecode when that is up to date.
+    """
+
+    if file.endswith(BYTECODE_EXTENSION):
+        return load_file(file)
+    if args.bytecode_cache:
+        return cached_commands(file)
+    return parse_commands(parse_file(file), os.path.basename(strip_compression(file)))
+
+
+def whole_program(args: Namespace) -> bool:
+    """
+    Whether the command-line-arguments ask for passes or reports that need every file of
+    the program before any of it can be written
+    """
+
+    return bool(
+        args.inline
+        or args.allocate_statics
+        or args.static_report
+        or args.stack_report
+        or args.stack_limit is not None
+        or args.objects
+        or args.strip_unused
+        or args.compact_calls
+        or args.profile is not None
+    )
+
+
+def translate_pipelined(
+    directory: str, args: Namespace
+) -> tuple[str, list[Command], int, TranslationCache | None]:
+    """
+    Translate a directory file by file, with a reader thread loading the files ahead of
+    the translator and a writer thread writing each file's translation as it is finished.
+    The output is the same as translating the whole program at once, which needs options
+    that work within a file, see `whole_program`.
+
+    Args:
+        `directory` (str): The directory to translate
+        `args` (Namespace): The command-line-arguments
+
+    Returns:
+        tuple[str, list[Command], int, TranslationCache | None]: The output filename
+            (without extension), the translated commands, the number of instructions
+            written and the translation cache used
+    """
+
+    # pylint: disable-next=import-outside-toplevel
+    from pipeline import OrderedWriter, prefetch
+
+    out_file_name = f"{directory}/{os.path.basename(directory)}"
+    files = parse_directory(directory, **scan_options(args))
+    pass_manager = build_pass_manager(
+        tail_calls=args.tail_calls,
+        fuse_branches=args.fuse_branches,
+        shared_stubs=args.shared_stubs,
+    )
+    cache = None if args.translation_cache is None else TranslationCache(args.translation_cache)
+
+    prelude = format_init().split("\n")[:-1]
+    if args.shared_stubs:
+        prelude.extend(stub_routines())
+    instructions = count_instructions(prelude)
+    commands = []
+    with OrderedWriter(asm_path(out_file_name, args.compress)) as writer:
+        writer.write("\n".join(prelude) + "\n")
+        for _, file_commands in prefetch(files, lambda file: read_file(file, args)):
+            program = pass_manager.run(build_program(file_commands))
+            file_commands = program.commands()
+            if args.track_stack or args.cache_bases:
+                translate_program(program, args.cache_bases)
+            else:
+                translate_commands(file_commands, cache)
+            writer.write(format_translated_asm(file_commands))
+            instructions += sum(
+                count_instructions(command.translation) for command in file_commands
+            )
+            commands.extend(file_commands)
+
+    return out_file_name, commands, instructions, cache
+
+
+def translate_function_units(file_or_dir: str, args: Namespace) -> TranslationResult:
+    """
+    Translate a .vm file or directory one function at a time, reusing the translation of
+    every function that has not changed since the last run from the unit cache in
+    `__vmcache__`, and link the functions into the .asm file.  Needs options that work
+    within a function, see `whole_program`.
+
+    Only the first command of each unit is parsed into a `Command`, which carries the
+    unit's instructions for the reports.
+
+    Args:
+        `file_or_dir` (str): The .vm file or directory to translate
+        `args` (Namespace): The command-line-arguments
+
+    Returns:
+        TranslationResult: The output file and any reports
+
+    Raises:
+        LinkError: If a function is defined twice or a symbol is defined nowhere
+        RomBudgetError: If the program has more instructions than `args.rom_budget`
+    """
+
+    # hashlib and the process pool are only needed here, so units load on demand
+    # pylint: disable-next=import-outside-toplevel
+    from units import UnitCache, make_units, translate_units, unit_cache_directory, unit_options
+
+    if os.path.isdir(file_or_dir):
+        out_file_name = f"{file_or_dir}/{os.path.basename(file_or_dir)}"
+        files = parse_directory(file_or_dir, **scan_options(args))
+        prelude = format_init().split("\n")[:-1]
+    else:
+        out_file_name = os.path.splitext(strip_compression(file_or_dir))[0]
+        files = [file_or_dir]
+        prelude = []
+    if args.shared_stubs:
+        prelude.extend(stub_routines())
+
+    options = unit_options(args)
+    units = []
+    for file in files:
+        if file.endswith(BYTECODE_EXTENSION) or args.bytecode_cache:
+            file_commands = read_file(file, args)
+            filename = file_commands[0].filename if file_commands else ""
+            lines = [command.command for command in file_commands]
+        else:
+            filename = os.path.basename(strip_compression(file))
+            lines = parse_file(file)
+        if lines:
+            units.extend(make_units(filename, lines, options))
+
+    cache = UnitCache(unit_cache_directory(file_or_dir))
+    objects = translate_units(units, options, cache, args.jobs)
+    if os.path.isdir(file_or_dir):
+        cache.prune(units)
+    lines = link(objects, prelude)
+
+    commands = []
+    for unit, obj in zip(units, objects):
+        commands.append(Command(unit.lines[0], unit.filename))
+        commands[-1].translation = obj.lines
+
+    instructions = count_instructions(lines)
+    check_rom_budget(instructions, commands, args.rom_budget)
+    write_asm_lines(out_file_name, lines, False, args.compress)
+
+    reports = [cache.format_stats()] if args.cache_report else []
+    result = finish_translation(args, out_file_name, commands, instructions, None, reports)
+    result.n_commands = sum(len(unit.lines) for unit in units)
+    return result
+
+
+def translate_path(file_or_dir: str, args: Namespace) -> TranslationResult:
+    """
+    Translate a .vm file or directory into its .asm file.  Label numbering starts from
+    zero so the output does not depend on what else was translated in this process.
+    With `args.pipeline` a directory is translated by `translate_pipelined` when the
+    options allow, and otherwise its files are still read ahead on a background thread.
+    With `args.function_units` the program is translated by `translate_function_units`
+    when the options allow.  The ROM budget is checked before anything is written, so a
+    program over budget leaves no output.
+
+    Args:
+        `file_or_dir` (str): The .vm file or directory to translate
+        `args` (Namespace): The command-line-arguments
+
+    Returns:
+        TranslationResult: The output file and any reports
+
+    Raises:
+        StaticOverflowError: If the program needs more static variables than fit
+        StackLimitError: If the worst-case stack usage may exceed `args.stack_limit`
+        LinkError: If the objects have undefined or duplicate symbols
+        RomBudgetError: If the program has more instructions than `args.rom_budget`,
+            even after retrying with shared stubs when `args.shrink` is set
+    """
+
+    Command.label_count = 0
+    if args.compact_calls and not args.shared_stubs:
+        args = Namespace(**{**vars(args), "shared_stubs": True})
+    if args.shrink and not args.shared_stubs and args.rom_budget is not None:
+        try:
+            return translate_path(file_or_dir, Namespace(**{**vars(args), "shrink": False}))
+        except RomBudgetError:
+            return translate_path(file_or_dir, Namespace(**{**vars(args), "shared_stubs": True}))
+    # Writing as it translates leaves no chance to check the ROM budget first
+    if (
+        args.pipeline
+        and os.path.isdir(file_or_dir)
+        and not whole_program(args)
+        and args.rom_budget is None
+    ):
+        out_file_name, commands, instructions, cache = translate_pipelined(file_or_dir, args)
+        return finish_translation(args, out_file_name, commands, instructions, cache)
+    if args.function_units and not whole_program(args):
+        return translate_function_units(file_or_dir, args)
+
+    out_file_name, commands = read_program(file_or_dir, args)
+    before = None
+    if args.profile is not None:
+        args = apply_profile(args, commands)
+        # The same program built with -O0, from fresh copies of the commands
+        before = translation_cost(
+            [Command(command.command, command.filename) for command in commands]
+        )
+
+    pass_manager = build_pass_manager(
+        inline=args.inline,
+        inline_size=args.inline_size,
+        tail_calls=args.tail_calls,
+        fuse_branches=args.fuse_branches,
+        shared_stubs=args.shared_stubs,
+        compact_calls=args.compact_calls,
+        allocate_statics=args.allocate_statics,
+        static_report=args.static_report,
+        stack_analysis=args.stack_report or args.stack_limit is not None,
+    )
+    program = pass_manager.run(build_program(commands))
+
+    reports = []
+    if args.static_report:
+        reports.append(format_static_report(pass_manager.results["statics"]))
+    if args.stack_report:
+        limit = STACK_LIMIT if args.stack_limit is None else args.stack_limit
+        reports.append(pass_manager.results["stack"].format(limit))
+    if args.stack_limit is not None:
+        analysis = pass_manager.results["stack"]
+        if analysis.exceeds(args.stack_limit):
+            raise StackLimitError(
+                f"worst-case stack usage may exceed {args.stack_limit} words\n"
+                + analysis.format(args.stack_limit)
+            )
+
+    commands = program.commands()
+    cache = None if args.translation_cache is None else TranslationCache(args.translation_cache)
+    prelude = format_init().split("\n")[:-1] if os.path.isdir(file_or_dir) else []
+    if args.shared_stubs:
+        prelude.extend(stub_routines(call_entries(commands)))
+    if args.objects or args.strip_unused:
+        lines = link_program(out_file_name, program, prelude, args, cache)
+        instructions = count_instructions(lines)
+        check_rom_budget(instructions, commands, args.rom_budget)
+        write_asm_lines(out_file_name, lines, False, args.compress)
+    else:
+        if args.track_stack or args.cache_bases:
+            translate_program(program, args.cache_bases)
+        else:
+            translate_commands(commands, cache)
+        instructions = count_instructions(prelude)
+        if args.compact_calls:
+            instructions = resolve_return_addresses(commands, instructions)
+        else:
+            instructions += sum(count_instructions(command.translation) for command in commands)
+        check_rom_budget(instructions, commands, args.rom_budget)
+        write_asm_lines(out_file_name, prelude, False, args.compress)
+        write_translated_asm(out_file_name, commands, args.compress)
+
+    return finish_translation(args, out_file_name, commands, instructions, cache, reports, before)
+
+
+def finish_translation(  # pylint: disable=too-many-arguments
+    args: Namespace,
+    out_file_name: str,
+    commands: list[Command],
+    instructions: int,
+    cache: TranslationCache | None = None,
+    reports: list[str] | None = None,
+    before: Cost | None = None,
+) -> TranslationResult:
+    """
+    Write the symbol index and add the reports that need the translated commands, see
+    `translate_path`
+
+    Args:
+        `args` (Namespace): The command-line-arguments
+        `out_file_name` (str): The output filename (without extension)
+        `commands` (list[Command]): The translated commands
+        `instructions` (int): The number of instructions written
+        `cache` (TranslationCache | None): The translation cache used
+        `reports` (list[str] | None): The reports made so far
+        `before` (Cost | None): The cost of the program with `-O0` when a profile is used
+
+    Returns:
+        TranslationResult: The output file and any reports
+    """
+
+    reports = [] if reports is None else reports
+    if args.compact_calls:
+        reports.append(format_call_report(commands))
+    if before is not None:
+        reports.append(format_profile_summary(args.profile, before, program_cost(commands)))
+    if args.symbol_index:
+        # mmap and struct are only needed here, so the index module loads on demand
+        # pylint: disable-next=import-outside-toplevel
+        from symbol_index import SYMBOL_INDEX_EXTENSION, write_symbol_index
+
+        functions = [command.arg1 for command in commands if command.c_type == CType.FUNCTION]
+        with open_text(asm_path(out_file_name, args.compress)) as f:
+            lines = (line.rstrip("\n") for line in f)
+            write_symbol_index(out_file_name + SYMBOL_INDEX_EXTENSION, lines, functions)
+    if args.cache_report and cache is not None:
+        reports.append(cache.format_stats())
+    if args.rom_report:
+        reports.append(format_rom_report(instructions, commands, args.rom_budget or ROM_SIZE))
+
+    return TranslationResult(
+        asm_path(out_file_name, args.compress), len(commands), reports, instructions
+    )
+
+
+def link_program(
+    out_file_name: str,
+    program: Program,
+    prelude: list[str],
+    args: Namespace,
+    cache: TranslationCache | None = None,
+) -> list[str]:
+    """
+    Translate each file of the program on its own into an object, write the objects next
+    to the output, then link them.  A function belongs to the file that defines it, even
+    when the passes have inlined code from other files into it.
+
+    Args:
+        `out_file_name` (str): The output filename (without extension)
+        `program` (Program): The optimized program
+        `prelude` (list[str]): The bootstrap and shared routines to link in first
+        `args` (Namespace): The command-line-arguments
+        `cache` (TranslationCache | None): The cache to translate commands through
+
+    Returns:
+        list[str]: The linked ASM
+    """
+
+    files: dict[str, list[Function]] = {}
+    for function in program.functions:
+        first = function.header or next(iter(function.commands()), None)
+        if first is not None:
+            files.setdefault(first.filename, []).append(function)
+
+    objects = []
+    for filename, functions in files.items():
+        # Labels are numbered per file; the linker makes them unique
+        Command.label_count = 0
+        file_program = Program(functions)
+        if args.track_stack or args.cache_bases:
+            translate_program(file_program, args.cache_bases)
+        else:
+            translate_commands(file_program.commands(), cache)
+        obj = make_object(filename, file_program.commands())
+        stem = os.path.splitext(filename)[0]
+        write_object(os.path.join(os.path.dirname(out_file_name), stem + OBJECT_EXTENSION), obj)
+        objects.append(obj)
+
+    lines = link(objects, prelude, strip_unused=args.strip_unused)
+    if args.compact_calls:
+        lines, _ = resolve_return_labels(lines)
+    return lines
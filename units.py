@@ -0,0 +1,243 @@
+"""
+Per-function translation units.  Each function of a program, and any code before the
+first function of a file, is translated on its own into an object with its own label
+numbering, so the linker can join the units in any order.  A unit is identified by a hash
+of its commands and the options that affect its translation, which keys a cache of
+translated units: editing one function only retranslates that function.  Units that have
+to be translated can be spread across worker processes.
+"""
+
+from __future__ import annotations
+
+from argparse import Namespace
+import hashlib
+import os
+
+from asm_writer import translate_commands
+from bytecode import CACHE_DIRECTORY
+from command import Command
+from ir import build_program
+from linker import ObjectFile, make_object, read_object, relocate_object, write_object
+from passes import build_pass_manager
+from stack_codegen import translate_program
+from translation_cache import TranslationCache
+from vm_parser import parse_commands, split_functions
+
+# Changing how commands are translated changes the translation of an unchanged unit, so
+# this is part of every hash; raise it to drop every cached unit
+UNITS_VERSION = 1
+
+# The directory within the `__vmcache__` directory holding translated units
+UNITS_DIRECTORY = "units"
+
+# Translating a unit takes well under a millisecond, so a worker process only pays for
+# starting up when it has at least this many units to translate
+MIN_UNITS_PER_JOB = 64
+
+# The options that affect how a unit is translated
+UNIT_OPTIONS = (
+    "tail_calls",
+    "fuse_branches",
+    "shared_stubs",
+    "track_stack",
+    "cache_bases",
+    "translation_cache",
+)
+
+
+class TranslationUnit:
+    """
+    A function, or the code before the first function of a file, translated on its own
+
+    Attributes:
+        `name` (str): the unit's object name, "File.vm:Function" or "File.vm" for code
+            before the first function
+        `filename` (str): the .vm file the unit is from
+        `lines` (list[str]): the unit's commands
+        `digest` (str): hash of the commands, the file and the translation options
+    """
+
+    def __init__(self, name: str, filename: str, lines: list[str], digest: str) -> None:
+        self.name: str = name
+        self.filename: str = filename
+        self.lines: list[str] = lines
+        self.digest: str = digest
+
+
+class UnitCache:
+    """
+    Translated units stored as object files named after their hash
+
+    Attributes:
+        `directory` (str): where the objects are kept
+        `hits` (int): units read from the cache
+        `misses` (int): units that had to be translated
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory: str = directory
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest + ".obj")
+
+    def get(self, unit: TranslationUnit) -> ObjectFile | None:
+        """
+        The cached translation of `unit`, None if there is none
+        """
+
+        try:
+            obj = read_object(self._path(unit.digest))
+        except (OSError, IndexError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return obj
+
+    def put(self, unit: TranslationUnit, obj: ObjectFile) -> None:
+        """
+        Store the translation of `unit`
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        write_object(self._path(unit.digest), obj)
+
+    def prune(self, units: list[TranslationUnit]) -> None:
+        """
+        Remove every cached unit other than `units`, such as old versions of functions
+        """
+
+        keep = {unit.digest + ".obj" for unit in units}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name not in keep:
+                    os.remove(os.path.join(self.directory, name))
+
+    def format_stats(self) -> str:
+        """
+        Format how many units were reused as a one-line report
+        """
+
+        total = self.hits + self.misses
+        return f"function units: {self.hits}/{total} reused, {self.misses} translated"
+
+
+def unit_options(args: Namespace) -> dict:
+    """
+    The options that affect how a unit is translated, from the command-line-arguments
+    """
+
+    return {option: getattr(args, option) for option in UNIT_OPTIONS}
+
+
+def unit_cache_directory(file_or_dir: str) -> str:
+    """
+    The unit cache of a .vm file or directory, in the `__vmcache__` directory beside the
+    file or inside the directory
+    """
+
+    directory = file_or_dir if os.path.isdir(file_or_dir) else os.path.dirname(file_or_dir)
+    return os.path.join(directory, CACHE_DIRECTORY, UNITS_DIRECTORY)
+
+
+def make_units(filename: str, lines: list[str], options: dict) -> list[TranslationUnit]:
+    """
+    Split a file's commands into translation units, see `split_functions`
+
+    Args:
+        `filename` (str): The .vm file the commands are from
+        `lines` (list[str]): The file's commands
+        `options` (dict): The translation options, see `unit_options`
+
+    Returns:
+        list[TranslationUnit]: The units, in order
+    """
+
+    settings = repr((UNITS_VERSION, filename, sorted(options.items())))
+    units = []
+    for unit_lines in split_functions(lines):
+        first = unit_lines[0].split()
+        name = f"{filename}:{first[1]}" if first[0] == "function" else filename
+        digest = hashlib.sha256("\n".join([settings, *unit_lines]).encode()).hexdigest()
+        units.append(TranslationUnit(name, filename, unit_lines, digest))
+
+    return units
+
+
+def translate_unit(name: str, filename: str, lines: list[str], options: dict) -> ObjectFile:
+    """
+    Run the per-function passes over a unit and translate it into an object, numbering
+    its labels from zero.  The labels are renamed for linking straight away, since the
+    unit's name is fixed.
+
+    Args:
+        `name` (str): The unit's object name
+        `filename` (str): The .vm file the unit is from
+        `lines` (list[str]): The unit's commands
+        `options` (dict): The translation options, see `unit_options`
+
+    Returns:
+        ObjectFile: The translated unit
+    """
+
+    Command.label_count = 0
+    program = build_pass_manager(
+        tail_calls=options["tail_calls"],
+        fuse_branches=options["fuse_branches"],
+        shared_stubs=options["shared_stubs"],
+    ).run(build_program(parse_commands(lines, filename)))
+    if options["track_stack"] or options["cache_bases"]:
+        translate_program(program, options["cache_bases"])
+    else:
+        size = options["translation_cache"]
+        translate_commands(program.commands(), None if size is None else TranslationCache(size))
+
+    return relocate_object(make_object(name, program.commands()))
+
+
+def translate_units(
+    units: list[TranslationUnit], options: dict, cache: UnitCache, jobs: int = 0
+) -> list[ObjectFile]:
+    """
+    Translate units, reusing cached translations and storing new ones.  The units that
+    have to be translated are spread across worker processes when there are enough of
+    them.
+
+    Args:
+        `units` (list[TranslationUnit]): The units to translate
+        `options` (dict): The translation options, see `unit_options`
+        `cache` (UnitCache): The unit cache
+        `jobs` (int): The most worker processes, 0 for one per CPU
+
+    Returns:
+        list[ObjectFile]: The translated units, in the order given
+    """
+
+    objects = [cache.get(unit) for unit in units]
+    missing = [unit for unit, obj in zip(units, objects) if obj is None]
+
+    jobs = min(jobs or os.cpu_count() or 1, len(missing) // MIN_UNITS_PER_JOB)
+    arguments = (
+        [unit.name for unit in missing],
+        [unit.filename for unit in missing],
+        [unit.lines for unit in missing],
+        [options] * len(missing),
+    )
+    if jobs <= 1:
+        translated = list(map(translate_unit, *arguments))
+    else:
+        # pylint: disable-next=import-outside-toplevel
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = max(1, len(missing) // (jobs * 4))
+            translated = list(executor.map(translate_unit, *arguments, chunksize=chunksize))
+
+    new = iter(translated)
+    for i, obj in enumerate(objects):
+        if obj is None:
+            objects[i] = next(new)
+            cache.put(units[i], objects[i])
+
+    return objects
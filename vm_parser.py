@@ -5,26 +5,36 @@ Ignores all whitespace and comments
 """
 
 from __future__ import annotations
-from glob import glob
+from fnmatch import fnmatchcase
+import os
 
 from command import Command
+from compression import open_text, strip_compression
 from constants import COMMENT
 
 
+class DuplicateFileError(Exception):
+    """
+    Raised when two files found in a directory tree have the same name, which would give
+    them the same static variables
+    """
+
+
 def parse_file(file: str) -> list[str]:
     """
     Read in a file and parse it into
     a list of commands without whitespace or comments
 
     Args:
-        `file` (str): The filepath to the file to be parsed
+        `file` (str): The filepath to the file to be parsed, decompressed when its
+            extension names a compression format
 
     Returns:
         list[str]: The file parsed into a list of strings without
             whitespace or comments
     """
 
-    with open(file, "r", encoding="UTF-8") as f:
+    with open_text(file) as f:
         lines = f.read().split("\n")
         lines = [
             line.split(COMMENT)[0].strip()
@@ -35,20 +45,107 @@ def parse_file(file: str) -> list[str]:
         return lines
 
 
-def parse_directory(directory: str) -> list[str]:
+def parse_directory(
+    directory: str,
+    recursive: bool = False,
+    include: tuple[str, ...] = ("*.vm",),
+    exclude: tuple[str, ...] = (),
+) -> list[str]:
     """
     Read in all files from a directory and return a list of the .vm files
-    to be parsed
+    to be parsed, in a stable order so the output is identical between runs
 
     Args:
         `directory` (str): The filepath to the directory to be parsed
+        `recursive` (bool): Whether to also scan subdirectories
+        `include` (tuple[str, ...]): Filename patterns a file must match one of
+        `exclude` (tuple[str, ...]): Filename patterns that drop a matching file
 
     Returns:
-        list[str]: All vm files in the directory
+        list[str]: All vm files in the directory, Sys.vm first and the rest sorted
+            lexically by their path relative to `directory`
+
+    Raises:
+        DuplicateFileError: If two files, in different subdirectories or compressed
+            differently, have the same name and so the same statics
     """
 
-    vm_files = glob(f"{directory}/*.vm")
-    return vm_files
+    vm_files = scan_directory(directory, recursive, include, exclude)
+    vm_files.sort(key=_directory_order)
+
+    names: dict[str, str] = {}
+    for relative in vm_files:
+        name = os.path.splitext(os.path.basename(strip_compression(relative)))[0]
+        if name in names:
+            raise DuplicateFileError(
+                f"{names[name]} and {relative} in {directory} would share the statics "
+                f"of {name}.vm"
+            )
+        names[name] = relative
+
+    return [f"{directory}/{relative}" for relative in vm_files]
+
+
+def scan_directory(
+    directory: str,
+    recursive: bool = False,
+    include: tuple[str, ...] = ("*.vm",),
+    exclude: tuple[str, ...] = (),
+) -> list[str]:
+    """
+    Collect the files in a directory that match the include/exclude patterns, using
+    `os.scandir` so each directory is listed with a single system call.  Patterns are
+    matched against the file name and, for subdirectories, the relative path.  A
+    directory reached again through a symlink is skipped, so symlink loops end.
+
+    Args:
+        `directory` (str): The filepath to the directory to be scanned
+        `recursive` (bool): Whether to also scan subdirectories
+        `include` (tuple[str, ...]): Filename patterns a file must match one of
+        `exclude` (tuple[str, ...]): Filename patterns that drop a matching file
+
+    Returns:
+        list[str]: Paths relative to `directory` (using "/"), in filesystem order
+    """
+
+    found = []
+    pending = [""]
+    visited: set[tuple[int, int]] = set()
+    while pending:
+        relative_dir = pending.pop()
+        path = os.path.join(directory, relative_dir)
+        if recursive:
+            stat = os.stat(path)
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+        with os.scandir(path) as entries:
+            for entry in entries:
+                relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir():
+                    if recursive:
+                        pending.append(relative)
+                elif _matches(entry.name, relative, include) and not _matches(
+                    entry.name, relative, exclude
+                ):
+                    found.append(relative)
+
+    return found
+
+
+def _matches(name: str, relative: str, patterns: tuple[str, ...]) -> bool:
+    return any(
+        fnmatchcase(name, pattern) or fnmatchcase(relative, pattern) for pattern in patterns
+    )
+
+
+def _directory_order(relative: str) -> tuple[bool, str]:
+    """
+    Sort key placing the top level Sys.vm (which holds the entry point), compressed or
+    not, first and every other file after it in lexical order
+    """
+
+    return (strip_compression(relative) != "Sys.vm", relative)
 
 
 def parse_commands(base_commands: list[str], filename: str) -> list[Command]:
@@ -66,3 +163,24 @@ def parse_commands(base_commands: list[str], filename: str) -> list[Command]:
     """
 
     return [Command(command, filename) for command in base_commands]
+
+
+def split_functions(base_commands: list[str]) -> list[list[str]]:
+    """
+    Split a file's commands into function units, each starting at a `function` command.
+    Any commands before the first function form a unit of their own.
+
+    Args:
+        `base_commands` (list[str]): The list of string commands of one file
+
+    Returns:
+        list[list[str]]: The commands of each unit, in order
+    """
+
+    units: list[list[str]] = []
+    for command in base_commands:
+        if not units or command.split(maxsplit=1)[0] == "function":
+            units.append([])
+        units[-1].append(command)
+
+    return units
@@ -0,0 +1,232 @@
+"""
+Watch mode for a project directory.  Keeps the translation of every .vm file in memory
+so that when a file changes only that file is retranslated and spliced back into the
+combined .asm file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import time
+
+from asm_writer import format_init, format_translated_asm, translate_commands
+from vm_parser import DuplicateFileError, parse_commands, parse_directory, parse_file
+
+
+class WatchedFile:
+    """
+    A single .vm file being watched along with its current translated section
+
+    Attributes:
+        `path` (str): the filepath of the .vm file
+        `stamp` (tuple[int, int]): the (mtime_ns, size) of the file when last read
+        `digest` (bytes): hash of the file contents when last read
+        `section` (bytes): the encoded ASM section for this file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.stamp: tuple[int, int] = (0, 0)
+        self.digest: bytes = b""
+        self.section: bytes = b""
+
+    def has_changed(self) -> bool:
+        """
+        Check whether the file contents differ from when it was last translated.  The
+        cheap stat check runs first so an untouched file is never re-read.
+        """
+
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.stamp:
+            return False
+
+        with open(self.path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+        if digest == self.digest:
+            self.stamp = stamp
+            return False
+
+        return True
+
+    def translate(self) -> None:
+        """
+        Parse and translate the file, storing the result as this file's section.  The
+        stamp and digest are only recorded once the translation succeeds, so a file that
+        fails to translate is tried again on the next poll.
+        """
+
+        stat = os.stat(self.path)
+        with open(self.path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+        lines = parse_file(self.path)
+        commands = parse_commands(lines, os.path.basename(self.path))
+        translate_commands(commands)
+        self.section = format_translated_asm(commands).encode("UTF-8")
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        self.digest = digest
+
+
+class ProjectWatcher:
+    """
+    Translates a project directory into `<dir>/<dir>.asm` and keeps it up to date.
+
+    The output file is the bootstrap code followed by one section per .vm file, in the
+    order given by `parse_directory`.  A changed file is retranslated on its own and the
+    output is rewritten in place starting at that file's section; everything before it
+    is left untouched.  A file that cannot be read or translated keeps its last good
+    section and its error is kept in `errors` until the next build or poll.
+
+    Attributes:
+        `directory` (str): the directory being watched
+        `out_file_name` (str): the .asm file being written
+        `scan_options` (dict): keyword arguments passed on to `parse_directory`
+        `files` (list[WatchedFile]): the watched files, in output order
+        `errors` (list[str]): the files that failed in the last build or poll and why
+    """
+
+    def __init__(self, directory: str, **scan_options) -> None:
+        self.directory: str = directory
+        self.scan_options: dict = scan_options
+        self.out_file_name: str = (
+            f"{directory}/{os.path.basename(os.path.normpath(directory))}.asm"
+        )
+        self.files: list[WatchedFile] = []
+        self.errors: list[str] = []
+        self._header: bytes = format_init().encode("UTF-8")
+
+    def build(self) -> None:
+        """
+        Translate every file in the directory and write the complete .asm file
+        """
+
+        paths = parse_directory(self.directory, **self.scan_options)
+        self.files = [WatchedFile(path) for path in paths]
+        self.errors = []
+        for watched in self.files:
+            self._translate(watched)
+
+        with open(self.out_file_name, "wb") as out_file:
+            out_file.write(self._header)
+            for watched in self.files:
+                out_file.write(watched.section)
+
+    def poll(self) -> list[str]:
+        """
+        Retranslate any files that changed since the last poll and splice them into
+        the output.  If files were added or removed the whole output is rebuilt.
+
+        Returns:
+            list[str]: The paths of the files that were retranslated
+        """
+
+        current = parse_directory(self.directory, **self.scan_options)
+        if [watched.path for watched in self.files] != current:
+            self.build()
+            return [watched.path for watched in self.files]
+
+        changed = []
+        first_moved = None
+        self.errors = []
+        for i, watched in enumerate(self.files):
+            old_length = len(watched.section)
+            if not self._translate(watched, only_changed=True):
+                continue
+
+            changed.append(i)
+            if len(watched.section) != old_length and first_moved is None:
+                first_moved = i
+
+        if changed:
+            self._splice(changed, first_moved)
+
+        return [self.files[i].path for i in changed]
+
+    def _translate(self, watched: WatchedFile, only_changed: bool = False) -> bool:
+        """
+        Translate a file, recording why in `errors` if it cannot be read or translated
+
+        Returns:
+            bool: Whether the file was translated
+        """
+
+        try:
+            if only_changed and not watched.has_changed():
+                return False
+            watched.translate()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            self.errors.append(f"{watched.path}: {type(error).__name__}: {error}")
+            return False
+        return True
+
+    def _splice(self, changed: list[int], first_moved: int | None) -> None:
+        """
+        Write changed sections back into the output file.  Sections that kept their size
+        are overwritten in place; from the first section whose size changed onwards the
+        rest of the file is rewritten and truncated.
+        """
+
+        offsets = [len(self._header)]
+        for watched in self.files:
+            offsets.append(offsets[-1] + len(watched.section))
+
+        with open(self.out_file_name, "r+b") as out_file:
+            for i in changed:
+                if first_moved is not None and i >= first_moved:
+                    break
+                out_file.seek(offsets[i])
+                out_file.write(self.files[i].section)
+
+            if first_moved is not None:
+                out_file.seek(offsets[first_moved])
+                for watched in self.files[first_moved:]:
+                    out_file.write(watched.section)
+                out_file.truncate()
+
+
+def watch_directory(directory: str, interval: float = 0.5, **scan_options) -> None:
+    """
+    Translate a directory and then keep retranslating changed files until interrupted.
+    Uses stat polling so it works the same on every platform.  Files that fail to
+    translate and directories that cannot be read are reported on stderr and watching
+    carries on.
+
+    Args:
+        `directory` (str): The directory to watch
+        `interval` (float): Seconds to wait between polls
+        `scan_options`: Keyword arguments passed on to `parse_directory`
+    """
+
+    watcher = ProjectWatcher(directory, **scan_options)
+    try:
+        watcher.build()
+    except (OSError, DuplicateFileError) as error:
+        print(error, file=sys.stderr)
+    print(f"Watching {directory} ({len(watcher.files)} files)")
+    for error in watcher.errors:
+        print(error, file=sys.stderr)
+    reported = watcher.errors
+
+    try:
+        while True:
+            time.sleep(interval)
+            start = time.perf_counter()
+            try:
+                changed = watcher.poll()
+            except (OSError, DuplicateFileError) as error:
+                print(error, file=sys.stderr)
+                continue
+            if changed:
+                elapsed = (time.perf_counter() - start) * 1000
+                names = ", ".join(os.path.basename(path) for path in changed)
+                print(f"Retranslated {names} in {elapsed:.1f} ms")
+            # A file is retried on every poll until it translates, so its error is only
+            # printed when it first appears
+            for error in watcher.errors:
+                if error not in reported:
+                    print(error, file=sys.stderr)
+            reported = watcher.errors
+    except KeyboardInterrupt:
+        pass